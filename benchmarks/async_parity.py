@@ -0,0 +1,163 @@
+"""Check that the async data access API matches the sync one.
+
+Runs against a local Postgres loaded with dummy_data_gen/load_local_postgres.py
+and checks that:
+
+    api       every decorated function in data_access has an async
+              counterpart in data_access_async with the same signature
+    live      each read returns the same result through both APIs
+    snapshot  with Lakebase marked offline, the same reads are served from
+              the saved snapshot through both APIs, with the same results
+
+    python async_parity.py
+"""
+import argparse
+import asyncio
+import dataclasses
+import inspect
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app"))
+
+# Sync functions whose async counterpart has another name, or that have none
+RENAMED = {"get_connection": "get_async_connection"}
+# The override queue's writer and the snapshot refresh's read, run on their own threads
+SYNC_ONLY = {"write_queued_overrides", "fetch_snapshot_tables"}
+WRITES = {"add_override", "add_overrides_bulk", "queue_override"}
+
+
+def sync_api(data_access):
+    """The decorated public functions of data_access, by name."""
+    return {name: func for name, func in vars(data_access).items()
+            if inspect.isfunction(func) and func.__module__ == data_access.__name__
+            and hasattr(func, "__wrapped__") and not name.startswith("_")}
+
+
+def same(a, b):
+    import numpy as np
+
+    if hasattr(a, "equals"):
+        return a.equals(b)
+    if isinstance(a, np.ndarray):
+        if a.dtype.kind == "f":
+            return a.shape == b.shape and np.allclose(a, b, equal_nan=True)
+        return a.shape == b.shape and all(same(x, y) for x, y in zip(a.tolist(), b.tolist()))
+    if dataclasses.is_dataclass(a):
+        return type(a) is type(b) and same(vars(a), vars(b))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    # NaN and NaT compare unequal to themselves
+    return a == b or (a != a and b != b)
+
+
+def comparable(name, result):
+    # part_lookup appends its own timing
+    if name == "part_lookup" and result is not None:
+        return result[:-2] + result[-1:]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    snapshot_dir = tempfile.TemporaryDirectory()
+    os.environ["LAKEBASE_SNAPSHOT_DIR"] = snapshot_dir.name
+    # Serial plans sum machine loads in the same order every time, so near
+    # ties in propose_rebalance break the same way through both APIs
+    os.environ["PGOPTIONS"] = "-c max_parallel_workers_per_gather=0"
+    import data_access
+    import data_access_async
+
+    results = {}
+    functions = sync_api(data_access)
+    for name, func in functions.items():
+        if name in SYNC_ONLY:
+            continue
+        counterpart = getattr(data_access_async, RENAMED.get(name, name), None)
+        assert counterpart is not None, f"data_access_async has no {RENAMED.get(name, name)}"
+        assert inspect.signature(counterpart) == inspect.signature(func), \
+            f"{name}{inspect.signature(func)} but async {name}{inspect.signature(counterpart)}"
+    results["api"] = len(functions) - len(SYNC_ONLY)
+
+    part_ids = [row[0] for row in data_access.fetch_parts()[:3]]
+    machine = data_access.fetch_machine_loads()["machine_id"][-1]
+    if not part_ids:
+        raise SystemExit("No parts found; load data with dummy_data_gen/load_local_postgres.py first")
+    calls = {
+        "fetch_effective_routes": (tuple(part_ids),),
+        "fetch_machine_parts": (machine,),
+        "propose_rebalance": (machine,),
+        "part_lookup_many": (part_ids,),
+        "part_lookup": (part_ids[0],),
+        "search_parts": (part_ids[0][:4],),
+        "fetch_routes_page": ("due_date", True),
+    }
+    reads = sorted(name for name in functions if name not in SYNC_ONLY | WRITES | set(RENAMED))
+
+    def clear_caches():
+        data_access.query_cache.clear()
+        data_access.part_cache.clear()
+
+    def go_offline():
+        data_access.snapshot_fallback._offline = True
+
+    def run_sync(offline):
+        values = {}
+        for name in reads:
+            clear_caches()
+            if offline:
+                go_offline()
+            before = data_access.snapshot_fallback.snapshot_reads
+            value = getattr(data_access, name)(*calls.get(name, ()))
+            values[name] = (comparable(name, value), data_access.snapshot_fallback.snapshot_reads > before)
+        return values
+
+    async def run_async(offline):
+        values = {}
+        for name in reads:
+            clear_caches()
+            if offline:
+                go_offline()
+            before = data_access.snapshot_fallback.snapshot_reads
+            value = await getattr(data_access_async, name)(*calls.get(name, ()))
+            values[name] = (comparable(name, value), data_access.snapshot_fallback.snapshot_reads > before)
+        return values
+
+    async def run_both():
+        try:
+            live = (run_sync(False), await run_async(False))
+            data_access.snapshot_fallback.refresh()
+            offline = (run_sync(True), await run_async(True))
+            return live, offline
+        finally:
+            data_access.snapshot_fallback.mark_live()
+            await data_access_async.close_async_connection_pool()
+
+    live, offline = asyncio.run(run_both())
+    for mode, (sync_values, async_values) in (("live", live), ("snapshot", offline)):
+        for name in reads:
+            (sync_value, sync_served), (async_value, async_served) = sync_values[name], async_values[name]
+            assert sync_served == async_served, \
+                f"{mode}: {name} is served from the snapshot by {'sync' if sync_served else 'async'} only"
+            assert same(sync_value, async_value), f"{mode}: {name} returns different results through the two APIs"
+    results["live"] = len(reads)
+    results["snapshot"] = sorted(name for name in reads if offline[0][name][1])
+    assert "part_lookup" in results["snapshot"] and offline[1]["part_lookup"][0][-1] == "snapshot", \
+        "async part_lookup did not report the snapshot source"
+
+    print(json.dumps(results, indent=2))
+    print(f"OK: {results['api']} functions match across the sync and async APIs")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
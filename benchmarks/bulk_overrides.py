@@ -0,0 +1,88 @@
+"""Benchmark of bulk override ingestion.
+
+Measures, against a local Postgres loaded with
+dummy_data_gen/load_local_postgres.py:
+
+    insert   add_overrides_bulk writing --rows new overrides with COPY and one
+             upsert
+    remerge  the same rows submitted again, which updates them all in place
+    single   add_override writing --single-rows overrides one at a time
+
+and checks that the re-submission inserted nothing:
+
+    python bulk_overrides.py --rows 10000 100000 --single-rows 1000 --output bulk_overrides.json
+
+Overrides written by the benchmark are deleted afterwards.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app"))
+
+BENCHMARK_USER = "bulk_overrides_benchmark@example.com"
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000], help="overrides per bulk run")
+    parser.add_argument("--single-rows", type=int, default=1000, help="overrides written one at a time")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    import data_access
+
+    part_ids = [row[0] for row in data_access.fetch_parts()]
+    machine = data_access.fetch_machines()[0][0]
+    if not part_ids:
+        raise SystemExit("No parts found; load data with dummy_data_gen/load_local_postgres.py first")
+
+    results = {"bulk": {}}
+    try:
+        # A fixed assigned_at per row, a microsecond apart, so the re-run merges;
+        # each run starts a day later so runs never overlap
+        for run, num_rows in enumerate(args.rows):
+            stamp = datetime(2000, 1, 1) + timedelta(days=run)
+            rows = [(part_ids[i % len(part_ids)], machine, "Bulk override benchmark", stamp + timedelta(microseconds=i))
+                    for i in range(num_rows)]
+            (inserted, _), insert_s = timed(lambda: data_access.add_overrides_bulk(rows, BENCHMARK_USER))
+            (reinserted, updated), remerge_s = timed(lambda: data_access.add_overrides_bulk(rows, BENCHMARK_USER))
+            assert inserted == num_rows, f"expected {num_rows} inserts, saw {inserted}"
+            assert reinserted == 0 and updated == num_rows, f"re-run inserted {reinserted}, updated {updated}"
+            stats = {
+                "insert_s": round(insert_s, 3),
+                "insert_rows_per_s": round(num_rows / insert_s),
+                "remerge_s": round(remerge_s, 3),
+                "remerge_rows_per_s": round(num_rows / remerge_s),
+            }
+            results["bulk"][num_rows] = stats
+            print(f"bulk   {num_rows:>8,} rows  insert {stats['insert_s']:>7.3f}s ({stats['insert_rows_per_s']:>8,} rows/s)  "
+                  f"re-run {stats['remerge_s']:>7.3f}s ({stats['remerge_rows_per_s']:>8,} rows/s)")
+
+        single_ids = [part_ids[i % len(part_ids)] for i in range(args.single_rows)]
+        _, single_s = timed(lambda: [data_access.add_override(part_id, machine, BENCHMARK_USER, "Bulk override benchmark")
+                                     for part_id in single_ids])
+        results["single"] = {"rows": args.single_rows, "rows_per_s": round(args.single_rows / single_s)}
+        print(f"single {args.single_rows:>8,} rows  {results['single']['rows_per_s']:>8,} rows/s")
+    finally:
+        with data_access.get_connection() as conn:
+            conn.execute(f"DELETE FROM {data_access.SCHEMA}.{data_access.OVERRIDES_TABLE_NAME} WHERE assigned_by = %s",
+                         (BENCHMARK_USER,))
+            conn.commit()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark of the row and columnar fetch paths for the routes table.
+
+Compares, against a local Postgres loaded with
+dummy_data_gen/load_local_postgres.py (e.g. --parts 100000):
+
+    tuples   fetchall() into Python tuples, copied into a pandas DataFrame,
+             with the dashboard metrics computed by list comprehensions
+    arrow    fetch_arrow (COPY as CSV parsed by Arrow) with the metrics from
+             summarize_routes
+    pandas   the arrow path plus Table.to_pandas(), for callers that need a
+             DataFrame
+
+Each path runs in a fresh process, which reports the peak memory it added
+over its baseline and the median of --repeat runs of its total time, split
+into database time (query execution and transfer) and conversion time
+(decoding rows, building columns or DataFrames, computing the metrics):
+
+    python columnar_fetch.py --repeat 5 --output columnar_fetch.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app")
+PATHS = ["tuples", "arrow", "pandas"]
+COLUMNS = ['part_id', 'priority', 'quantity_pending', 'due_date', 'recommended_machine_id', 'route_confidence']
+
+
+def current_rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(path, repeat):
+    """Run one fetch path in this process; returns its peak memory and timing."""
+    sys.path.insert(0, APP_DIR)
+    import pandas as pd
+    import data_access
+    from query_metrics import traced, last_trace
+
+    fetch_rows = traced(data_access.fetch_recommended_routes.uncached)
+    fetch_table = traced(data_access.fetch_routes_table.uncached)
+    # Connect and load the libraries before the baseline
+    fetch_table()
+
+    def tuples():
+        rows = fetch_rows()
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        today = date.today()
+        metrics = (len(rows), len([row for row in rows if row[1] == 'high']),
+                   len([row for row in rows if row[3] is not None and row[3] < today]))
+        return df, metrics
+
+    def arrow():
+        table = fetch_table()
+        return table, data_access.summarize_routes(table)
+
+    def pandas():
+        table = fetch_table()
+        return table.to_pandas(), data_access.summarize_routes(table)
+
+    run = {"tuples": tuples, "arrow": arrow, "pandas": pandas}[path]
+    baseline = current_rss_mb()
+    result = run()
+    peak = peak_rss_mb() - baseline
+    rows = result[0].shape[0] if hasattr(result[0], "shape") else result[0].num_rows
+    del result
+
+    times, database_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        trace = last_trace()
+        database_times.append((trace.phase_ms("pool_wait") + trace.phase_ms("execute")) / 1000)
+    median, database = statistics.median(times), statistics.median(database_times)
+    return {
+        "path": path,
+        "rows": rows,
+        "median_ms": round(median * 1000, 2),
+        "database_ms": round(database * 1000, 2),
+        "convert_ms": round((median - database) * 1000, 2),
+        "peak_memory_mb": round(peak, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per path (median is reported)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--worker", choices=PATHS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.repeat)))
+        return
+
+    results = []
+    for path in PATHS:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", path, "--repeat", str(args.repeat)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{path:7} {result['rows']:>9,} rows  {result['median_ms']:>8.1f}ms  "
+              f"(database {result['database_ms']:>7.1f}ms, convert {result['convert_ms']:>7.1f}ms)  "
+              f"peak +{result['peak_memory_mb']:.1f} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
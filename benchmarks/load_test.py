@@ -0,0 +1,320 @@
+"""Concurrent-session load test for shop_floor_app.data_access.
+
+Simulates N Streamlit sessions, each a thread replaying a weighted mix of the
+app's interactions against a local Postgres loaded with
+dummy_data_gen/load_local_postgres.py:
+
+    dashboard  snapshot, first routes page and effective routes for that page
+    search     typeahead keystrokes: growing prefixes of a random part ID
+    lookup     part lookup of a random part
+    override   override submit for a random part
+
+and reports throughput, p50/p95/p99 latency per data_access function, pool
+wait time and connection churn. Results are written as JSON, and a previous
+run can be passed as a baseline to fail on regressions:
+
+    python load_test.py --users 50 --duration 60 --save-baseline baseline.json
+    python load_test.py --users 50 --duration 60 --baseline baseline.json
+
+Leave LAKEBASE_INSTANCE_NAME unset so data_access logs in with PGUSER and
+PGPASSWORD instead of a Lakebase OAuth token. The LAKEBASE_SCHEMA and
+LAKEBASE_*_TABLE_NAME env vars must match the ones used by the loader.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app"))
+
+DEFAULT_MIX = "dashboard=6,search=2,lookup=3,override=1"
+LOAD_TEST_USER = "load_test@example.com"
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(text):
+    """Parse "name=weight,..." into {name: weight}."""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(SCENARIOS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return mix
+
+
+class LatencyRecorder:
+    """Thread-safe per-function latency samples and error counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.recording = False
+
+    def time(self, name, func, *args, **kwargs):
+        # Only calls that start after warmup count, so that a scenario and the
+        # calls it makes are sampled together
+        recording = self.recording
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            if recording:
+                with self._lock:
+                    self.errors[name] += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if recording:
+                with self._lock:
+                    self.samples[name].append(elapsed_ms)
+
+    def summary(self):
+        result = {}
+        for name in sorted(set(self.samples) | set(self.errors)):
+            samples = np.array(self.samples.get(name, []), dtype=float)
+            stats = {"count": int(samples.size), "errors": self.errors.get(name, 0)}
+            if samples.size:
+                stats["mean_ms"] = round(float(samples.mean()), 3)
+                for percentile, value in zip(PERCENTILES, np.percentile(samples, PERCENTILES)):
+                    stats[f"p{percentile}_ms"] = round(float(value), 3)
+                stats["max_ms"] = round(float(samples.max()), 3)
+            result[name] = stats
+        return result
+
+
+def dashboard(session):
+    data_access, recorder = session["data_access"], session["recorder"]
+    recorder.time("fetch_dashboard_snapshot", data_access.fetch_dashboard_snapshot)
+    page = recorder.time("fetch_routes_page", data_access.fetch_routes_page,
+                         sort_by=session["rng"].choice(session["sort_columns"]))
+    recorder.time("fetch_effective_routes", data_access.fetch_effective_routes,
+                  tuple(row[0] for row in page.rows))
+
+
+def search(session):
+    data_access, recorder, rng = session["data_access"], session["recorder"], session["rng"]
+    part_id = rng.choice(session["part_ids"])
+    for length in range(1, min(len(part_id), 8) + 1):
+        recorder.time("search_parts", data_access.search_parts, part_id[:length])
+
+
+def lookup(session):
+    data_access, recorder = session["data_access"], session["recorder"]
+    recorder.time("part_lookup", data_access.part_lookup, session["rng"].choice(session["part_ids"]))
+
+
+def override(session):
+    data_access, recorder, rng = session["data_access"], session["recorder"], session["rng"]
+    recorder.time("add_override", data_access.add_override, rng.choice(session["part_ids"]),
+                  rng.choice(session["machines"]), LOAD_TEST_USER, "Load test")
+
+
+SCENARIOS = {"dashboard": dashboard, "search": search, "lookup": lookup, "override": override}
+
+
+def run_session(session, mix, stop_at, think_time):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    rng, recorder = session["rng"], session["recorder"]
+    while time.perf_counter() < stop_at:
+        name = rng.choices(names, weights)[0]
+        try:
+            recorder.time(f"scenario.{name}", SCENARIOS[name], session)
+        except Exception as e:
+            session["last_error"] = repr(e)
+        if think_time:
+            # Exponential think time, like independent users clicking around
+            time.sleep(rng.expovariate(1 / think_time))
+
+
+def pool_stats(pool):
+    """Pool counters since the last call (pop_stats resets them)."""
+    stats = pool.pop_stats()
+    queued = stats.get("requests_queued", 0)
+    return {
+        "requests_num": stats.get("requests_num", 0),
+        "requests_queued": queued,
+        "requests_wait_ms": stats.get("requests_wait_ms", 0),
+        "avg_wait_ms_when_queued": round(stats.get("requests_wait_ms", 0) / queued, 3) if queued else 0.0,
+        "requests_errors": stats.get("requests_errors", 0),
+        "connections_num": stats.get("connections_num", 0),
+        "connections_ms": stats.get("connections_ms", 0),
+        "connections_errors": stats.get("connections_errors", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+        "returns_bad": stats.get("returns_bad", 0),
+        "usage_ms": stats.get("usage_ms", 0),
+        "pool_min": stats.get("pool_min"),
+        "pool_max": stats.get("pool_max"),
+        "pool_size": stats.get("pool_size"),
+    }
+
+
+def run_load_test(users, duration, warmup, mix, think_time, seed=None, no_cache=False):
+    """Run the load test and return the results as a JSON-serializable dict."""
+    import data_access
+
+    if no_cache:
+        data_access.query_cache.max_entries = 0
+        data_access.part_cache.max_entries = 0
+
+    pool = data_access.get_connection_pool()
+    pool.wait()
+    part_ids = [row[0] for row in data_access.fetch_parts()]
+    machines = [row[0] for row in data_access.fetch_machines()]
+    if not part_ids or not machines:
+        raise SystemExit("No parts or machines found; load data with dummy_data_gen/load_local_postgres.py first")
+
+    recorder = LatencyRecorder()
+    seeder = random.Random(seed)
+    sessions = [{
+        "data_access": data_access,
+        "recorder": recorder,
+        "rng": random.Random(seeder.random()),
+        "part_ids": part_ids,
+        "machines": machines,
+        "sort_columns": list(data_access.ROUTE_SORT_COLUMNS),
+    } for _ in range(users)]
+
+    start = time.perf_counter()
+    stop_at = start + warmup + duration
+    threads = [threading.Thread(target=run_session, args=(session, mix, stop_at, think_time), daemon=True)
+               for session in sessions]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(warmup)
+    pool.pop_stats()
+    recorder.recording = True
+    measured_start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    measured = time.perf_counter() - measured_start
+    recorder.recording = False
+
+    latencies = recorder.summary()
+    functions = {name: stats for name, stats in latencies.items() if not name.startswith("scenario.")}
+    scenarios = {name.split(".", 1)[1]: stats for name, stats in latencies.items() if name.startswith("scenario.")}
+    completed = sum(stats["count"] - stats["errors"] for stats in scenarios.values())
+    churn = pool_stats(pool)
+    churn["new_connections_per_min"] = round(churn["connections_num"] / measured * 60, 3)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "host": platform.node(),
+        "config": {
+            "users": users,
+            "duration_s": duration,
+            "warmup_s": warmup,
+            "mix": mix,
+            "think_time_s": think_time,
+            "seed": seed,
+            "cache": not no_cache,
+            "pool_min_size": data_access.POOL_MIN_SIZE,
+            "pool_max_size": data_access.POOL_MAX_SIZE,
+            "parts": len(part_ids),
+            "machines": len(machines),
+        },
+        "throughput": {
+            "interactions": completed,
+            "interactions_per_s": round(completed / measured, 3),
+            "measured_s": round(measured, 3),
+        },
+        "scenarios": scenarios,
+        "functions": functions,
+        "pool": churn,
+        "last_errors": sorted({s["last_error"] for s in sessions if "last_error" in s}),
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """List regressions: p95 up or throughput down by more than tolerance."""
+    regressions = []
+    for section in ("functions", "scenarios"):
+        for name, stats in results[section].items():
+            before = baseline.get(section, {}).get(name, {}).get("p95_ms")
+            after = stats.get("p95_ms")
+            if before and after and after > before * (1 + tolerance):
+                regressions.append(f"{section}.{name} p95 {before:.1f}ms -> {after:.1f}ms")
+            if stats["errors"] > baseline.get(section, {}).get(name, {}).get("errors", 0):
+                regressions.append(f"{section}.{name} errors {stats['errors']}")
+    before = baseline["throughput"]["interactions_per_s"]
+    after = results["throughput"]["interactions_per_s"]
+    if after < before * (1 - tolerance):
+        regressions.append(f"throughput {before:.1f}/s -> {after:.1f}/s")
+    return regressions
+
+
+def print_report(results):
+    config, throughput, pool = results["config"], results["throughput"], results["pool"]
+    print(f"{config['users']} users, pool {config['pool_min_size']}-{config['pool_max_size']}, "
+          f"cache {'on' if config['cache'] else 'off'}, {throughput['measured_s']:.0f}s")
+    print(f"Throughput: {throughput['interactions_per_s']:.1f} interactions/s ({throughput['interactions']} total)")
+    print(f"{'':32}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for section in ("scenarios", "functions"):
+        for name, stats in results[section].items():
+            print(f"{name:32}{stats['count']:>8}{stats['errors']:>8}"
+                  + "".join(f"{stats.get(f'p{p}_ms', float('nan')):>10.1f}" for p in PERCENTILES))
+    print(f"Pool: {pool['requests_num']} checkouts, {pool['requests_queued']} waited "
+          f"(avg {pool['avg_wait_ms_when_queued']:.1f}ms, total {pool['requests_wait_ms']}ms), "
+          f"{pool['connections_num']} new connections ({pool['new_connections_per_min']:.1f}/min), "
+          f"{pool['connections_lost']} lost, {pool['returns_bad']} bad returns")
+    for error in results["last_errors"]:
+        print(f"Error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20, help="concurrent sessions")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds to run before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between interactions")
+    parser.add_argument("--pool-min", type=int, help="overrides LAKEBASE_POOL_MIN_SIZE")
+    parser.add_argument("--pool-max", type=int, help="overrides LAKEBASE_POOL_MAX_SIZE")
+    parser.add_argument("--no-cache", action="store_true", help="disable the query and part caches")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--save-baseline", help="write results as a baseline to this JSON file")
+    parser.add_argument("--baseline", help="compare against this baseline and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative p95/throughput regression (default 0.2)")
+    args = parser.parse_args()
+
+    # data_access reads the pool size at import
+    if args.pool_min is not None:
+        os.environ["LAKEBASE_POOL_MIN_SIZE"] = str(args.pool_min)
+    if args.pool_max is not None:
+        os.environ["LAKEBASE_POOL_MAX_SIZE"] = str(args.pool_max)
+
+    results = run_load_test(args.users, args.duration, args.warmup, args.mix, args.think_time,
+                            seed=args.seed, no_cache=args.no_cache)
+    print_report(results)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Check that the override listener patches cached overrides from NOTIFY.
+
+Runs against a local Postgres loaded with dummy_data_gen/load_local_postgres.py,
+which installs the override trigger, and checks that:
+
+    insert     an override inserted from a second connection is added to the
+               cached override history without a re-query, and bumps
+               get_overrides_version()
+    reconnect  after the listener's connection is dropped, it reconnects,
+               drops the cached overrides and bumps the version, since
+               notifications may have been missed meanwhile
+
+    python override_listener.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app"))
+
+CHECK_USER = "override_listener_check@example.com"
+CACHE_KEY = ("fetch_overrides",)
+TERMINATE_LISTENER_QUERY = """
+    SELECT pg_terminate_backend(pid) FROM pg_stat_activity
+    WHERE pid <> pg_backend_pid() AND query = %s
+"""
+
+
+def wait_for(condition, timeout):
+    """Poll condition until it is true; return the seconds it took, or None."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if condition():
+            return time.perf_counter() - start
+        time.sleep(0.01)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--timeout", type=float, default=10, help="seconds to wait for each change")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    import data_access
+
+    listener = data_access.override_listener
+    results = {}
+    data_access.start_override_listener()
+    assert wait_for(lambda: data_access.get_overrides_version() > 0, args.timeout) is not None, \
+        "the listener did not connect"
+
+    part_id = data_access.fetch_parts()[0][0]
+    machine = data_access.fetch_machines()[0][0]
+    try:
+        cached = data_access.fetch_overrides()
+        version = data_access.get_overrides_version()
+        notes = f"override listener check {time.time()}"
+        # A second connection, as another app instance or supervisor would use
+        with data_access.LakebaseConnection.connect(data_access.get_conninfo()) as other:
+            other.execute(data_access.ADD_OVERRIDE_QUERY, (part_id, machine, CHECK_USER, notes))
+            committing = time.perf_counter()
+            other.commit()
+            assert wait_for(lambda: data_access.get_overrides_version() > version, args.timeout) is not None, \
+                "the insert did not bump get_overrides_version()"
+            latency = time.perf_counter() - committing
+        hit, patched = data_access.query_cache.peek(CACHE_KEY)
+        assert hit, "the cached overrides were dropped instead of patched"
+        assert len(patched) == len(cached) + 1 and patched[0][4] == notes, \
+            "the inserted override is not at the top of the cached history"
+        results["insert"] = {"notify_ms": round(latency * 1000, 1)}
+
+        version = data_access.get_overrides_version()
+        with data_access.get_connection() as conn:
+            terminated = conn.execute(TERMINATE_LISTENER_QUERY, (f'LISTEN "{listener.channel}"',)).fetchall()
+        assert terminated, "no listener connection found to drop"
+        reconnect = wait_for(lambda: data_access.get_overrides_version() > version,
+                             args.timeout + data_access.LISTENER_RECONNECT_SECONDS)
+        assert reconnect is not None, "reconnecting did not bump get_overrides_version()"
+        assert not data_access.query_cache.peek(CACHE_KEY)[0], "reconnecting kept the cached overrides"
+        results["reconnect"] = {"reconnect_s": round(reconnect, 2)}
+    finally:
+        listener.stop()
+        with data_access.get_connection() as conn:
+            conn.execute(f"DELETE FROM {data_access.SCHEMA}.{data_access.OVERRIDES_TABLE_NAME} WHERE assigned_by = %s",
+                         (CHECK_USER,))
+            conn.commit()
+
+    print(json.dumps(results, indent=2))
+    print("OK: override listener")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
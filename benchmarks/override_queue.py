@@ -0,0 +1,106 @@
+"""Benchmark of the write-behind override queue.
+
+Measures, against a local Postgres loaded with
+dummy_data_gen/load_local_postgres.py:
+
+    submit   latency of add_override (a synchronous INSERT and commit) versus
+             queue_override (a local SQLite append)
+    drain    rows per second written by the queue worker at several batch sizes
+
+    python override_queue.py --submits 200 --rows 2000 --batch-sizes 1 10 100 1000
+
+Overrides written by the benchmark are deleted afterwards.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app"))
+
+BENCHMARK_USER = "override_queue_benchmark@example.com"
+
+
+def time_submits(submit, part_ids, machine):
+    times = []
+    for part_id in part_ids:
+        start = time.perf_counter()
+        submit(part_id, machine, BENCHMARK_USER, "Override queue benchmark")
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "p50_ms": round(statistics.median(times) * 1000, 3),
+        "p95_ms": round(times[int(len(times) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def time_drain(data_access, part_ids, machine, batch_size):
+    """Queue part_ids with no worker running, then time draining them."""
+    from override_queue import OverrideQueue
+
+    with tempfile.TemporaryDirectory() as directory:
+        queue = OverrideQueue(os.path.join(directory, "queue.db"), data_access.write_queued_overrides,
+                              batch_size=batch_size)
+        for part_id in part_ids:
+            queue.enqueue(part_id, machine, BENCHMARK_USER, "Override queue benchmark")
+        start = time.perf_counter()
+        while queue.drain_once():
+            pass
+        elapsed = time.perf_counter() - start
+        stats = queue.stats()
+    if stats["pending"] or stats["failed"]:
+        raise SystemExit(f"Queue did not drain: {stats}")
+    return {"rows_per_s": round(len(part_ids) / elapsed, 1), "batches": stats["batches"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--submits", type=int, default=200, help="submits timed per path")
+    parser.add_argument("--rows", type=int, default=2000, help="overrides drained per batch size")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["OVERRIDE_QUEUE_PATH"] = os.path.join(directory, "queue.db")
+        import data_access
+
+        part_ids = [row[0] for row in data_access.fetch_parts()]
+        machine = data_access.fetch_machines()[0][0]
+        if not part_ids:
+            raise SystemExit("No parts found; load data with dummy_data_gen/load_local_postgres.py first")
+
+        try:
+            submit_ids = [part_ids[i % len(part_ids)] for i in range(args.submits)]
+            results = {
+                "submit": {
+                    "add_override": time_submits(data_access.add_override, submit_ids, machine),
+                    "queue_override": time_submits(data_access.queue_override, submit_ids, machine),
+                },
+                "drain": {},
+            }
+            data_access.override_queue.stop()
+            for name, stats in results["submit"].items():
+                print(f"submit {name:15} p50 {stats['p50_ms']:>8.3f}ms  p95 {stats['p95_ms']:>8.3f}ms")
+
+            drain_ids = [part_ids[i % len(part_ids)] for i in range(args.rows)]
+            for batch_size in args.batch_sizes:
+                stats = time_drain(data_access, drain_ids, machine, batch_size)
+                results["drain"][batch_size] = stats
+                print(f"drain  batch {batch_size:>6}  {stats['rows_per_s']:>10.1f} rows/s  ({stats['batches']} batches)")
+        finally:
+            with data_access.get_connection() as conn:
+                conn.execute(f"DELETE FROM {data_access.SCHEMA}.{data_access.OVERRIDES_TABLE_NAME} WHERE assigned_by = %s",
+                             (BENCHMARK_USER,))
+                conn.commit()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark of the machine load and rebalancing engine.
+
+Times, against a local Postgres loaded with
+dummy_data_gen/load_local_postgres.py (e.g. --parts 100000 --machines 200):
+
+    loads       fetch_machine_loads: the per-machine aggregation query and
+                the NumPy columns built from it
+    parts       fetch_machine_parts for the busiest machine
+    plan        plan_rebalance moving the busiest machine's parts
+
+and, with no database, plan_rebalance moving a synthetic backlog of --parts
+parts onto --machines machines in two shapes:
+
+    uniform     the other machines' backlogs spread evenly over 0-400 hours
+    skewed      one idle machine and the rest at 1e6 hours, so every part
+                lands on the idle one
+
+    python rebalance.py --repeat 5 --parts 100000 --machines 500 --output rebalance.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app"))
+
+
+def median_ms(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 2)
+
+
+def synthetic_backlog(data_access, num_parts, num_machines, skewed=False, seed=1):
+    """Machine loads, and num_parts parts routed to the first machine.
+
+    Loads are uniform over 0-400 hours, or with skewed, 0 hours on the second
+    machine and 1e6 hours on every other.
+    """
+    import numpy as np
+    import pyarrow as pa
+
+    rng = np.random.default_rng(seed)
+    if skewed:
+        backlog_hours = np.full(num_machines, 1e6)
+        backlog_hours[1] = 0
+    else:
+        backlog_hours = rng.uniform(0, 400, num_machines)
+    loads = data_access.build_machine_loads([
+        (f"machine_{i}", 0, float(hours), 0, 0, 0.0) for i, hours in enumerate(backlog_hours)
+    ])
+    parts = pa.table({
+        "part_id": [f"part_{i}" for i in range(num_parts)],
+        "priority": rng.choice(["high", "medium", "low"], num_parts),
+        "due_date": pa.array(np.datetime64("today", "D") + rng.integers(-10, 60, num_parts)).cast(pa.date32()),
+        "estimated_hours": rng.uniform(0.5, 8.0, num_parts),
+    })
+    return loads, parts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per step (median is reported)")
+    parser.add_argument("--parts", type=int, default=100000, help="parts moved in the synthetic run")
+    parser.add_argument("--machines", type=int, default=500, help="machines in the synthetic run")
+    parser.add_argument("--synthetic-only", action="store_true", help="skip the steps that need a database")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    import numpy as np
+    import data_access
+
+    results = {}
+    if not args.synthetic_only:
+        loads = data_access.fetch_machine_loads.uncached()
+        if not len(loads["machine_id"]):
+            raise SystemExit("No routes found; load data with dummy_data_gen/load_local_postgres.py first")
+        machine_id = loads["machine_id"][np.argmax(loads["parts"])]
+        parts = data_access.fetch_machine_parts.uncached(machine_id)
+        results["database"] = {
+            "machines": len(loads["machine_id"]),
+            "parts_moved": parts.num_rows,
+            "loads_ms": median_ms(data_access.fetch_machine_loads.uncached, args.repeat),
+            "parts_ms": median_ms(lambda: data_access.fetch_machine_parts.uncached(machine_id), args.repeat),
+            "plan_ms": median_ms(lambda: data_access.plan_rebalance(loads, parts, machine_id), args.repeat),
+        }
+        stats = results["database"]
+        print(f"database   {stats['machines']:>5} machines  {stats['parts_moved']:>7,} parts moved  "
+              f"loads {stats['loads_ms']:>7.1f}ms  parts {stats['parts_ms']:>7.1f}ms  plan {stats['plan_ms']:>7.1f}ms")
+
+    for name, skewed in (("uniform", False), ("skewed", True)):
+        loads, parts = synthetic_backlog(data_access, args.parts, args.machines, skewed=skewed)
+        # Warm up the imports before timing
+        plan = data_access.plan_rebalance(loads, parts, "machine_0")
+        results[name] = {
+            "machines": args.machines,
+            "parts_moved": args.parts,
+            "plan_ms": median_ms(lambda: data_access.plan_rebalance(loads, parts, "machine_0"), args.repeat),
+            "late_parts": plan.late_parts,
+        }
+        stats = results[name]
+        print(f"{name:10} {stats['machines']:>5} machines  {stats['parts_moved']:>7,} parts moved  "
+              f"plan {stats['plan_ms']:>7.1f}ms  ({stats['late_parts']:,} projected late)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
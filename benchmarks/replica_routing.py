@@ -0,0 +1,128 @@
+"""Check read replica routing against a primary and a streaming standby.
+
+Runs against a local Postgres loaded with dummy_data_gen/load_local_postgres.py
+and a hot standby replicating from it, e.g. one made with
+`pg_basebackup -R` and listening on another port. Checks that:
+
+    reads       read_from_replica reads are served by the standby
+    writes      a read right after a write sees it (read-your-writes)
+    primary     an error from the primary, on a read pinned there after a
+                write, is raised and leaves the replica healthy
+    replica     an error from a query on the standby sends the read to the
+                primary and marks the replica unhealthy
+
+for both the sync and the async API:
+
+    python replica_routing.py --replica-host /tmp/pgstandby --replica-port 5433
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app"))
+
+CHECK_USER = "replica_routing_check@example.com"
+# A WAL position no replica has reached, so reads stay pinned to the primary
+UNREACHED_LSN = "FFFFFFFF/0"
+IN_RECOVERY_QUERY = "SELECT pg_is_in_recovery()"
+# Answered at once by the primary, cancelled by statement_timeout on the standby
+FAILS_ON_REPLICA_QUERY = "SELECT CASE WHEN pg_is_in_recovery() THEN pg_sleep(1) IS NULL ELSE false END"
+SLOW_QUERY = "SELECT pg_sleep(1) IS NULL"
+
+
+def run_sync(data_access, query):
+    @data_access.read_from_replica
+    def read():
+        with data_access.get_connection() as conn:
+            with conn.transaction():
+                conn.execute("SET LOCAL statement_timeout = 100")
+                return conn.execute(query).fetchone()[0]
+    return read()
+
+
+def run_async(data_access_async, query):
+    @data_access_async.read_from_replica
+    async def read():
+        async with data_access_async.get_async_connection() as conn:
+            async with conn.transaction():
+                await conn.execute("SET LOCAL statement_timeout = 100")
+                cur = await conn.execute(query)
+                return (await cur.fetchone())[0]
+    return asyncio.run(read())
+
+
+def check(data_access, run, label):
+    router = data_access.replica_router
+    router._unhealthy_until = 0
+    results = {}
+
+    reads = router.replica_reads
+    assert run(IN_RECOVERY_QUERY) is True, f"{label}: read was not served by the standby"
+    assert router.replica_reads == reads + 1
+    results["reads"] = "standby"
+
+    part_id = data_access.fetch_parts()[0][0]
+    machine = data_access.fetch_machines()[0][0]
+    notes = f"replica routing check ({label})"
+    data_access.add_override(part_id, machine, CHECK_USER, notes)
+    assert any(row[4] == notes for row in data_access.fetch_overrides.uncached()), \
+        f"{label}: the read after a write did not see it"
+    results["writes"] = "read-your-writes"
+
+    failures = router.failures
+    router.record_write(UNREACHED_LSN)
+    try:
+        run(SLOW_QUERY)
+        raise AssertionError(f"{label}: the pinned read should have timed out on the primary")
+    except data_access.ReplicaUnavailable:
+        raise AssertionError(f"{label}: a primary error was treated as a replica failure")
+    except data_access.psycopg.errors.QueryCanceled:
+        pass
+    finally:
+        router.write_replayed(UNREACHED_LSN)
+    assert router.is_healthy() and router.failures == failures, f"{label}: a primary error disabled the replica"
+    results["primary"] = "raised, replica still healthy"
+
+    assert run(FAILS_ON_REPLICA_QUERY) is False, f"{label}: the read was not retried on the primary"
+    assert not router.is_healthy() and router.failures == failures + 1, \
+        f"{label}: a standby error did not mark the replica unhealthy"
+    results["replica"] = "retried on the primary, replica unhealthy"
+    router._unhealthy_until = 0
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--replica-host", required=True, help="standby host or socket directory")
+    parser.add_argument("--replica-port", default="5433", help="standby port")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    os.environ["LAKEBASE_READONLY_HOST"] = args.replica_host
+    os.environ["LAKEBASE_READONLY_PORT"] = args.replica_port
+    os.environ["LAKEBASE_REPLICA_CHECKOUT_TIMEOUT_SECONDS"] = "2"
+    import data_access
+    import data_access_async
+
+    try:
+        results = {
+            "sync": check(data_access, lambda query: run_sync(data_access, query), "sync"),
+            "async": check(data_access, lambda query: run_async(data_access_async, query), "async"),
+        }
+    finally:
+        with data_access.get_connection() as conn:
+            conn.execute(f"DELETE FROM {data_access.SCHEMA}.{data_access.OVERRIDES_TABLE_NAME} WHERE assigned_by = %s",
+                         (CHECK_USER,))
+            conn.commit()
+    print(json.dumps(results, indent=2))
+    print("OK: replica routing")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
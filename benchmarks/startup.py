@@ -0,0 +1,103 @@
+"""Startup benchmark for the shop floor app.
+
+Measures, each in a fresh Python process:
+
+    import      importing Streamlit and data_access
+    first_page  the first full script run of app.py (what the first visitor waits for)
+    rerun       later script runs in the same process (what every click costs)
+
+using Streamlit's AppTest to execute app.py the way the server does. Run it
+before and after a change and compare the JSON:
+
+    python startup.py --runs 5 --output before.json
+
+Uses the same environment as the app (or as load_test.py against a local
+Postgres).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app")
+
+
+def measure_once(reruns):
+    """Measure one cold start and reruns in this process; returns a dict of seconds."""
+    sys.path.insert(0, APP_DIR)
+    start = time.perf_counter()
+    import streamlit  # noqa: F401
+    import data_access  # noqa: F401
+    imported = time.perf_counter()
+
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=60)
+    first_start = time.perf_counter()
+    at.run()
+    first_page = time.perf_counter() - first_start
+    if at.exception:
+        raise SystemExit(at.exception[0].message)
+
+    rerun_times = []
+    for _ in range(reruns):
+        rerun_start = time.perf_counter()
+        at.run()
+        rerun_times.append(time.perf_counter() - rerun_start)
+    return {
+        "import_s": imported - start,
+        "first_page_s": first_page,
+        "rerun_s": statistics.median(rerun_times) if rerun_times else None,
+    }
+
+
+def summarize(samples):
+    result = {}
+    for name in samples[0]:
+        values = [sample[name] for sample in samples if sample[name] is not None]
+        if values:
+            result[name] = {
+                "median_ms": round(statistics.median(values) * 1000, 2),
+                "min_ms": round(min(values) * 1000, 2),
+                "max_ms": round(max(values) * 1000, 2),
+            }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts, each in a new process")
+    parser.add_argument("--reruns", type=int, default=10, help="reruns measured per process")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure_once(args.reruns)))
+        return
+
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--reruns", str(args.reruns)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"runs": args.runs, "reruns": args.reruns},
+        "startup": summarize(samples),
+    }
+    for name, stats in results["startup"].items():
+        print(f"{name:14}median {stats['median_ms']:>9.1f}ms  min {stats['min_ms']:>9.1f}ms  max {stats['max_ms']:>9.1f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
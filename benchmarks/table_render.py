@@ -0,0 +1,96 @@
+"""Micro-benchmark of the routes table rendering paths.
+
+Compares, at several table sizes:
+
+    styler    the original path: Styler.to_html() in a scrollable container
+    windowed  render_table_html, which renders at most TABLE_MAX_ROWS rows
+    cached    a TableHtmlCache hit for unchanged data
+
+reporting the render time and the HTML payload size:
+
+    python table_render.py --rows 1000 10000 100000 --output table_render.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app"))
+
+from table_styling import (  # noqa: E402
+    get_table_styles,
+    render_table_html,
+    TableHtmlCache,
+)
+
+COLUMNS = ['part_id', 'priority', 'due_date', 'recommended_machine_id', 'effective_machine_id', 'route_confidence']
+
+
+def make_rows(num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    today = date.today()
+    return [
+        (f"part_{i + 1}", priority, today + timedelta(days=int(offset)), f"machine_{m}", f"machine_{e}", float(conf))
+        for i, (priority, offset, m, e, conf) in enumerate(zip(
+            rng.choice(["high", "medium", "low"], num_rows),
+            rng.integers(-30, 365, num_rows),
+            rng.integers(1, 21, num_rows),
+            rng.integers(1, 21, num_rows),
+            rng.uniform(0.7, 1.0, num_rows),
+        ))
+    ]
+
+
+def time_render(render, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = render()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 3), len(output.encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3, help="renders per measurement (median is reported)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for num_rows in args.rows:
+        rows = make_rows(num_rows)
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        cache = TableHtmlCache()
+
+        def styler():
+            # As the app rendered the table before render_table_html
+            table_html = df.style.set_table_styles(get_table_styles()).to_html()
+            return (f'<div style="max-height: 400px; overflow-y: auto; border-radius: 8px; '
+                    f'box-shadow: 0 4px 16px rgba(0,0,0,0.1); width: 100%;">{table_html}</div>')
+
+        def windowed():
+            return render_table_html(COLUMNS, rows)
+
+        def cached():
+            return cache.get_or_render(("routes",), (rows,), windowed)
+
+        cached()  # measure hits only
+
+        for name, render in (("styler", styler), ("windowed", windowed), ("cached", cached)):
+            render_ms, payload_bytes = time_render(render, args.repeat)
+            results.append({"rows": num_rows, "path": name, "render_ms": render_ms, "payload_bytes": payload_bytes})
+            print(f"{num_rows:>8} rows  {name:9} {render_ms:>10.2f}ms {payload_bytes:>12,} bytes")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Check that OAuth token rotation never rebuilds the connection pool.
+
+Runs queries against a local Postgres (see dummy_data_gen/load_local_postgres.py)
+for --duration seconds with LAKEBASE_TOKEN_REFRESH_SECONDS set to
+--refresh-seconds, so the token expires several times. The token generator is
+wrapped to count calls. The check fails unless the token rotated at least
+--min-rotations times, every query succeeded and `connection_pool` stayed
+the same object throughout:
+
+    python token_rotation.py --refresh-seconds 1 --duration 6 --min-rotations 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--refresh-seconds", type=int, default=1, help="token refresh interval")
+    parser.add_argument("--duration", type=float, default=6, help="seconds to run queries for")
+    parser.add_argument("--min-rotations", type=int, default=3, help="token refreshes required after the first")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    os.environ["LAKEBASE_TOKEN_REFRESH_SECONDS"] = str(args.refresh_seconds)
+    # Recycle connections quickly too, so new logins use the rotated tokens
+    os.environ.setdefault("LAKEBASE_POOL_MAX_LIFETIME_SECONDS", str(args.refresh_seconds * 2))
+    import data_access
+
+    provider = data_access.credential_provider
+    generate_token = provider._generate_token
+    calls = []
+
+    def counting_generate_token():
+        calls.append(time.time())
+        return generate_token()
+
+    provider._generate_token = counting_generate_token
+
+    pool = data_access.get_connection_pool()
+    queries = 0
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        with data_access.get_connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+        queries += 1
+        assert data_access.connection_pool is pool, "the connection pool was rebuilt"
+        time.sleep(0.05)
+    provider.stop()
+
+    rotations = len(calls) - 1
+    results = {
+        "token_generations": len(calls),
+        "rotations": rotations,
+        "queries": queries,
+        "pool_rebuilds": 0 if data_access.connection_pool is pool else 1,
+        "pool_stats": pool.get_stats(),
+    }
+    print(json.dumps(results, indent=2))
+    assert data_access.connection_pool is pool, "the connection pool was rebuilt"
+    assert rotations >= args.min_rotations, f"expected {args.min_rotations} rotations, saw {rotations}"
+    print(f"OK: {rotations} token rotations, {queries} queries, one pool")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Vectorized synthetic data for the shop floor demo.
+
+Produces the same tables as data_gen.ipynb (part_backlog, recommended_routes)
+plus an assignment_overrides history, at any scale. Every column is sampled
+with NumPy in one shot, so millions of parts take seconds rather than the
+minutes a Python loop would.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+
+PRIORITIES = ["high", "medium", "low"]
+MATERIALS = ["Steel", "Aluminum", "Titanium", "Carbon Fiber", "Plastic", "Ceramic", "Copper", "Brass"]
+PART_TYPES = ["Bracket", "Housing", "Shaft", "Gear", "Bearing", "Valve", "Connector", "Mount", "Cover", "Assembly"]
+QUALITY_LEVELS = ["A", "B", "C", "Military", "Aerospace", "Medical"]
+SURFACE_FINISHES = ["Anodized", "Powder Coated", "Chrome Plated", "Raw", "Painted", "Polished"]
+TOLERANCES = ["±0.001", "±0.005", "±0.010", "±0.025", "±0.050"]
+REVISIONS = ["Rev A", "Rev B", "Rev C", "Rev D"]
+OVERRIDE_REASONS = [
+    "Maintenance required",
+    "Machine down",
+    "Tooling change",
+    "Operator unavailable",
+    "Expedite for customer",
+    "Quality hold on recommended machine",
+]
+
+# Share of parts in each due date bucket, and each bucket's range in days
+# relative to the as-of date. Mirrors the notebook: 20% overdue, 30% due within
+# a week, 30% due in 2-4 weeks and 20% long-term.
+DUE_DATE_MIX = {
+    "overdue": (0.2, -30, -1),
+    "due_soon": (0.3, 0, 7),
+    "upcoming": (0.3, 8, 28),
+    "long_term": (0.2, 29, 365),
+}
+
+PART_BACKLOG_COLUMNS = [
+    "part_id", "priority", "quantity_pending", "due_date", "material", "part_type",
+    "quality_level", "surface_finish", "tolerance", "weight_kg", "dimensions",
+    "drawing_number", "revision", "estimated_hours", "part_num",
+]
+RECOMMENDED_ROUTES_COLUMNS = PART_BACKLOG_COLUMNS + ["recommended_machine_id", "route_confidence"]
+ASSIGNMENT_OVERRIDES_COLUMNS = ["part_id", "assigned_machine_id", "assigned_by", "assigned_at", "notes"]
+
+
+@dataclass
+class SyntheticDataset:
+    """Generated tables, as pandas DataFrames."""
+    part_backlog: pd.DataFrame
+    recommended_routes: pd.DataFrame
+    assignment_overrides: pd.DataFrame
+    machines: list
+
+
+def _strings(numbers, low, high):
+    # Format small ints through a lookup table instead of one str() per row
+    table = np.array([str(i) for i in range(low, high + 1)], dtype=object)
+    return table[numbers - low]
+
+
+def _choice(rng, values, size):
+    # Categoricals keep one copy of each value, however many rows there are
+    return pd.Categorical.from_codes(rng.integers(0, len(values), size), categories=values)
+
+
+def sample_due_dates(rng, num_parts, as_of, due_date_mix=None):
+    """Sample due dates from a mix of {bucket: (share, first_day, last_day)}."""
+    due_date_mix = due_date_mix or DUE_DATE_MIX
+    shares = np.array([share for share, _, _ in due_date_mix.values()], dtype=float)
+    low = np.array([first for _, first, _ in due_date_mix.values()])
+    high = np.array([last for _, _, last in due_date_mix.values()])
+    bucket = rng.choice(len(shares), size=num_parts, p=shares / shares.sum())
+    offsets = rng.integers(low[bucket], high[bucket] + 1)
+    return np.datetime64(as_of, "D") + offsets.astype("timedelta64[D]")
+
+
+def generate_part_backlog(num_parts, rng, as_of, due_date_mix=None):
+    """Generate part_backlog with the notebook's column semantics."""
+    part_num = np.arange(1, num_parts + 1, dtype=np.int32)
+    part_id = np.array([f"part_{i}" for i in range(1, num_parts + 1)], dtype=object)
+    dimensions = (
+        _strings(rng.integers(10, 501, num_parts), 10, 500) + "x"
+        + _strings(rng.integers(10, 501, num_parts), 10, 500) + "x"
+        + _strings(rng.integers(5, 201, num_parts), 5, 200) + "mm"
+    )
+    drawing_number = (
+        "DW-" + _strings(rng.integers(1000, 10000, num_parts), 1000, 9999)
+        + "-" + _strings(rng.integers(1, 100, num_parts), 1, 99)
+    )
+    return pd.DataFrame({
+        "part_id": part_id,
+        "priority": _choice(rng, PRIORITIES, num_parts),
+        "quantity_pending": rng.integers(10, 101, num_parts, dtype=np.int32),
+        "due_date": sample_due_dates(rng, num_parts, as_of, due_date_mix),
+        "material": _choice(rng, MATERIALS, num_parts),
+        "part_type": _choice(rng, PART_TYPES, num_parts),
+        "quality_level": _choice(rng, QUALITY_LEVELS, num_parts),
+        "surface_finish": _choice(rng, SURFACE_FINISHES, num_parts),
+        "tolerance": _choice(rng, TOLERANCES, num_parts),
+        "weight_kg": np.round(rng.uniform(0.1, 50.0, num_parts), 2),
+        "dimensions": dimensions,
+        "drawing_number": drawing_number,
+        "revision": _choice(rng, REVISIONS, num_parts),
+        "estimated_hours": np.round(rng.uniform(0.5, 8.0, num_parts), 1),
+        "part_num": part_num,
+    }, columns=PART_BACKLOG_COLUMNS)
+
+
+def generate_recommended_routes(part_backlog, machines, rng):
+    """Add a recommended machine and a 0.7-1.0 route confidence to each part."""
+    num_parts = len(part_backlog)
+    routes = part_backlog.copy()
+    routes["recommended_machine_id"] = _choice(rng, machines, num_parts)
+    routes["route_confidence"] = rng.uniform(0.7, 1.0, num_parts)
+    return routes
+
+
+def generate_assignment_overrides(part_backlog, machines, rng, override_depth, as_of,
+                                  history_days=90, num_supervisors=25):
+    """Generate override history, override_depth overrides per part on average.
+
+    Each part gets a Poisson-distributed number of overrides, spread uniformly
+    over the history_days before as_of.
+    """
+    counts = rng.poisson(override_depth, len(part_backlog))
+    num_overrides = int(counts.sum())
+    start = np.datetime64(datetime.combine(as_of, datetime.min.time()) - timedelta(days=history_days), "us")
+    offsets = rng.integers(0, history_days * 86_400_000_000, num_overrides).astype("timedelta64[us]")
+    supervisors = [f"supervisor_{i}@example.com" for i in range(1, num_supervisors + 1)]
+    return pd.DataFrame({
+        "part_id": np.repeat(part_backlog["part_id"].to_numpy(dtype=object), counts),
+        "assigned_machine_id": _choice(rng, machines, num_overrides),
+        "assigned_by": _choice(rng, supervisors, num_overrides),
+        "assigned_at": start + offsets,
+        "notes": _choice(rng, OVERRIDE_REASONS, num_overrides),
+    }, columns=ASSIGNMENT_OVERRIDES_COLUMNS)
+
+
+def generate_dataset(num_parts=50, num_machines=5, override_depth=0.0, due_date_mix=None,
+                     as_of=None, seed=None):
+    """Generate part_backlog, recommended_routes and assignment_overrides.
+
+    num_parts: number of parts in the backlog
+    num_machines: machines routes are spread across, named machine_1..machine_N
+    override_depth: average number of overrides per part
+    due_date_mix: {bucket: (share, first_day, last_day)}, see DUE_DATE_MIX
+    as_of: date the due dates and override history are relative to (today)
+    seed: seed for reproducible data
+    """
+    rng = np.random.default_rng(seed)
+    as_of = as_of or date.today()
+    machines = [f"machine_{i}" for i in range(1, num_machines + 1)]
+    part_backlog = generate_part_backlog(num_parts, rng, as_of, due_date_mix)
+    return SyntheticDataset(
+        part_backlog=part_backlog,
+        recommended_routes=generate_recommended_routes(part_backlog, machines, rng),
+        assignment_overrides=generate_assignment_overrides(part_backlog, machines, rng, override_depth, as_of),
+        machines=machines,
+    )
@@ -0,0 +1,277 @@
+"""Load generated data into a local Postgres with the app's schema.
+
+Creates the schema, tables, indexes and override trigger that the Lakebase
+setup notebook provisions, using the same LAKEBASE_* env vars as the app, then
+bulk loads a generated dataset with COPY. Point the app at the same database
+to reproduce performance work off-platform.
+
+    python load_local_postgres.py --parts 1000000 --machines 200 --override-depth 2
+
+Connection settings come from the standard libpq env vars (PGHOST, PGPORT,
+PGDATABASE, PGUSER, PGPASSWORD) or --dsn.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import psycopg
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from generator import (
+    generate_dataset,
+    ASSIGNMENT_OVERRIDES_COLUMNS,
+    PART_BACKLOG_COLUMNS,
+    RECOMMENDED_ROUTES_COLUMNS,
+)
+
+SCHEMA = os.getenv('LAKEBASE_SCHEMA', 'mfg_lakebase_demo')
+ROUTES_TABLE_NAME = os.getenv('LAKEBASE_ROUTES_TABLE_NAME', 'recommended_routes_synced_table')
+OVERRIDES_TABLE_NAME = os.getenv('LAKEBASE_OVERRIDES_TABLE_NAME', 'assignment_overrides')
+PART_LOOKUP_TABLE_NAME = os.getenv('LAKEBASE_PART_LOOKUP_TABLE_NAME', 'part_backlog_synced_table')
+OVERRIDES_CHANNEL = os.getenv('LAKEBASE_OVERRIDES_CHANNEL', f"{OVERRIDES_TABLE_NAME}_changed")
+
+COPY_CHUNK_ROWS = 100_000
+
+PART_BACKLOG_DDL = """
+    part_id VARCHAR(255),
+    priority TEXT,
+    quantity_pending INTEGER,
+    due_date DATE,
+    material TEXT,
+    part_type TEXT,
+    quality_level TEXT,
+    surface_finish TEXT,
+    tolerance TEXT,
+    weight_kg DOUBLE PRECISION,
+    dimensions TEXT,
+    drawing_number TEXT,
+    revision TEXT,
+    estimated_hours DOUBLE PRECISION,
+    part_num INTEGER
+"""
+
+CREATE_TABLES = [
+    f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}",
+    f"DROP TABLE IF EXISTS {SCHEMA}.{PART_LOOKUP_TABLE_NAME}, {SCHEMA}.{ROUTES_TABLE_NAME}, {SCHEMA}.{OVERRIDES_TABLE_NAME}",
+    f"CREATE TABLE {SCHEMA}.{PART_LOOKUP_TABLE_NAME} ({PART_BACKLOG_DDL})",
+    f"""CREATE TABLE {SCHEMA}.{ROUTES_TABLE_NAME} ({PART_BACKLOG_DDL},
+        recommended_machine_id TEXT,
+        route_confidence DOUBLE PRECISION
+    )""",
+    f"""CREATE TABLE {SCHEMA}.{OVERRIDES_TABLE_NAME} (
+        part_id VARCHAR(255),
+        assigned_machine_id VARCHAR(255),
+        assigned_by VARCHAR(255),
+        assigned_at TIMESTAMP,
+        notes TEXT
+    )""",
+]
+
+# Keys and indexes are built after loading, which is much faster than
+# maintaining them row by row during COPY
+ADD_KEYS = [
+    f"ALTER TABLE {SCHEMA}.{PART_LOOKUP_TABLE_NAME} ADD PRIMARY KEY (part_id)",
+    f"ALTER TABLE {SCHEMA}.{ROUTES_TABLE_NAME} ADD PRIMARY KEY (part_id)",
+    # Bulk override merges upsert on (part_id, assigned_at); newest first also
+    # makes the latest override per part a single index seek
+    f"CREATE UNIQUE INDEX ON {SCHEMA}.{OVERRIDES_TABLE_NAME} (part_id, assigned_at DESC)",
+]
+
+CREATE_INDEXES = [
+    f"CREATE INDEX ON {SCHEMA}.{ROUTES_TABLE_NAME} (due_date, part_id)",
+    f"CREATE INDEX ON {SCHEMA}.{ROUTES_TABLE_NAME} (priority, part_id)",
+    f"CREATE INDEX ON {SCHEMA}.{ROUTES_TABLE_NAME} (recommended_machine_id, part_id)",
+    f"CREATE INDEX ON {SCHEMA}.{ROUTES_TABLE_NAME} (route_confidence, part_id)",
+    f"CREATE INDEX ON {SCHEMA}.{ROUTES_TABLE_NAME} (priority DESC, due_date)",
+    f"CREATE INDEX ON {SCHEMA}.{ROUTES_TABLE_NAME} (part_num)",
+    f"CREATE INDEX ON {SCHEMA}.{PART_LOOKUP_TABLE_NAME} (due_date)",
+    f'CREATE INDEX ON {SCHEMA}.{PART_LOOKUP_TABLE_NAME} ((lower(part_id) COLLATE "C"))',
+    f'CREATE INDEX ON {SCHEMA}.{PART_LOOKUP_TABLE_NAME} ((lower(drawing_number) COLLATE "C"))',
+    f'CREATE INDEX ON {SCHEMA}.{PART_LOOKUP_TABLE_NAME} ((lower(material) COLLATE "C"), part_id)',
+]
+
+# Fuzzy part search, where the pg_trgm extension is available
+CREATE_TRIGRAM_INDEXES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+] + [
+    f"CREATE INDEX ON {SCHEMA}.{PART_LOOKUP_TABLE_NAME} USING gist ({column} gist_trgm_ops)"
+    for column in ('part_id', 'drawing_number', 'material')
+]
+
+# Same trigger as lakebase_setup, so LISTEN/NOTIFY works locally too
+CREATE_TRIGGERS = [
+    f"""CREATE OR REPLACE FUNCTION {SCHEMA}.notify_{OVERRIDES_TABLE_NAME}_changed()
+    RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+      row_count bigint;
+      changed_rows json;
+      payload text;
+    BEGIN
+      IF TG_OP = 'INSERT' THEN
+        SELECT count(*) INTO row_count FROM new_rows;
+        IF row_count <= 20 THEN
+          SELECT json_agg(json_build_object(
+            'part_id', part_id,
+            'assigned_machine_id', assigned_machine_id,
+            'assigned_by', assigned_by,
+            'assigned_at', assigned_at,
+            'notes', notes
+          )) INTO changed_rows FROM new_rows;
+        END IF;
+      END IF;
+      payload := json_build_object('op', TG_OP, 'count', row_count, 'rows', changed_rows)::text;
+      IF length(payload) > 7900 THEN
+        payload := json_build_object('op', TG_OP, 'count', row_count)::text;
+      END IF;
+      PERFORM pg_notify('{OVERRIDES_CHANNEL}', payload);
+      RETURN NULL;
+    END;
+    $$""",
+    f"""CREATE OR REPLACE TRIGGER {OVERRIDES_TABLE_NAME}_notify_insert
+    AFTER INSERT ON {SCHEMA}.{OVERRIDES_TABLE_NAME}
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.notify_{OVERRIDES_TABLE_NAME}_changed()""",
+    f"""CREATE OR REPLACE TRIGGER {OVERRIDES_TABLE_NAME}_notify_change
+    AFTER UPDATE OR DELETE OR TRUNCATE ON {SCHEMA}.{OVERRIDES_TABLE_NAME}
+    FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.notify_{OVERRIDES_TABLE_NAME}_changed()""",
+]
+
+
+def copy_dataframe(cur, table, df, columns):
+    """Stream a DataFrame into table with COPY, one CSV chunk at a time.
+
+    Arrow's CSV writer is several times faster than DataFrame.to_csv, which
+    would otherwise dominate the load.
+    """
+    arrow_table = pa.Table.from_pandas(df[columns], preserve_index=False)
+    options = pa_csv.WriteOptions(include_header=False)
+    with cur.copy(f"COPY {SCHEMA}.{table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)") as copy:
+        for start in range(0, len(df), COPY_CHUNK_ROWS):
+            buffer = io.BytesIO()
+            pa_csv.write_csv(arrow_table.slice(start, COPY_CHUNK_ROWS), buffer, options)
+            copy.write(buffer.getvalue())
+
+
+def load_dataset(conn, dataset, create_indexes=True):
+    """Recreate the app's tables and load dataset into them in one transaction."""
+    with conn.transaction():
+        with conn.cursor() as cur:
+            for statement in CREATE_TABLES:
+                cur.execute(statement)
+            copy_dataframe(cur, PART_LOOKUP_TABLE_NAME, dataset.part_backlog, PART_BACKLOG_COLUMNS)
+            copy_dataframe(cur, ROUTES_TABLE_NAME, dataset.recommended_routes, RECOMMENDED_ROUTES_COLUMNS)
+            copy_dataframe(cur, OVERRIDES_TABLE_NAME, dataset.assignment_overrides, ASSIGNMENT_OVERRIDES_COLUMNS)
+            for statement in ADD_KEYS:
+                cur.execute(statement)
+            if create_indexes:
+                for statement in CREATE_INDEXES:
+                    cur.execute(statement)
+                try:
+                    with conn.transaction():
+                        for statement in CREATE_TRIGRAM_INDEXES:
+                            cur.execute(statement)
+                except psycopg.Error as e:
+                    print(f"pg_trgm unavailable, part search will be prefix-only: {e}")
+            for statement in CREATE_TRIGGERS:
+                cur.execute(statement)
+    with conn.cursor() as cur:
+        conn.autocommit = True
+        for table in (PART_LOOKUP_TABLE_NAME, ROUTES_TABLE_NAME, OVERRIDES_TABLE_NAME):
+            cur.execute(f"ANALYZE {SCHEMA}.{table}")
+
+
+def import_data_access():
+    """Import the app's data_access module, pointed at the tables loaded here."""
+    # data_access reads the same LAKEBASE_* env vars, without defaults
+    for name, value in (("LAKEBASE_SCHEMA", SCHEMA), ("LAKEBASE_ROUTES_TABLE_NAME", ROUTES_TABLE_NAME),
+                        ("LAKEBASE_OVERRIDES_TABLE_NAME", OVERRIDES_TABLE_NAME),
+                        ("LAKEBASE_PART_LOOKUP_TABLE_NAME", PART_LOOKUP_TABLE_NAME)):
+        os.environ[name] = value
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shop_floor_app"))
+    import data_access
+    return data_access
+
+
+def check_indexes(conn):
+    """Run the app's index_usage() check on the loaded tables and print it.
+
+    Returns False if any indexed dashboard query cannot use an index.
+    """
+    index_usage = import_data_access().index_usage
+
+    with conn.transaction():
+        with conn.cursor() as cur:
+            usage = index_usage(cur)
+    for name, uses_index in usage.items():
+        print(f"  {name:15} {'uses an index' if uses_index else 'NO INDEX'}")
+    return all(usage.values())
+
+
+def misspell(text):
+    """Double the middle character, e.g. DW-2913-79 -> DW-29113-79."""
+    middle = len(text) // 2
+    return text[:middle] + text[middle] + text[middle:]
+
+
+def check_fuzzy_search(conn):
+    """Search for a misspelled drawing number with the app's part search query.
+
+    Returns None without pg_trgm, else whether the part was among the matches.
+    """
+    data_access = import_data_access()
+
+    with conn.cursor() as cur:
+        if not cur.execute(data_access.TRIGRAM_AVAILABLE_QUERY).fetchone()[0]:
+            return None
+        part_id, drawing_number = cur.execute(
+            f"SELECT part_id, drawing_number FROM {SCHEMA}.{PART_LOOKUP_TABLE_NAME} "
+            "WHERE drawing_number IS NOT NULL ORDER BY part_id LIMIT 1"
+        ).fetchone()
+        query = misspell(drawing_number)
+        cur.execute(data_access.build_part_search_query(True),
+                    data_access.part_search_params(query, data_access.PART_SEARCH_LIMIT))
+        matched_on = {row[0]: row[3] for row in cur.fetchall()}
+    found = f"found {part_id} by {matched_on[part_id]}" if part_id in matched_on else f"did NOT find {part_id}"
+    print(f"  {query!r} (for {drawing_number}) {found}")
+    return part_id in matched_on
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dsn", default="", help="libpq connection string (defaults to PG* env vars)")
+    parser.add_argument("--parts", type=int, default=50)
+    parser.add_argument("--machines", type=int, default=5)
+    parser.add_argument("--override-depth", type=float, default=0.0, help="average overrides per part")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-indexes", action="store_true", help="skip the app's indexes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset = generate_dataset(
+        num_parts=args.parts,
+        num_machines=args.machines,
+        override_depth=args.override_depth,
+        seed=args.seed,
+    )
+    generated = time.perf_counter()
+    print(f"Generated {len(dataset.part_backlog)} parts and "
+          f"{len(dataset.assignment_overrides)} overrides in {generated - start:.1f}s")
+
+    with psycopg.connect(args.dsn) as conn:
+        load_dataset(conn, dataset, create_indexes=not args.no_indexes)
+        print(f"Loaded into {SCHEMA} in {time.perf_counter() - generated:.1f}s")
+        if not args.no_indexes:
+            print("Index check:")
+            if not check_indexes(conn):
+                raise SystemExit("Some dashboard queries cannot use an index")
+            print("Fuzzy part search check:")
+            fuzzy_found = check_fuzzy_search(conn)
+            if fuzzy_found is None:
+                print("  skipped, pg_trgm is not installed")
+            elif not fuzzy_found:
+                raise SystemExit("Fuzzy part search did not match a misspelled drawing number")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,108 @@
+import importlib
+import inspect
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
 import streamlit as st
-from databricks import sdk
 from data_access import (
-    fetch_recommended_routes,
-    fetch_machines,
-    fetch_parts,
-    fetch_overrides,
+    fetch_dashboard_snapshot,
+    fetch_routes_page,
+    fetch_effective_routes,
     add_override,
+    queue_override,
+    start_override_queue,
+    fetch_queued_overrides,
+    retry_failed_overrides,
+    get_override_queue_stats,
+    OVERRIDE_WRITE_BEHIND,
+    add_overrides_bulk,
+    fetch_machine_loads,
+    propose_rebalance,
+    MACHINE_HOURS_PER_DAY,
+    CAPACITY_HORIZON_DAYS,
     part_lookup,
-    count_overdue_parts
+    search_parts,
+    prefetch_parts,
+    start_override_listener,
+    get_overrides_version,
+    start_metrics_export,
+    get_query_metrics,
+    get_background_metrics,
+    get_pool_stats,
+    get_replica_stats,
+    get_cache_stats,
+    get_part_cache_stats,
+    render_metrics,
+    prewarm_connection_pool,
+    start_snapshot_refresh,
+    get_snapshot_status
 )
-from table_styling import get_table_styles, create_scrollable_table
+from query_metrics import last_trace
+from table_styling import get_table_css, render_table_html, table_html_cache
 
-# Get user information
-workspace_client = sdk.WorkspaceClient()
+# Sort options for the Recommended Routes tab, mapped to their SQL columns
+ROUTE_SORT_OPTIONS = {
+    "Part ID": "part_id",
+    "Priority": "priority",
+    "Due Date": "due_date",
+    "Recommended Machine": "recommended_machine_id",
+    "Route Confidence": "route_confidence"
+}
+
+# Streamlit re-executes this script on every rerun, so anything expensive at
+# the top level has to be cached for the process (see data_access) or here.
+# The signed-in user comes from the request headers, with no API call.
 user_email = st.context.headers.get('X-Forwarded-Email')
-user = workspace_client.current_user.me().user_name
+
+@st.cache_resource
+def start_background_imports():
+    """Import pandas off the script thread while the first page loads its data."""
+    threading.Thread(target=importlib.import_module, args=("pandas",), daemon=True).start()
+
+# Start opening database connections while the page renders
+prewarm_connection_pool()
+start_background_imports()
+
+# How often open sessions check for overrides made elsewhere (0 disables).
+# This only reads an in-process counter kept by the override listener, so it
+# costs no database queries.
+AUTO_REFRESH_SECONDS = int(os.getenv('AUTO_REFRESH_SECONDS', '5'))
+
+# Show the query timing tab (per-phase latencies, pool and cache counters)
+SHOW_DIAGNOSTICS = os.getenv('SHOW_DIAGNOSTICS', 'false').lower() == 'true'
+
+def watch_overrides():
+    """Rerun the page when the override listener reports a change, or when
+    reads switch between Lakebase and the saved snapshot."""
+    version = (get_overrides_version(), get_snapshot_status()["mode"])
+    if st.session_state.setdefault("page_version", version) != version:
+        st.session_state.page_version = version
+        st.rerun()
+
+if AUTO_REFRESH_SECONDS and hasattr(st, "fragment"):
+    watch_overrides = st.fragment(run_every=AUTO_REFRESH_SECONDS)(watch_overrides)
+
+# Search on each keystroke where this Streamlit supports it, else on Enter
+SEARCH_INPUT_ARGS = {"live": True} if "live" in inspect.signature(st.text_input).parameters else {}
+
+def part_search(key, label):
+    """Typeahead part picker: a search box and the top matches for it."""
+    query = st.text_input(label, key=f"{key}_query", placeholder="Part ID, drawing number or material",
+                          **SEARCH_INPUT_ARGS).strip()
+    matches = search_parts(query)
+    if query and not matches:
+        st.caption("No matching parts")
+    labels = {part_id: f"{part_id} · {drawing_number} · {material}" for part_id, drawing_number, material, _ in matches}
+    # Keyed by the query, so new matches start from the top match
+    return st.selectbox("Matching parts:", list(labels), format_func=labels.get, key=f"{key}_{query}")
+
+# Load external CSS file, once per process
+@st.cache_resource
+def load_css():
+    css_path = os.path.join(os.path.dirname(__file__), 'styles.css')
+    with open(css_path, 'r') as f:
+        return f.read() + "\n" + get_table_css()
 
 # Streamlit UI
 def main():
@@ -25,14 +113,6 @@ def main():
     )
     
     
-    # Load external CSS file
-    import os
-    
-    def load_css():
-        css_path = os.path.join(os.path.dirname(__file__), 'styles.css')
-        with open(css_path, 'r') as f:
-            return f.read()
-    
     st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
     
     # Modern dashboard header
@@ -43,17 +123,46 @@ def main():
     </div>
     """.format(user_email), unsafe_allow_html=True)
 
+    # Serve the saved snapshot until Lakebase answers, and while it is down
+    start_snapshot_refresh()
+
+    # Refresh when another supervisor changes overrides
+    start_override_listener()
+    start_metrics_export()
+    if OVERRIDE_WRITE_BEHIND:
+        start_override_queue()
+    if AUTO_REFRESH_SECONDS:
+        watch_overrides()
+
     # Load data
+    status_before_load = get_snapshot_status()
     try:
-        recommended_routes_data = fetch_recommended_routes()
-        machines_data = fetch_machines() 
-        overrides_data = fetch_overrides()
-        parts_data = fetch_parts()
-        overdue_count = count_overdue_parts()
+        snapshot = fetch_dashboard_snapshot()
+        machines_data = snapshot.machines
+        overrides_data = snapshot.overrides
+        overdue_count = snapshot.overdue_count
     except Exception as e:
         st.error(f"❌ Error loading data: {str(e)}")
         st.stop()
 
+    # Flag data from the saved snapshot, including a first load that finished
+    # while this page was loading. While Lakebase is down the app is read-only,
+    # unless overrides can wait in the write-behind queue.
+    snapshot_status = get_snapshot_status()
+    if snapshot_status["mode"] == "live":
+        snapshot_status = status_before_load
+    mode = snapshot_status["mode"]
+    offline = mode == "offline"
+    read_only = offline and not OVERRIDE_WRITE_BEHIND
+    saved_at = snapshot_status["saved_at"] and datetime.fromisoformat(snapshot_status["saved_at"]).astimezone().strftime("%Y-%m-%d %H:%M")
+    if mode == "stale":
+        st.info(f"⏳ Showing data saved at {saved_at} while live data loads")
+    elif offline:
+        st.warning(
+            f"⚠️ Lakebase is unavailable, showing data saved at {saved_at}. "
+            + ("Overrides are queued until it is back." if OVERRIDE_WRITE_BEHIND else "Overrides are disabled until it is back.")
+        )
+
     # Shop Floor Metrics - Modern Cards
     col1, col2, col3, col4 = st.columns(4)
     
@@ -77,10 +186,10 @@ def main():
             <div class="metric-value" style="color: #4444ff;">{}</div>
             <div class="metric-description" style="color: #6666ff;">In Production Queue</div>
         </div>
-        """.format(len(recommended_routes_data)), unsafe_allow_html=True)
+        """.format(snapshot.total_parts), unsafe_allow_html=True)
     
     with col3:
-        high_priority = len([r for r in recommended_routes_data if r[1] == "high"])
+        high_priority = snapshot.high_priority_parts
         st.markdown("""
         <div class="metric-card" style="min-height: 200px; display: flex; flex-direction: column; justify-content: center;">
             <h2 class="metric-header">High Priority Parts</h2>
@@ -105,45 +214,73 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    tab1, tab2, tab3 = st.tabs([
+    tab_names = [
         "📋 **Recommended Routes**", 
         "🔍 **Part Lookup**", 
         "🔧 **Manual Overrides**"
-    ])
+    ]
+    if SHOW_DIAGNOSTICS:
+        tab_names.append("📈 **Diagnostics**")
+    tab1, tab2, tab3, *diagnostics_tab = st.tabs(tab_names)
     
     with tab1:
         # st.subheader("📋 Recommended Part to Machine Routes")
         try:
-            if recommended_routes_data:
-                import pandas as pd
-                pd_recommended_routes = pd.DataFrame(recommended_routes_data, columns=['part_id', 'priority', 'quantity_pending', 'due_date', 'recommended_machine_id', 'route_confidence'])
-                summary_df = pd_recommended_routes[['part_id', 'priority', 'due_date', 'recommended_machine_id', 'route_confidence']]
-                
+            if snapshot.total_parts:
                 st.markdown('<p class="instruction-text">For more detailed part information, use the Part Lookup tab</p>', unsafe_allow_html=True)
                 
                 # Add simple sorting controls
                 col1, col2 = st.columns([1, 1])
                 with col1:
-                    sort_by = st.selectbox("Sort by:", ["Part ID", "Priority", "Due Date", "Recommended Machine", "Route Confidence"])
+                    sort_by = st.selectbox("Sort by:", list(ROUTE_SORT_OPTIONS))
                 with col2:
                     sort_order = st.selectbox("Order:", ["Ascending", "Descending"])
                 
-                # Apply sorting
-                if sort_by == "Part ID":
-                    summary_df = summary_df.sort_values('part_id', ascending=(sort_order == "Ascending"))
-                elif sort_by == "Priority":
-                    summary_df = summary_df.sort_values('priority', ascending=(sort_order == "Ascending"))
-                elif sort_by == "Due Date":
-                    summary_df = summary_df.sort_values('due_date', ascending=(sort_order == "Ascending"))
-                elif sort_by == "Recommended Machine":
-                    summary_df = summary_df.sort_values('recommended_machine_id', ascending=(sort_order == "Ascending"))
-                elif sort_by == "Route Confidence":
-                    summary_df = summary_df.sort_values('route_confidence', ascending=(sort_order == "Ascending"))
+                # Sorting happens in SQL; keep a stack of page keys so we can page
+                # back, and start over whenever the sort changes
+                sort = (ROUTE_SORT_OPTIONS[sort_by], sort_order == "Descending")
+                if st.session_state.get("routes_sort") != sort:
+                    st.session_state.routes_sort = sort
+                    st.session_state.routes_page_keys = [None]
+                page_keys = st.session_state.routes_page_keys
                 
-                # Apply table styling and create scrollable container
-                styled_df = summary_df.style.set_table_styles(get_table_styles())
-                scrollable_table = create_scrollable_table(styled_df)
+                page = fetch_routes_page(*sort, page_keys[-1])
+                
+                # Warm the part cache with the visible parts so lookups are instant
+                prefetch_parts(row[0] for row in page.rows)
+                
+                # Show where each visible part is actually routed once overrides apply
+                effective_routes = fetch_effective_routes(tuple(row[0] for row in page.rows))
+                
+                def render_routes_table():
+                    effective_machines = {row[0]: row[6] for row in effective_routes}
+                    summary_rows = [
+                        (part_id, priority, due_date, machine_id, effective_machines.get(part_id), confidence)
+                        for part_id, priority, _, due_date, machine_id, confidence in page.rows
+                    ]
+                    return render_table_html(
+                        ['part_id', 'priority', 'due_date', 'recommended_machine_id', 'effective_machine_id', 'route_confidence'],
+                        summary_rows
+                    )
+                
+                # Both results come from the query cache, so the HTML is only
+                # rendered again when one of them is refetched
+                scrollable_table = table_html_cache.get_or_render(
+                    ("routes", sort, page_keys[-1]), (page.rows, effective_routes), render_routes_table
+                )
                 st.markdown(scrollable_table, unsafe_allow_html=True)
+                
+                col1, col2, col3 = st.columns([1, 2, 1])
+                with col1:
+                    if st.button("◀ Previous", key="routes_prev", disabled=len(page_keys) == 1):
+                        page_keys.pop()
+                        st.rerun()
+                with col2:
+                    st.caption(f"Page {len(page_keys)} · {len(page.rows)} of {snapshot.total_parts} parts")
+                with col3:
+                    if st.button("Next ▶", key="routes_next", disabled=not page.has_next):
+                        page_keys.append(page.next_key)
+                        st.rerun()
             else:
                 st.info("No recommended routes found")
         except Exception as e:
@@ -155,23 +292,33 @@ def main():
         col1, col2 = st.columns([1.5, 2])
         
         with col1:
-            st.markdown('<p class="instruction-text">Select a part to lookup and then click "Lookup Part"</p>', unsafe_allow_html=True)
+            st.markdown('<p class="instruction-text">Search for a part, select it and then click "Lookup Part"</p>', unsafe_allow_html=True)
 
-            selected_part = st.selectbox(" ", 
-                                        [row[0] for row in parts_data] if parts_data else [],
-                                        key="part_lookup")
+            selected_part = part_search("part_lookup", "Search parts:")
             
-            if st.button("Lookup Part", key="lookup_btn", type="primary"):
+            if st.button("Lookup Part", key="lookup_btn", type="primary", disabled=not selected_part):
                 part_data = part_lookup(selected_part)
+                trace = last_trace()
                 
                 if part_data:
-                    # Unpack all the fields from the part backlog table (14 fields + query_time)
+                    # Unpack all the fields from the part backlog table (14 fields + query_time + source)
                     (part_id, priority, quantity, due_date, material, part_type, 
                      quality_level, surface_finish, tolerance, weight_kg, 
-                     dimensions, drawing_number, revision, estimated_hours, query_time) = part_data
+                     dimensions, drawing_number, revision, estimated_hours, query_time, source) = part_data
                     
-                    st.success(f"✅ Found in {query_time}ms")
-                    st.caption("*Timing includes network latency, authentication, database connection setup, SQL query execution, etc.")
+                    if source == "cache":
+                        st.success(f"✅ Found in {query_time}ms (cache hit)")
+                        st.caption("*Served from the app's in-memory part cache")
+                    elif source == "snapshot":
+                        st.success(f"✅ Found in {query_time}ms (saved snapshot)")
+                        st.caption(f"*Served from the snapshot saved at {saved_at}")
+                    else:
+                        st.success(f"✅ Found in {query_time}ms (database hit)")
+                        st.caption(
+                            f"*{trace.phase_ms('pool_wait')}ms waiting for a connection, "
+                            f"{trace.phase_ms('execute')}ms executing the query and "
+                            f"{trace.phase_ms('fetch')}ms reading the row"
+                        )
                     
                     with col2:
                         st.markdown('<p class="instruction-text">Part Details:</p>', unsafe_allow_html=True)
@@ -218,28 +365,154 @@ def main():
         
         # Add new override form
         st.markdown('<p class="manual-overrides-section-header">Add an Override:</p>', unsafe_allow_html=True)
+        # The part search sits outside the form, since form widgets only
+        # rerun the script on submit
+        part_col, _ = st.columns([1, 2])
+        with part_col:
+            part_id = part_search("override_part", "Search parts:")
+
+        # Each machine's backlog after overrides, so supervisors can see where
+        # there is room. It has no snapshot fallback, so it is skipped while
+        # reads come from the saved snapshot rather than block on the pool.
+        machine_loads = None
+        if mode == "live":
+            try:
+                machine_loads = fetch_machine_loads()
+            except Exception as e:
+                st.error(f"❌ Error loading machine load: {str(e)}")
+        utilization = dict(zip(machine_loads["machine_id"], machine_loads["utilization"])) if machine_loads else {}
+
         with st.form("override_form"):
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                part_id = st.selectbox("Select Part:", [row[0] for row in parts_data] if parts_data else [])
+            col2, col3 = st.columns(2)
             
             with col2:
-                assigned_machine_id = st.selectbox("Select Machine:", [row[0] for row in machines_data] if machines_data else [])
+                assigned_machine_id = st.selectbox(
+                    "Select Machine:",
+                    [row[0] for row in machines_data] if machines_data else [],
+                    format_func=lambda machine: f"{machine} · {utilization[machine]:.0%} utilized" if machine in utilization else machine
+                )
             
             with col3:
                 notes = st.text_input("Reason:", placeholder="e.g., Maintenance required")
             
-            submitted = st.form_submit_button("Set Override", type="primary")
+            submitted = st.form_submit_button("Set Override", type="primary", disabled=read_only)
             
             if submitted and part_id and assigned_machine_id and notes:
                 try:
-                    add_override(part_id, assigned_machine_id, user_email or "Unknown", notes)
+                    if OVERRIDE_WRITE_BEHIND:
+                        # Returns once the override is on local disk; its
+                        # status is shown under Queued Overrides. The key is
+                        # kept until the submit succeeds, so a resubmit after
+                        # an interrupted run queues the override only once.
+                        submission = (part_id, assigned_machine_id, notes)
+                        if st.session_state.get("override_submission", (None,))[0] != submission:
+                            st.session_state.override_submission = (submission, str(uuid.uuid4()))
+                        queue_override(part_id, assigned_machine_id, user_email or "Unknown", notes,
+                                       idempotency_key=st.session_state.override_submission[1])
+                        del st.session_state.override_submission
+                    else:
+                        add_override(part_id, assigned_machine_id, user_email or "Unknown", notes)
                     st.success("✅ Override set successfully!")
                     st.rerun()  # Refresh the page to show the new override
                 except Exception as e:
                     st.error(f"❌ Error setting override: {str(e)}")
 
+        # Write-behind status: overrides move from pending to committed as the
+        # background worker writes them to Lakebase
+        if OVERRIDE_WRITE_BEHIND:
+            queue_stats = get_override_queue_stats()
+            queued_overrides = fetch_queued_overrides()
+            if queued_overrides:
+                st.markdown('<p class="manual-overrides-section-header">Queued Overrides:</p>', unsafe_allow_html=True)
+                st.caption(f"{queue_stats['pending']} pending · {queue_stats['committed']} committed · "
+                           f"{queue_stats['failed']} failed")
+                import pandas as pd
+                st.dataframe(pd.DataFrame(queued_overrides, columns=[
+                    'part_id', 'assigned_machine_id', 'assigned_by', 'assigned_at', 'notes', 'status', 'attempts', 'last_error'
+                ]), use_container_width=True)
+                if queue_stats['failed'] and st.button("Retry Failed Overrides", key="retry_failed_btn"):
+                    retry_failed_overrides()
+                    st.rerun()
+
+        # Machine load, and moving a downed machine's parts onto the others
+        if machine_loads:
+            import pandas as pd
+            st.markdown('<p class="manual-overrides-section-header">Machine Load:</p>', unsafe_allow_html=True)
+            st.caption(f"Backlog hours after overrides, at {MACHINE_HOURS_PER_DAY:g} hours a day. "
+                       f"Utilization is backlog over {CAPACITY_HORIZON_DAYS:g} days of capacity.")
+            st.dataframe(
+                pd.DataFrame(machine_loads).sort_values("utilization", ascending=False).round(2),
+                use_container_width=True, hide_index=True
+            )
+
+            st.markdown('<p class="manual-overrides-section-header">Rebalance a Machine:</p>', unsafe_allow_html=True)
+            if "rebalance_result" in st.session_state:
+                st.success(st.session_state.pop("rebalance_result"))
+            down_col, exclude_col, reason_col = st.columns(3)
+            with down_col:
+                down_machine = st.selectbox("Machine going down:", list(machine_loads["machine_id"]), index=None,
+                                            key="rebalance_machine")
+            with exclude_col:
+                exclude_machines = st.multiselect(
+                    "Don't move parts to:",
+                    [machine for machine in machine_loads["machine_id"] if machine != down_machine],
+                    key="rebalance_exclude"
+                )
+            with reason_col:
+                rebalance_reason = st.text_input("Reason:", placeholder="e.g., Spindle failure", key="rebalance_reason")
+            if down_machine:
+                try:
+                    plan = propose_rebalance(down_machine, tuple(exclude_machines))
+                    moves = pd.DataFrame(plan.moves)
+                    st.caption(f"{len(moves)} parts, {moves['estimated_hours'].sum():.1f} hours to move · "
+                               f"{plan.late_parts} projected to finish after their due date")
+                    st.dataframe(moves.head(200), use_container_width=True, hide_index=True)
+                    # Stamp the moves once per plan, so applying it twice updates the same rows
+                    plan_key = (down_machine, tuple(exclude_machines), rebalance_reason)
+                    if st.session_state.get("rebalance_plan_key") != plan_key:
+                        st.session_state.rebalance_plan_key = plan_key
+                        st.session_state.rebalance_assigned_at = datetime.now(timezone.utc).replace(tzinfo=None)
+                    if st.button(f"Apply {len(moves)} Overrides", key="rebalance_btn", type="primary",
+                                 disabled=offline or moves.empty or not rebalance_reason):
+                        inserted, updated = add_overrides_bulk(
+                            plan.override_rows(f"Rebalanced from {down_machine}: {rebalance_reason}",
+                                               st.session_state.rebalance_assigned_at),
+                            user_email or "Unknown"
+                        )
+                        del st.session_state.rebalance_plan_key
+                        st.session_state.rebalance_result = f"✅ {inserted} overrides added, {updated} updated"
+                        st.rerun()  # Refresh the page to show the new overrides
+                except Exception as e:
+                    st.error(f"❌ Error rebalancing machine: {str(e)}")
+
+        # Bulk overrides from a CSV upload, e.g. when a machine goes down
+        st.markdown('<p class="manual-overrides-section-header">Bulk Overrides:</p>', unsafe_allow_html=True)
+        uploaded_file = st.file_uploader(
+            "Upload a CSV with part_id, assigned_machine_id and notes columns (assigned_at is optional)",
+            type="csv",
+            key="bulk_override_file"
+        )
+        if "bulk_override_result" in st.session_state:
+            st.success(st.session_state.pop("bulk_override_result"))
+        if uploaded_file is not None:
+            try:
+                import pandas as pd
+                bulk_df = pd.read_csv(uploaded_file, dtype=str)
+                missing_columns = {'part_id', 'assigned_machine_id', 'notes'} - set(bulk_df.columns)
+                if missing_columns:
+                    st.error(f"❌ CSV is missing columns: {', '.join(sorted(missing_columns))}")
+                else:
+                    bulk_columns = [c for c in ['part_id', 'assigned_machine_id', 'notes', 'assigned_at'] if c in bulk_df.columns]
+                    bulk_df = bulk_df[bulk_columns].dropna(subset=['part_id', 'assigned_machine_id'])
+                    st.dataframe(bulk_df.head(100), use_container_width=True)
+                    if st.button(f"Apply {len(bulk_df)} Overrides", key="bulk_override_btn", type="primary", disabled=offline):
+                        rows = bulk_df.astype(object).where(bulk_df.notna(), None).itertuples(index=False, name=None)
+                        inserted, updated = add_overrides_bulk(rows, user_email or "Unknown")
+                        st.session_state.bulk_override_result = f"✅ {inserted} overrides added, {updated} updated"
+                        st.rerun()  # Refresh the page to show the new overrides
+            except Exception as e:
+                st.error(f"❌ Error applying bulk overrides: {str(e)}")
+
         # Show past overrides
         try:        
             if overrides_data:
@@ -255,5 +528,41 @@ def main():
         except Exception as e:
             st.error(f"❌ Error loading overrides: {str(e)}")
 
+    for tab4 in diagnostics_tab:
+        with tab4:
+            st.markdown('<p class="instruction-text">Query timings in this app process, broken down by phase (p50 / p95 of recent calls, in ms)</p>', unsafe_allow_html=True)
+            import pandas as pd
+            query_metrics_data = get_query_metrics()
+            if query_metrics_data:
+                st.dataframe(pd.DataFrame(query_metrics_data).set_index("function"), use_container_width=True)
+            else:
+                st.info("No queries recorded yet")
+            background_metrics = get_background_metrics()
+            if background_metrics:
+                # Token refreshes run on background threads; calls only see them as pool wait
+                st.markdown('<p class="manual-overrides-section-header">Background Work:</p>', unsafe_allow_html=True)
+                st.dataframe(pd.DataFrame(background_metrics), use_container_width=True, hide_index=True)
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.markdown('<p class="manual-overrides-section-header">Connection Pool:</p>', unsafe_allow_html=True)
+                st.json(get_pool_stats())
+            with col2:
+                st.markdown('<p class="manual-overrides-section-header">Query Cache:</p>', unsafe_allow_html=True)
+                st.json(get_cache_stats())
+            with col3:
+                st.markdown('<p class="manual-overrides-section-header">Part Cache:</p>', unsafe_allow_html=True)
+                st.json(get_part_cache_stats())
+            with col4:
+                st.markdown('<p class="manual-overrides-section-header">Read Replica:</p>', unsafe_allow_html=True)
+                st.json(get_replica_stats())
+            if OVERRIDE_WRITE_BEHIND:
+                st.markdown('<p class="manual-overrides-section-header">Override Queue:</p>', unsafe_allow_html=True)
+                st.json(get_override_queue_stats())
+            st.markdown('<p class="manual-overrides-section-header">Saved Snapshot:</p>', unsafe_allow_html=True)
+            st.json(snapshot_status)
+
+            st.download_button("Download Prometheus Metrics", render_metrics(), file_name="metrics.txt", mime="text/plain")
+
 if __name__ == "__main__":
     main() 
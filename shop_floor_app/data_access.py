@@ -1,16 +1,41 @@
+import contextvars
+import functools
+import inspect
+import io
+import json
 import os
+import select
+import tempfile
+import threading
 import time
 import uuid
-from databricks import sdk
-from psycopg_pool import ConnectionPool
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+import psycopg
+from psycopg import pq
+from psycopg_pool import ConnectionPool, PoolTimeout
+from query_metrics import (
+    query_metrics,
+    traced,
+    record_phase,
+    record_rows,
+    timed_phase,
+    enable_opentelemetry,
+    serve_metrics,
+    InstrumentedCursor,
+)
+from override_queue import OverrideQueue
+from snapshot_store import Snapshot, SnapshotStore
 
 # Database connection setup
-workspace_client = sdk.WorkspaceClient()
-postgres_password = None
-last_password_refresh = 0
+# Without a Lakebase instance name (e.g. against a local Postgres for load
+# testing), connect as PGUSER with PGPASSWORD instead of an OAuth token.
+LAKEBASE_INSTANCE_NAME = os.getenv('LAKEBASE_INSTANCE_NAME')
 connection_pool = None
-
-user = workspace_client.current_user.me().user_name
+replica_pool = None
+_connection_pool_lock = threading.Lock()
 
 # Schema and table configuration
 SCHEMA = os.getenv('LAKEBASE_SCHEMA')
@@ -18,149 +43,2086 @@ ROUTES_TABLE_NAME = os.getenv('LAKEBASE_ROUTES_TABLE_NAME')
 OVERRIDES_TABLE_NAME = os.getenv('LAKEBASE_OVERRIDES_TABLE_NAME')
 PART_LOOKUP_TABLE_NAME = os.getenv('LAKEBASE_PART_LOOKUP_TABLE_NAME')
 
-def refresh_oauth_token():
-    """Refresh OAuth token if expired."""
-    global postgres_password, last_password_refresh
-    if postgres_password is None or time.time() - last_password_refresh > 900:
-        print("Refreshing PostgreSQL OAuth token")
-        try:
-            cred = workspace_client.database.generate_database_credential(
-                request_id=str(uuid.uuid4()),
-                instance_names=[os.getenv('LAKEBASE_INSTANCE_NAME')]
+# Lakebase OAuth tokens are valid for an hour; refresh them well before that.
+TOKEN_REFRESH_SECONDS = int(os.getenv('LAKEBASE_TOKEN_REFRESH_SECONDS', '900'))
+TOKEN_RETRY_SECONDS = 10
+
+# Connections only authenticate at login, so they outlive the token that opened
+# them. The pool jitters max_lifetime, which recycles old connections gradually.
+POOL_MAX_LIFETIME_SECONDS = int(os.getenv('LAKEBASE_POOL_MAX_LIFETIME_SECONDS', '3600'))
+POOL_MIN_SIZE = int(os.getenv('LAKEBASE_POOL_MIN_SIZE', '2'))
+POOL_MAX_SIZE = int(os.getenv('LAKEBASE_POOL_MAX_SIZE', '10'))
+# How long a read waits for a connection before giving up, e.g. while Lakebase
+# is unreachable and the app falls back to the saved snapshot.
+POOL_TIMEOUT_SECONDS = int(os.getenv('LAKEBASE_POOL_TIMEOUT_SECONDS', '10'))
+
+# Read replica. Instances with node_count > 1 and readable secondaries serve
+# reads on a separate read-only endpoint: set LAKEBASE_READONLY_HOST to its
+# host, or to "auto" to look up the instance's read_only_dns. Reads fall back
+# to the primary for REPLICA_RETRY_SECONDS after the replica fails, and for up
+# to READ_YOUR_WRITES_SECONDS after this process writes, until the replica has
+# replayed the write.
+READ_REPLICA_HOST = os.getenv('LAKEBASE_READONLY_HOST')
+READ_REPLICA_PORT = os.getenv('LAKEBASE_READONLY_PORT', os.getenv('PGPORT'))
+REPLICA_RETRY_SECONDS = int(os.getenv('LAKEBASE_REPLICA_RETRY_SECONDS', '30'))
+REPLICA_CHECKOUT_TIMEOUT_SECONDS = int(os.getenv('LAKEBASE_REPLICA_CHECKOUT_TIMEOUT_SECONDS', '5'))
+READ_YOUR_WRITES_SECONDS = int(os.getenv('LAKEBASE_READ_YOUR_WRITES_SECONDS', '30'))
+
+# Query result cache, shared by every Streamlit session in this process.
+# Synced tables only change when the sync pipeline runs, so they can be cached
+# longer than overrides, which other app instances may write at any time.
+CACHE_MAX_ENTRIES = int(os.getenv('LAKEBASE_CACHE_MAX_ENTRIES', '256'))
+SYNCED_TABLE_TTL_SECONDS = int(os.getenv('LAKEBASE_SYNCED_TABLE_TTL_SECONDS', '60'))
+OVERRIDES_TTL_SECONDS = int(os.getenv('LAKEBASE_OVERRIDES_TTL_SECONDS', '10'))
+
+# Part details cache. Floor terminals look up the same handful of parts over
+# and over, so part rows are cached individually, keyed by part_id.
+PART_CACHE_MAX_ENTRIES = int(os.getenv('LAKEBASE_PART_CACHE_MAX_ENTRIES', '5000'))
+PART_CACHE_TTL_SECONDS = int(os.getenv('LAKEBASE_PART_CACHE_TTL_SECONDS', '300'))
+
+# lakebase_setup installs a trigger that notifies this channel whenever
+# overrides change; a background listener uses it to update cached overrides.
+OVERRIDES_CHANNEL = os.getenv('LAKEBASE_OVERRIDES_CHANNEL', f"{OVERRIDES_TABLE_NAME}_changed")
+LISTENER_RECONNECT_SECONDS = 5
+
+# Write-behind overrides. With OVERRIDE_WRITE_BEHIND=true the app queues
+# overrides in a local SQLite file at OVERRIDE_QUEUE_PATH and returns at once;
+# a background worker writes them to Lakebase in batches of up to
+# OVERRIDE_QUEUE_BATCH_SIZE, waiting OVERRIDE_QUEUE_LINGER_MS for more to
+# arrive, and retries failures up to OVERRIDE_QUEUE_MAX_ATTEMPTS times.
+OVERRIDE_WRITE_BEHIND = os.getenv('OVERRIDE_WRITE_BEHIND', 'false').lower() == 'true'
+OVERRIDE_QUEUE_PATH = os.getenv('OVERRIDE_QUEUE_PATH', os.path.join(tempfile.gettempdir(), 'shop_floor_override_queue.db'))
+OVERRIDE_QUEUE_BATCH_SIZE = int(os.getenv('OVERRIDE_QUEUE_BATCH_SIZE', '500'))
+OVERRIDE_QUEUE_LINGER_MS = int(os.getenv('OVERRIDE_QUEUE_LINGER_MS', '50'))
+OVERRIDE_QUEUE_MAX_ATTEMPTS = int(os.getenv('OVERRIDE_QUEUE_MAX_ATTEMPTS', '10'))
+
+# Saved snapshot of routes, parts and overrides, rewritten in SNAPSHOT_DIR
+# every SNAPSHOT_REFRESH_SECONDS. At startup the app serves it, flagged as
+# stale, until Lakebase first answers, for at most SNAPSHOT_STALE_SECONDS;
+# while Lakebase is unreachable it serves it read-only, retrying every
+# SNAPSHOT_RETRY_SECONDS. Set LAKEBASE_SNAPSHOT_DIR to an empty string to
+# turn it off.
+SNAPSHOT_DIR = os.getenv('LAKEBASE_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'shop_floor_snapshot'))
+SNAPSHOT_REFRESH_SECONDS = int(os.getenv('LAKEBASE_SNAPSHOT_REFRESH_SECONDS', '300'))
+SNAPSHOT_RETRY_SECONDS = int(os.getenv('LAKEBASE_SNAPSHOT_RETRY_SECONDS', '10'))
+SNAPSHOT_STALE_SECONDS = int(os.getenv('LAKEBASE_SNAPSHOT_STALE_SECONDS', '30'))
+
+# Machine capacity, for machine load and rebalancing. A part's estimated_hours
+# is its total run time; each machine runs MACHINE_HOURS_PER_DAY, and
+# utilization is backlog hours over CAPACITY_HORIZON_DAYS of that capacity.
+MACHINE_HOURS_PER_DAY = float(os.getenv('MACHINE_HOURS_PER_DAY', '16'))
+CAPACITY_HORIZON_DAYS = float(os.getenv('CAPACITY_HORIZON_DAYS', '5'))
+
+# Query metrics export: a Prometheus /metrics endpoint on METRICS_PORT, and
+# OpenTelemetry through the global MeterProvider when QUERY_METRICS_OTEL=true.
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+QUERY_METRICS_OTEL = os.getenv('QUERY_METRICS_OTEL', 'false').lower() == 'true'
+
+
+class OAuthCredentialProvider:
+    """Keep a fresh Lakebase OAuth token for new connections to log in with."""
+
+    def __init__(self, generate_token, refresh_seconds=TOKEN_REFRESH_SECONDS):
+        self._generate_token = generate_token
+        self.refresh_seconds = refresh_seconds
+        self._token = None
+        self._last_refresh = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_stale(self):
+        """Return True if the token is missing or past its refresh interval."""
+        return self._token is None or time.time() - self._last_refresh > self.refresh_seconds
+
+    def get_password(self):
+        """Return the current token, refreshing it first only if it has gone stale."""
+        if self.is_stale():
+            self.refresh(only_if_stale=True)
+        return self._token
+
+    def refresh(self, only_if_stale=False):
+        """Generate a new token. Concurrent callers share a single refresh."""
+        with self._lock:
+            if only_if_stale and not self.is_stale():
+                return
+            print("Refreshing PostgreSQL OAuth token")
+            start = time.perf_counter()
+            try:
+                token = self._generate_token()
+            except Exception as e:
+                raise Exception(f"Failed to refresh token: {str(e)}")
+            finally:
+                # Refreshes run on the pool's connection workers or the refresh
+                # thread, never inside a traced call, so this is a background metric
+                query_metrics.observe("credential_provider", "token_refresh", time.perf_counter() - start)
+            self._token = token
+            self._last_refresh = time.time()
+
+    def start(self):
+        """Start refreshing the token in the background ahead of expiry."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._refresh_loop, name="lakebase-token-refresh", daemon=True
             )
-            postgres_password = cred.token
-            last_password_refresh = time.time()
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh_loop(self):
+        while True:
+            # Refresh at 80% of the interval so connects never wait on a token.
+            next_refresh = self._last_refresh + self.refresh_seconds * 0.8
+            if self._stop.wait(max(next_refresh - time.time(), 0)):
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                print(str(e))
+                if self._stop.wait(TOKEN_RETRY_SECONDS):
+                    return
+
+
+@functools.lru_cache(maxsize=None)
+def get_workspace_client():
+    """Return the process-wide WorkspaceClient, or None without a Lakebase instance.
+
+    The SDK is imported on first use; it takes longer to import than the rest
+    of the app put together.
+    """
+    if not LAKEBASE_INSTANCE_NAME:
+        return None
+    from databricks import sdk
+    return sdk.WorkspaceClient()
+
+
+@functools.lru_cache(maxsize=None)
+def get_current_user():
+    """Return the database user name, resolved once per process."""
+    workspace_client = get_workspace_client()
+    if workspace_client is None:
+        return os.getenv('PGUSER')
+    return workspace_client.current_user.me().user_name
+
+
+def generate_lakebase_token():
+    """Generate a Lakebase OAuth token for the configured instance."""
+    workspace_client = get_workspace_client()
+    if workspace_client is None:
+        return os.getenv('PGPASSWORD', '')
+    cred = workspace_client.database.generate_database_credential(
+        request_id=str(uuid.uuid4()),
+        instance_names=[LAKEBASE_INSTANCE_NAME]
+    )
+    return cred.token
+
+
+credential_provider = OAuthCredentialProvider(generate_lakebase_token)
+
+
+class LakebaseConnection(psycopg.Connection):
+    """Connection that logs in with the credential provider's current token."""
+
+    @classmethod
+    def connect(cls, conninfo="", **kwargs):
+        kwargs["password"] = credential_provider.get_password()
+        kwargs.setdefault("cursor_factory", InstrumentedCursor)
+        return super().connect(conninfo, **kwargs)
+
+
+class QueryCache:
+    """Thread-safe LRU cache of query results with per-entry TTLs.
+
+    Entries are tagged with the tables they read from. Invalidating a table
+    drops its entries and bumps its generation, so a query that started before
+    the invalidation cannot store its (now stale) result afterwards.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (True, value) for a live entry, otherwise (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, tables, expires_at = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def peek(self, key):
+        """Like get(), but without counting a hit or miss or touching LRU order."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() < entry[2]:
+                return True, entry[0]
+            return False, None
+
+    def generation(self, tables):
+        """Return the current generation of each table, for a later set()."""
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+
+    def set(self, key, value, ttl, tables, generation):
+        """Store a value unless one of its tables was invalidated since generation."""
+        with self._lock:
+            if generation != tuple(self._generations.get(table, 0) for table in tables):
+                return
+            self._entries[key] = (value, tables, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, table):
+        """Drop every entry that reads from table."""
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            for key in [k for k, (_, tables, _) in self._entries.items() if table in tables]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            for table in {t for _, tables, _ in self._entries.values() for t in tables}:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit, miss and eviction counters plus the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+query_cache = QueryCache()
+part_cache = QueryCache(max_entries=PART_CACHE_MAX_ENTRIES)
+
+
+def cached_query(ttl, tables):
+    """Cache a query function's result in query_cache, keyed by its arguments."""
+    tables = tuple(tables)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__,) + args + tuple(sorted(kwargs.items()))
+            hit, value = query_cache.get(key)
+            if hit:
+                return value
+            generation = query_cache.generation(tables)
+            value = func(*args, **kwargs)
+            query_cache.set(key, value, ttl, tables, generation)
+            return value
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def get_cache_stats():
+    """Return the query cache counters."""
+    return query_cache.stats()
+
+
+def get_part_cache_stats():
+    """Return the part details cache counters."""
+    return part_cache.stats()
+
+
+class OverrideChangeListener:
+    """LISTEN for override changes on a dedicated connection.
+
+    Each notification invalidates cached reads of the overrides table. When
+    the payload carries the inserted rows, the cached override history is
+    patched in place rather than re-queried. `version` increases with every
+    notification, and on every (re)connect, when changes may have been
+    missed, so open sessions can tell that they should refresh.
+    """
+
+    def __init__(self, channel=OVERRIDES_CHANNEL):
+        self.channel = channel
+        self.version = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+
+    def start(self):
+        """Start listening in a background thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._listen_loop, name="lakebase-override-listener", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop listening and close the connection."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _listen_loop(self):
+        while not self._stop.is_set():
+            try:
+                # Always the primary: standbys cannot LISTEN
+                with LakebaseConnection.connect(get_conninfo(), autocommit=True) as conn:
+                    conn.execute(f'LISTEN "{self.channel}"')
+                    # Anything may have changed while we were not listening
+                    self.apply_notification(None)
+                    while not self._stop.is_set():
+                        for notify in conn.notifies(timeout=1.0):
+                            self.apply_notification(notify.payload)
+            except Exception as e:
+                print(f"Override listener error: {str(e)}")
+                self._stop.wait(LISTENER_RECONNECT_SECONDS)
+
+    def apply_notification(self, payload):
+        """Update cached overrides for one notification payload, or drop them
+        when payload is None, after missing notifications while reconnecting."""
+        message = json.loads(payload) if payload else {}
+        key = ("fetch_overrides",)
+        hit, overrides = query_cache.peek(key)
+        query_cache.invalidate(OVERRIDES_TABLE_NAME)
+        new_rows = message.get("rows") if message.get("op") == "INSERT" else None
+        if hit and new_rows:
+            rows = [
+                (row["part_id"], row["assigned_machine_id"], row["assigned_by"],
+                 datetime.fromisoformat(row["assigned_at"]) if row["assigned_at"] else None, row["notes"])
+                for row in new_rows
+            ]
+            # This process's own writes may already be in the cached history
+            known = set(overrides)
+            patched = overrides + [row for row in rows if row not in known]
+            # Match ORDER BY assigned_at DESC, which puts NULLs first
+            patched.sort(key=lambda row: (row[3] is None, row[3] or datetime.min), reverse=True)
+            tables = (OVERRIDES_TABLE_NAME,)
+            query_cache.set(key, patched, OVERRIDES_TTL_SECONDS, tables, query_cache.generation(tables))
+        self.version += 1
+
+
+override_listener = OverrideChangeListener()
+
+
+def start_override_listener():
+    """Start the override change listener if it is not already running."""
+    override_listener.start()
+
+
+def get_overrides_version():
+    """Return a counter that increases whenever overrides change in Lakebase."""
+    return override_listener.version
+
+
+@functools.lru_cache(maxsize=None)
+def get_replica_host():
+    """Return the read replica's host, or None if reads go to the primary."""
+    if READ_REPLICA_HOST != 'auto':
+        return READ_REPLICA_HOST or None
+    instance = get_workspace_client().database.get_database_instance(LAKEBASE_INSTANCE_NAME)
+    return instance.read_only_dns
+
+
+class ReplicaRouter:
+    """Decide whether reads can go to the read replica.
+
+    The replica is skipped for retry_seconds after it fails, including when
+    the `auto` lookup of its host fails. After this process writes, reads
+    stay on the primary until the replica has replayed the write's WAL
+    position (read-your-writes), or read_your_writes_seconds pass, whichever
+    comes first.
+    """
+
+    def __init__(self, retry_seconds=REPLICA_RETRY_SECONDS, read_your_writes_seconds=READ_YOUR_WRITES_SECONDS):
+        self.retry_seconds = retry_seconds
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self._lock = threading.Lock()
+        self._unhealthy_until = 0
+        self._lookup_retry_at = 0
+        self._write_lsn = None
+        self._write_time = 0
+        self.last_error = None
+        self.replica_reads = 0
+        self.pinned_reads = 0
+        self.failures = 0
+
+    @property
+    def enabled(self):
+        # A failed host lookup is not cached by get_replica_host, so back off
+        # instead of repeating it on every read
+        if time.monotonic() < self._lookup_retry_at:
+            return False
+        try:
+            return get_replica_host() is not None
         except Exception as e:
-            raise Exception(f"Failed to refresh token: {str(e)}")
+            self.mark_unhealthy(f"Read replica host lookup failed: {str(e)}")
+            self._lookup_retry_at = self._unhealthy_until
+            return False
+
+    def is_healthy(self):
+        return time.monotonic() >= self._unhealthy_until
+
+    def should_use_replica(self):
+        return self.is_healthy() and self.enabled
+
+    def mark_unhealthy(self, error):
+        """Send reads to the primary for retry_seconds."""
+        with self._lock:
+            self._unhealthy_until = time.monotonic() + self.retry_seconds
+            self.last_error = str(error)
+            self.failures += 1
+        print(f"Read replica unavailable, reading from the primary: {str(error)}")
+
+    def record_write(self, lsn):
+        """Remember the WAL position of a write this process committed."""
+        with self._lock:
+            self._write_lsn = lsn
+            self._write_time = time.monotonic()
+
+    def pending_write_lsn(self):
+        """Return the WAL position the replica must reach before serving reads, or None."""
+        with self._lock:
+            if self._write_lsn is not None and time.monotonic() - self._write_time > self.read_your_writes_seconds:
+                self._write_lsn = None
+            return self._write_lsn
+
+    def write_replayed(self, lsn):
+        """Note that the replica has replayed the write at lsn."""
+        with self._lock:
+            if self._write_lsn == lsn:
+                self._write_lsn = None
+
+    def count_read(self, on_replica):
+        with self._lock:
+            if on_replica:
+                self.replica_reads += 1
+            else:
+                self.pinned_reads += 1
+
+    def stats(self):
+        """Return read counters and the replica's state."""
+        enabled = self.enabled
+        with self._lock:
+            return {
+                "enabled": enabled,
+                "healthy": self.is_healthy(),
+                "replica_reads": self.replica_reads,
+                "pinned_reads": self.pinned_reads,
+                "failures": self.failures,
+                "waiting_for_write": self._write_lsn is not None,
+                "last_error": self.last_error,
+            }
+
+
+replica_router = ReplicaRouter()
+
+
+class ReplicaUnavailable(psycopg.OperationalError):
+    """A replica connection or query failed; the cause is the original error."""
+
+
+_read_from_replica = contextvars.ContextVar("read_from_replica", default=False)
+
+
+def reading_from_replica():
+    """True inside a read_from_replica call that may use the replica."""
+    return _read_from_replica.get()
+
+
+def read_from_replica(func):
+    """Send func's queries to the read replica when replica_router allows it.
+
+    If the replica checkout or a query on it fails, the replica is marked
+    unhealthy and the call is retried on the primary. Errors from the primary,
+    e.g. on a read pinned there after a write, are raised as usual. Only use
+    it on functions that do not write.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if _read_from_replica.get() or not replica_router.should_use_replica():
+                return await func(*args, **kwargs)
+            token = _read_from_replica.set(True)
+            try:
+                return await func(*args, **kwargs)
+            except ReplicaUnavailable as e:
+                replica_router.mark_unhealthy(e.__cause__ or e)
+            finally:
+                _read_from_replica.reset(token)
+            return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _read_from_replica.get() or not replica_router.should_use_replica():
+            return func(*args, **kwargs)
+        token = _read_from_replica.set(True)
+        try:
+            return func(*args, **kwargs)
+        except ReplicaUnavailable as e:
+            replica_router.mark_unhealthy(e.__cause__ or e)
+        finally:
+            _read_from_replica.reset(token)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def refresh_oauth_token():
+    """Refresh OAuth token if expired."""
+    credential_provider.get_password()
+
+def get_conninfo(host=None, port=None):
+    """Build the connection string; the password comes from credential_provider."""
+    return (
+        f"dbname={os.getenv('PGDATABASE')} "
+        f"user={get_current_user()} "
+        f"host={host or os.getenv('PGHOST')} "
+        f"port={port or os.getenv('PGPORT')} "
+        f"sslmode={os.getenv('PGSSLMODE', 'require')} "
+        f"application_name={os.getenv('PGAPPNAME')}"
+    )
 
 def get_connection_pool():
     """Get or create the connection pool."""
     global connection_pool
-    if connection_pool is None:
-        refresh_oauth_token()
-        conn_string = (
-            f"dbname={os.getenv('PGDATABASE')} "
-            f"user={user} "
-            f"password={postgres_password} "
-            f"host={os.getenv('PGHOST')} "
-            f"port={os.getenv('PGPORT')} "
-            f"sslmode={os.getenv('PGSSLMODE', 'require')} "
-            f"application_name={os.getenv('PGAPPNAME')}"
-        )
-        connection_pool = ConnectionPool(conn_string, min_size=2, max_size=10)
+    with _connection_pool_lock:
+        if connection_pool is None:
+            refresh_oauth_token()
+            credential_provider.start()
+            connection_pool = ConnectionPool(
+                get_conninfo(),
+                connection_class=LakebaseConnection,
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                max_lifetime=POOL_MAX_LIFETIME_SECONDS,
+                timeout=POOL_TIMEOUT_SECONDS
+            )
     return connection_pool
 
+def get_replica_pool():
+    """Get or create the read replica connection pool.
+
+    Connections are checked before use and checkouts time out quickly, so an
+    unreachable replica sends reads back to the primary instead of stalling.
+    """
+    global replica_pool
+    with _connection_pool_lock:
+        if replica_pool is None:
+            refresh_oauth_token()
+            credential_provider.start()
+            replica_pool = ConnectionPool(
+                get_conninfo(get_replica_host(), READ_REPLICA_PORT),
+                connection_class=LakebaseConnection,
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                max_lifetime=POOL_MAX_LIFETIME_SECONDS,
+                timeout=REPLICA_CHECKOUT_TIMEOUT_SECONDS,
+                check=ConnectionPool.check_connection
+            )
+    return replica_pool
+
+def prewarm_connection_pool():
+    """Open the pool in a background thread, so the first page finds connections ready.
+
+    The identity lookup, first token and min_size connections all happen off
+    the caller's thread. Safe to call on every rerun.
+    """
+    if connection_pool is None:
+        threading.Thread(target=get_connection_pool, name="lakebase-pool-prewarm", daemon=True).start()
+
+@contextmanager
+def _replica_connection():
+    # Yields None when the replica has not yet replayed this process's last
+    # write. Connection errors on the replica are raised as ReplicaUnavailable,
+    # so read_from_replica can tell them from the primary's.
+    lsn = replica_router.pending_write_lsn()
+    start = time.perf_counter()
+    try:
+        with get_replica_pool().connection() as conn:
+            record_phase("pool_wait", time.perf_counter() - start)
+            if lsn is not None:
+                if not conn.execute(REPLICA_CAUGHT_UP_QUERY, (lsn,)).fetchone()[0]:
+                    yield None
+                    return
+                replica_router.write_replayed(lsn)
+            yield conn
+    except ReplicaUnavailable:
+        raise
+    except psycopg.OperationalError as e:
+        raise ReplicaUnavailable(str(e)) from e
+
+@contextmanager
 def get_connection():
-    """Get a connection from the pool."""
-    global connection_pool
-    
-    # Recreate pool if token expired
-    if postgres_password is None or time.time() - last_password_refresh > 900:
-        if connection_pool:
-            connection_pool.close()
-            connection_pool = None
-    
-    return get_connection_pool().connection()
+    """Get a connection from the pool, recording the wait as pool_wait.
+
+    Inside a read_from_replica call, the connection comes from the replica
+    pool unless the replica is behind this process's last write.
+    """
+    if _read_from_replica.get():
+        with _replica_connection() as conn:
+            if conn is not None:
+                replica_router.count_read(True)
+                yield conn
+                return
+        replica_router.count_read(False)
+    pool = get_connection_pool()
+    start = time.perf_counter()
+    with pool.connection() as conn:
+        record_phase("pool_wait", time.perf_counter() - start)
+        # Lakebase answered, so stop serving the saved snapshot; this also
+        # lets reads after a write see it
+        snapshot_fallback.mark_live()
+        yield conn
+
+def record_write(conn):
+    """After a commit on conn, make reads wait for the replica to replay it."""
+    if replica_router.enabled:
+        replica_router.record_write(conn.execute(CURRENT_WAL_LSN_QUERY).fetchone()[0])
+
+def get_pool_stats():
+    """Return the pool's current size and counters, or {} before it is opened."""
+    return connection_pool.get_stats() if connection_pool is not None else {}
+
+def get_replica_stats():
+    """Return the replica router's counters and the replica pool's stats."""
+    stats = replica_router.stats()
+    if replica_pool is not None:
+        stats["pool"] = replica_pool.get_stats()
+    return stats
+
+def get_query_metrics():
+    """Return per-function call counts and p50/p95 timings by phase."""
+    return query_metrics.summary()
+
+def get_background_metrics():
+    """Return counts and p50/p95 timings of background work, e.g. token refreshes."""
+    return query_metrics.background_summary()
+
+def render_metrics():
+    """Render query, pool and cache metrics in the Prometheus text format."""
+    gauges = {f"shop_floor_pool_{name}": value for name, value in get_pool_stats().items()}
+    gauges.update({
+        f"shop_floor_replica_{name}": int(value) for name, value in get_replica_stats().items()
+        if isinstance(value, (int, bool))
+    })
+    for cache_name, stats in (("query", get_cache_stats()), ("part", get_part_cache_stats())):
+        gauges.update({f"shop_floor_{cache_name}_cache_{name}": value for name, value in stats.items()})
+    if OVERRIDE_WRITE_BEHIND:
+        gauges.update({
+            f"shop_floor_override_queue_{name}": value for name, value in get_override_queue_stats().items()
+            if isinstance(value, (int, float))
+        })
+    gauges.update({
+        f"shop_floor_snapshot_{name}": value for name, value in get_snapshot_status().items()
+        if isinstance(value, (int, float))
+    })
+    gauges["shop_floor_snapshot_offline"] = int(snapshot_fallback.mode() == "offline")
+    return query_metrics.render_prometheus(gauges)
+
+_metrics_export_lock = threading.Lock()
+_metrics_exporting = False
+
+def start_metrics_export():
+    """Start the configured metrics exports once per process."""
+    global _metrics_exporting
+    with _metrics_export_lock:
+        if _metrics_exporting:
+            return
+        _metrics_exporting = True
+        if METRICS_PORT:
+            serve_metrics(METRICS_PORT, render_metrics)
+        if QUERY_METRICS_OTEL:
+            enable_opentelemetry()
+
+# Part search for the typeahead pickers. Each way a part can match is its own
+# index-ordered branch that stops after `limit` rows, so a keystroke reads a
+# few dozen rows however large the backlog is. Prefix matches on part_id,
+# drawing_number and material (in that order) rank above fuzzy pg_trgm matches.
+# Prefix branches compare lower(column) COLLATE "C", the expression the
+# lakebase_setup indexes are built on, so LIKE 'abc%' is an index range scan
+# already in ORDER BY order.
+PART_SEARCH_LIMIT = int(os.getenv('PART_SEARCH_LIMIT', '10'))
+PART_SEARCH_MIN_FUZZY_LENGTH = 3
+PART_SEARCH_COLUMNS = ['part_id', 'drawing_number', 'material']
+
+TRIGRAM_AVAILABLE_QUERY = "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+
+def build_part_search_query(fuzzy):
+    """Build the part search query, with the pg_trgm branches if fuzzy."""
+    branches = [
+        (column, f'lower({column}) COLLATE "C" LIKE %(prefix)s',
+         f'lower({column}) COLLATE "C"' + (", part_id" if column == 'material' else ""), "0::real")
+        for column in PART_SEARCH_COLUMNS
+    ]
+    if fuzzy:
+        branches += [
+            (column, f"%(fuzzy)s AND {column} %% %(query)s", f"{column} <-> %(query)s",
+             f"({column} <-> %(query)s)::real")
+            for column in PART_SEARCH_COLUMNS
+        ]
+    selects = [
+        f"""(SELECT part_id, drawing_number, material, '{column}' AS matched_on, {rank} AS rank, {distance} AS distance
+            FROM {SCHEMA}.{PART_LOOKUP_TABLE_NAME}
+            WHERE {where}
+            ORDER BY {order_by}
+            LIMIT %(limit)s)"""
+        for rank, (column, where, order_by, distance) in enumerate(branches)
+    ]
+    return f"""
+        WITH matches AS (
+            {' UNION ALL '.join(selects)}
+        )
+        SELECT part_id, drawing_number, material, matched_on
+        FROM (
+            SELECT DISTINCT ON (part_id) *
+            FROM matches
+            ORDER BY part_id, rank, distance
+        ) best
+        ORDER BY rank >= {len(PART_SEARCH_COLUMNS)}, distance, rank, part_id
+        LIMIT %(limit)s
+    """
+
+def part_search_params(query, limit):
+    """Query parameters for build_part_search_query."""
+    query = query.strip()
+    escaped = query.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return {
+        "query": query,
+        "prefix": escaped + '%',
+        "fuzzy": len(query) >= PART_SEARCH_MIN_FUZZY_LENGTH,
+        "limit": limit,
+    }
+
+# Read-your-writes: the primary's WAL position after a write, and whether the
+# replica has replayed up to it (NULL, so false, on a server that is not a standby)
+CURRENT_WAL_LSN_QUERY = "SELECT pg_current_wal_lsn()::text"
+REPLICA_CAUGHT_UP_QUERY = "SELECT coalesce(pg_last_wal_replay_lsn() >= %s::pg_lsn, false)"
+
+# Dashboard queries, shared by the individual fetch functions and the snapshot
+ROUTES_QUERY = f"""
+    SELECT part_id, priority, quantity_pending, due_date, recommended_machine_id, route_confidence
+    FROM {SCHEMA}.{ROUTES_TABLE_NAME}
+    ORDER BY priority DESC, due_date ASC
+"""
+
+# Arrow types of the ROUTES_QUERY columns, for fetch_arrow
+ROUTES_ARROW_COLUMNS = [
+    ("part_id", "string"),
+    ("priority", "string"),
+    ("quantity_pending", "int64"),
+    ("due_date", "date32"),
+    ("recommended_machine_id", "string"),
+    ("route_confidence", "double"),
+]
+
+MACHINES_QUERY = f"""
+    SELECT distinct recommended_machine_id
+    FROM {SCHEMA}.{ROUTES_TABLE_NAME}
+    ORDER BY 1 asc
+"""
+
+PARTS_QUERY = f"""
+    SELECT part_id, part_num
+    FROM {SCHEMA}.{ROUTES_TABLE_NAME}
+    ORDER BY part_num ASC
+"""
+
+OVERRIDES_QUERY = f"""
+    SELECT part_id, assigned_machine_id, assigned_by, assigned_at, notes
+    FROM {SCHEMA}.{OVERRIDES_TABLE_NAME}
+    ORDER BY assigned_at DESC
+"""
+
+OVERDUE_COUNT_QUERY = f"""
+    SELECT COUNT(part_id)
+    FROM {SCHEMA}.{ROUTES_TABLE_NAME}
+    WHERE due_date < CURRENT_DATE
+"""
+
+PART_LOOKUP_QUERY = f"""
+    SELECT
+        part_id,
+        priority,
+        quantity_pending,
+        due_date,
+        material,
+        part_type,
+        quality_level,
+        surface_finish,
+        tolerance,
+        weight_kg,
+        dimensions,
+        drawing_number,
+        revision,
+        estimated_hours
+    FROM {SCHEMA}.{PART_LOOKUP_TABLE_NAME}
+    WHERE part_id = ANY(%s)
+"""
+
+# Arrow types of the PART_LOOKUP_QUERY columns, and the whole part backlog in
+# that shape, for the saved snapshot
+PART_ARROW_COLUMNS = [
+    ("part_id", "string"),
+    ("priority", "string"),
+    ("quantity_pending", "int64"),
+    ("due_date", "date32"),
+    ("material", "string"),
+    ("part_type", "string"),
+    ("quality_level", "string"),
+    ("surface_finish", "string"),
+    ("tolerance", "string"),
+    ("weight_kg", "double"),
+    ("dimensions", "string"),
+    ("drawing_number", "string"),
+    ("revision", "string"),
+    ("estimated_hours", "double"),
+]
+
+PART_BACKLOG_QUERY = f"""
+    SELECT {', '.join(name for name, _ in PART_ARROW_COLUMNS)}
+    FROM {SCHEMA}.{PART_LOOKUP_TABLE_NAME}
+"""
+
+# Arrow types of the OVERRIDES_QUERY columns
+OVERRIDES_ARROW_COLUMNS = [
+    ("part_id", "string"),
+    ("assigned_machine_id", "string"),
+    ("assigned_by", "string"),
+    ("assigned_at", "timestamp[us]"),
+    ("notes", "string"),
+]
+
+ADD_OVERRIDE_QUERY = f"""
+    INSERT INTO {SCHEMA}.{OVERRIDES_TABLE_NAME} (part_id, assigned_machine_id, assigned_by, assigned_at, notes)
+    VALUES (%s, %s, %s, CURRENT_TIMESTAMP, %s)
+"""
+
+# The machine each part is actually routed to: its latest override, if any, else
+# the recommended machine. The LATERAL subquery is a single seek per part on the
+# (part_id, assigned_at DESC) index that lakebase_setup creates, so it stays
+# flat as override history grows.
+EFFECTIVE_ROUTES_QUERY = f"""
+    SELECT
+        r.part_id,
+        r.priority,
+        r.quantity_pending,
+        r.due_date,
+        r.recommended_machine_id,
+        r.route_confidence,
+        COALESCE(o.assigned_machine_id, r.recommended_machine_id) AS effective_machine_id,
+        o.assigned_by,
+        o.assigned_at,
+        o.notes
+    FROM {SCHEMA}.{ROUTES_TABLE_NAME} r
+    LEFT JOIN LATERAL (
+        SELECT assigned_machine_id, assigned_by, assigned_at, notes
+        FROM {SCHEMA}.{OVERRIDES_TABLE_NAME} ov
+        WHERE ov.part_id = r.part_id
+        ORDER BY ov.assigned_at DESC
+        LIMIT 1
+    ) o ON true
+    WHERE %(part_ids)s::text[] IS NULL OR r.part_id = ANY(%(part_ids)s)
+    ORDER BY r.priority DESC, r.due_date ASC
+"""
+
+# Each part's effective machine and run time, for whole-backlog capacity
+# queries. A DISTINCT ON pass over overrides is cheaper than a LATERAL seek per
+# part when every part is read.
+EFFECTIVE_ASSIGNMENTS_CTE = f"""
+    WITH effective AS (
+        SELECT
+            r.part_id,
+            r.priority,
+            r.due_date,
+            COALESCE(o.assigned_machine_id, r.recommended_machine_id) AS machine_id,
+            COALESCE(p.estimated_hours, 0) AS estimated_hours
+        FROM {SCHEMA}.{ROUTES_TABLE_NAME} r
+        LEFT JOIN {SCHEMA}.{PART_LOOKUP_TABLE_NAME} p ON p.part_id = r.part_id
+        LEFT JOIN (
+            SELECT DISTINCT ON (part_id) part_id, assigned_machine_id
+            FROM {SCHEMA}.{OVERRIDES_TABLE_NAME}
+            ORDER BY part_id, assigned_at DESC
+        ) o ON o.part_id = r.part_id
+    )
+"""
+
+MACHINE_LOAD_COLUMNS = ['machine_id', 'parts', 'backlog_hours', 'high_priority_parts', 'overdue_parts', 'overdue_hours']
+
+# Every machine gets a row, including idle ones that have no parts right now,
+# so they show as 0% utilized and are the first rebalancing targets
+MACHINE_LOAD_QUERY = EFFECTIVE_ASSIGNMENTS_CTE + f"""
+    , machine_loads AS (
+        SELECT
+            machine_id,
+            count(*) AS parts,
+            sum(estimated_hours) AS backlog_hours,
+            count(*) FILTER (WHERE priority = 'high') AS high_priority_parts,
+            count(*) FILTER (WHERE due_date < CURRENT_DATE) AS overdue_parts,
+            sum(estimated_hours) FILTER (WHERE due_date < CURRENT_DATE) AS overdue_hours
+        FROM effective
+        WHERE machine_id IS NOT NULL
+        GROUP BY machine_id
+    )
+    SELECT
+        machine_id,
+        COALESCE(l.parts, 0),
+        COALESCE(l.backlog_hours, 0),
+        COALESCE(l.high_priority_parts, 0),
+        COALESCE(l.overdue_parts, 0),
+        COALESCE(l.overdue_hours, 0)
+    FROM (
+        SELECT DISTINCT recommended_machine_id AS machine_id
+        FROM {SCHEMA}.{ROUTES_TABLE_NAME}
+        WHERE recommended_machine_id IS NOT NULL
+    ) machines
+    FULL JOIN machine_loads l USING (machine_id)
+    ORDER BY machine_id
+"""
+
+MACHINE_PARTS_QUERY = EFFECTIVE_ASSIGNMENTS_CTE + """
+    SELECT part_id, priority, due_date, estimated_hours
+    FROM effective
+    WHERE machine_id = %s
+    ORDER BY part_id
+"""
+
+# Arrow types of the MACHINE_PARTS_QUERY columns, for fetch_arrow
+MACHINE_PARTS_ARROW_COLUMNS = [
+    ("part_id", "string"),
+    ("priority", "string"),
+    ("due_date", "date32"),
+    ("estimated_hours", "double"),
+]
+
+# Bulk overrides are streamed into a per-transaction staging table with COPY and
+# merged into the overrides table, de-duplicated on (part_id, assigned_at).
+# Rows without an assigned_at get the transaction timestamp, so they are always
+# new rows: only rows that carry an assigned_at can be merged idempotently.
+OVERRIDE_STAGING_COLUMNS = ['seq', 'part_id', 'assigned_machine_id', 'assigned_by', 'assigned_at', 'notes']
 
+CREATE_OVERRIDE_STAGING_QUERY = """
+    CREATE TEMP TABLE override_staging (
+      seq BIGINT,
+      part_id VARCHAR(255),
+      assigned_machine_id VARCHAR(255),
+      assigned_by VARCHAR(255),
+      assigned_at TIMESTAMP,
+      notes TEXT
+    ) ON COMMIT DROP
+"""
+
+COPY_OVERRIDE_STAGING_QUERY = f"""
+    COPY override_staging ({', '.join(OVERRIDE_STAGING_COLUMNS)}) FROM STDIN
+"""
+
+# Last row wins when an upload repeats a (part_id, assigned_at) pair
+DEDUPE_OVERRIDE_STAGING_QUERY = """
+    CREATE TEMP TABLE override_incoming ON COMMIT DROP AS
+    SELECT DISTINCT ON (part_id, assigned_at) part_id, assigned_machine_id, assigned_by, assigned_at, notes
+    FROM (
+      SELECT seq, part_id, assigned_machine_id, assigned_by,
+             COALESCE(assigned_at, CURRENT_TIMESTAMP) AS assigned_at, notes
+      FROM override_staging
+    ) staged
+    ORDER BY part_id, assigned_at, seq DESC
+"""
+
+# One upsert against the unique (part_id, assigned_at) index, so concurrent
+# merges of the same rows cannot both insert. xmax is 0 only on freshly
+# inserted rows, which splits the count into (inserted, updated).
+MERGE_OVERRIDES_QUERY = f"""
+    WITH merged AS (
+      INSERT INTO {SCHEMA}.{OVERRIDES_TABLE_NAME} (part_id, assigned_machine_id, assigned_by, assigned_at, notes)
+      SELECT part_id, assigned_machine_id, assigned_by, assigned_at, notes
+      FROM override_incoming
+      ON CONFLICT (part_id, assigned_at) DO UPDATE
+      SET assigned_machine_id = EXCLUDED.assigned_machine_id,
+          assigned_by = EXCLUDED.assigned_by,
+          notes = EXCLUDED.notes
+      RETURNING xmax = 0 AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted)
+    FROM merged
+"""
+
+ROUTE_SUMMARY_QUERY = f"""
+    SELECT COUNT(part_id), COUNT(part_id) FILTER (WHERE priority = 'high')
+    FROM {SCHEMA}.{ROUTES_TABLE_NAME}
+"""
+
+# Columns the routes table can be sorted by, in the order they appear in a row.
+# Sorting is pushed into SQL, so only these names are ever interpolated.
+ROUTE_COLUMNS = ['part_id', 'priority', 'quantity_pending', 'due_date', 'recommended_machine_id', 'route_confidence']
+ROUTE_SORT_COLUMNS = ['part_id', 'priority', 'due_date', 'recommended_machine_id', 'route_confidence']
+ROUTES_PAGE_SIZE = 25
+
+# Dashboard queries that lakebase_setup indexes for; see check_index_usage()
+INDEXED_QUERIES = {
+    "routes": ROUTES_QUERY,
+    "parts": PARTS_QUERY,
+    "overdue_count": OVERDUE_COUNT_QUERY,
+}
+
+def _fetch_scalar(cur):
+    result = cur.fetchone()
+    return result[0] if result else 0
+
+@traced
+@cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
 def fetch_recommended_routes():
     """Fetch the recommended routes from Lakebase."""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(f"""
-                SELECT part_id, priority, quantity_pending, due_date, recommended_machine_id, route_confidence
-                FROM {SCHEMA}.{ROUTES_TABLE_NAME}
-                ORDER BY priority DESC, due_date ASC
-            """)
+            cur.execute(ROUTES_QUERY)
             return cur.fetchall()
 
+def parse_arrow_csv(buffer, columns):
+    """Parse COPY ... (FORMAT csv) output in buffer into a pyarrow Table of
+    (name, type) columns. Empty strings and NULLs stay distinct."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    schema = pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in columns])
+    if not buffer.getbuffer().nbytes:
+        return schema.empty_table()
+    with timed_phase("fetch"):
+        table = pa_csv.read_csv(
+            pa.py_buffer(buffer.getbuffer()),
+            read_options=pa_csv.ReadOptions(column_names=schema.names),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=schema,
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=False,
+            ),
+        )
+    record_rows(table.num_rows)
+    return table
+
+def _result_error(result):
+    """The psycopg exception for a failed libpq result, by SQLSTATE."""
+    message = (result.error_message or b"").decode(errors="replace")
+    sqlstate = result.error_field(pq.DiagnosticField.SQLSTATE)
+    try:
+        return psycopg.errors.lookup(sqlstate.decode())(message)
+    except (AttributeError, KeyError):
+        return psycopg.DatabaseError(message)
+
+def copy_to_buffer(conn, statement):
+    """Run a COPY ... TO STDOUT statement and return its output in a BytesIO.
+
+    Each row of COPY output is a separate message, and psycopg's Copy object
+    costs a generator round trip per message, which makes it slower than
+    fetchall() for large results. This reads them in a plain libpq loop.
+    """
+    buffer = io.BytesIO()
+    pgconn = conn.pgconn
+    error = None
+    with timed_phase("execute"):
+        pgconn.send_query(statement.encode())
+        while pgconn.flush():
+            select.select([], [pgconn.socket], [])
+        while (result := pgconn.get_result()) is not None:
+            if result.status == pq.ExecStatus.COPY_OUT:
+                nbytes, data = pgconn.get_copy_data(0)
+                while nbytes > 0:
+                    buffer.write(data)
+                    nbytes, data = pgconn.get_copy_data(0)
+                if nbytes == -2:
+                    raise psycopg.OperationalError(pgconn.error_message.decode(errors="replace"))
+            elif result.status == pq.ExecStatus.FATAL_ERROR:
+                error = error or _result_error(result)
+    if error is not None:
+        raise error
+    return buffer
+
+def fetch_arrow(query, columns, params=None):
+    """Run query and return its rows as a pyarrow Table of (name, type) columns.
+
+    The rows are streamed with COPY ... TO STDOUT as CSV and parsed by Arrow
+    straight into typed column buffers, so no Python object is created per
+    row or value. Parameters are bound client-side, as COPY cannot take any.
+    """
+    with get_connection() as conn:
+        if params is not None:
+            query = psycopg.ClientCursor(conn).mogrify(query, params)
+        buffer = copy_to_buffer(conn, f"COPY ({query}) TO STDOUT WITH (FORMAT csv)")
+    return parse_arrow_csv(buffer, columns)
+
+@traced
+@cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
+def fetch_routes_table():
+    """Fetch the recommended routes as a pyarrow Table, in ROUTES_QUERY order.
+
+    Arrow tables are immutable, so the cached table is shared safely between
+    sessions. Use summarize_routes for its dashboard metrics.
+    """
+    return fetch_arrow(ROUTES_QUERY, ROUTES_ARROW_COLUMNS)
+
+def summarize_routes(routes, today=None):
+    """Compute the dashboard metrics of a routes table with vectorized kernels.
+
+    Returns the same (total_parts, high_priority_parts) route summary as
+    ROUTE_SUMMARY_QUERY and the overdue count of OVERDUE_COUNT_QUERY, plus
+    the number of parts recommended to each machine.
+    """
+    import numpy as np
+    import pyarrow.compute as pc
+
+    today = np.datetime64(today or datetime.now().date(), 'D')
+    due_dates = routes.column("due_date").to_numpy(zero_copy_only=False)
+    machines = pc.value_counts(routes.column("recommended_machine_id").drop_null())
+    return {
+        "route_summary": (
+            routes.num_rows,
+            pc.sum(pc.equal(routes.column("priority"), "high")).as_py() or 0,
+        ),
+        # NaT (NULL due date) compares false, like NULL in SQL
+        "overdue_count": int(np.count_nonzero(due_dates < today)),
+        "parts_per_machine": dict(zip(
+            machines.field("values").to_pylist(), machines.field("counts").to_pylist()
+        )),
+    }
+
+@read_from_replica
+def fetch_snapshot_tables():
+    """Fetch the tables a snapshot saves, as pyarrow Tables by name."""
+    return {
+        "routes": fetch_arrow(ROUTES_QUERY, ROUTES_ARROW_COLUMNS),
+        "parts": fetch_arrow(PART_BACKLOG_QUERY, PART_ARROW_COLUMNS),
+        "overrides": fetch_arrow(OVERRIDES_QUERY, OVERRIDES_ARROW_COLUMNS),
+    }
+
+
+class SnapshotFallback:
+    """Decide when reads are served from the saved snapshot.
+
+    Once start() has run, reads are served from the snapshot the last run
+    saved, flagged as stale, until a connection to Lakebase succeeds or
+    stale_seconds pass. After a read or refresh cannot reach Lakebase, reads
+    are served from the latest snapshot, read-only, until a connection
+    succeeds again. The background refresh checks Lakebase with a quick query
+    before saving a new snapshot, every refresh_seconds, or every
+    retry_seconds while offline.
+    """
+
+    def __init__(self, store, refresh_seconds=SNAPSHOT_REFRESH_SECONDS, retry_seconds=SNAPSHOT_RETRY_SECONDS,
+                 stale_seconds=SNAPSHOT_STALE_SECONDS):
+        self.store = store
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+        self.stale_seconds = stale_seconds
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._loaded = False
+        self._live = False
+        self._offline = False
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.snapshot_reads = 0
+        self.failures = 0
+        self.last_error = None
+
+    @property
+    def snapshot(self):
+        """The latest snapshot, memory-mapped from disk on first use, or None."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._snapshot = self.store.load() if self.store is not None else None
+                    self._loaded = True
+        return self._snapshot
+
+    def mode(self):
+        """"live", "stale" (at startup, before Lakebase answers) or "offline"."""
+        if self._offline and self.snapshot is not None:
+            return "offline"
+        if (not self._live and self._started is not None and time.monotonic() - self._started < self.stale_seconds
+                and self.snapshot is not None):
+            return "stale"
+        return "live"
+
+    def serving(self):
+        """Return the snapshot if reads should be served from it, else None."""
+        if self.mode() == "live":
+            return None
+        self.snapshot_reads += 1
+        return self.snapshot
+
+    def mark_offline(self, error):
+        """Serve reads from the snapshot until a refresh reaches Lakebase again."""
+        with self._lock:
+            self.last_error = str(error)
+            self.failures += 1
+            self._offline = True
+        print(f"Lakebase unavailable, serving the saved snapshot: {str(error)}")
+        # Reads no longer reach Lakebase, so make sure a refresh is scheduled
+        self.start()
+
+    def mark_live(self):
+        """Serve reads from Lakebase, e.g. once a connection to it succeeds."""
+        if self._live and not self._offline:
+            return
+        with self._lock:
+            self._live, self._offline = True, False
+
+    def refresh(self):
+        """Load routes, parts and overrides from Lakebase, save them and go live."""
+        tables = fetch_snapshot_tables()
+        try:
+            self.store.save(tables)
+            # Serve the memory-mapped copy, so the fetched tables can be freed
+            snapshot = self.store.load()
+        except OSError as e:
+            print(f"Could not save snapshot in {self.store.directory}: {str(e)}")
+            snapshot = None
+        snapshot = snapshot or Snapshot(None, datetime.now().astimezone(), tables)
+        with self._lock:
+            self._snapshot, self._loaded = snapshot, True
+            self._offline, self._live = False, True
+
+    def start(self):
+        """Start refreshing the snapshot in a background thread."""
+        with self._lock:
+            if self.store is None or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._stop.clear()
+            if self._started is None:
+                self._started = time.monotonic()
+            self._thread = threading.Thread(target=self._refresh_loop, name="lakebase-snapshot", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                # A quick query first: the connection takes reads live (see
+                # get_connection) without waiting for the snapshot to save
+                with get_connection() as conn:
+                    conn.execute("SELECT 1")
+            except Exception as e:
+                self.mark_offline(e)
+                self._stop.wait(self.retry_seconds)
+                continue
+            try:
+                self.refresh()
+                wait = self.refresh_seconds
+            except (psycopg.OperationalError, PoolTimeout) as e:
+                self.mark_offline(e)
+                wait = self.retry_seconds
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Snapshot refresh error: {str(e)}")
+                wait = self.retry_seconds
+            self._stop.wait(wait)
+
+    def stats(self):
+        """Return the serving mode, the snapshot's age and the read counters."""
+        mode = self.mode()
+        snapshot = self._snapshot
+        return {
+            "mode": mode,
+            "snapshot_version": snapshot.version if snapshot is not None else None,
+            "saved_at": snapshot.saved_at.isoformat() if snapshot is not None else None,
+            "age_s": round(time.time() - snapshot.saved_at.timestamp(), 1) if snapshot is not None else None,
+            "snapshot_reads": self.snapshot_reads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+snapshot_fallback = SnapshotFallback(SnapshotStore(SNAPSHOT_DIR) if SNAPSHOT_DIR else None)
+
+
+def served_from_snapshot(from_snapshot):
+    """Serve func from the saved snapshot when Lakebase is not available.
+
+    from_snapshot takes the snapshot followed by func's arguments. It is used
+    while snapshot_fallback is stale or offline, and when func cannot reach
+    Lakebase; without a snapshot the error is raised as usual. Goes above
+    cached_query, so answers from the snapshot are never cached. Works on
+    coroutine functions too.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                snapshot = snapshot_fallback.serving()
+                if snapshot is not None:
+                    return from_snapshot(snapshot, *args, **kwargs)
+                try:
+                    return await func(*args, **kwargs)
+                except (psycopg.OperationalError, PoolTimeout) as e:
+                    if snapshot_fallback.snapshot is None:
+                        raise
+                    snapshot_fallback.mark_offline(e)
+                    return from_snapshot(snapshot_fallback.serving(), *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            snapshot = snapshot_fallback.serving()
+            if snapshot is not None:
+                return from_snapshot(snapshot, *args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            except (psycopg.OperationalError, PoolTimeout) as e:
+                if snapshot_fallback.snapshot is None:
+                    raise
+                snapshot_fallback.mark_offline(e)
+                return from_snapshot(snapshot_fallback.serving(), *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_snapshot_refresh():
+    """Serve the saved snapshot until Lakebase answers, and keep it fresh."""
+    snapshot_fallback.start()
+
+def get_snapshot_status():
+    """Return whether reads are live or from the snapshot, and its age."""
+    return snapshot_fallback.stats()
+
+def table_rows(table, columns=None):
+    """The rows of a pyarrow Table as tuples, like cursor.fetchall()."""
+    return list(zip(*(table.column(name).to_pylist() for name in columns or table.column_names)))
+
+def _is_in(table, column, values):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    return table.filter(pc.is_in(table.column(column), value_set=pa.array(list(values), pa.string())))
+
+def _top_k(table, k, sort_keys):
+    """The first k rows of table in sort_keys order, without sorting all of it."""
+    import pyarrow.compute as pc
+
+    if table.num_rows == 0:
+        # select_k_unstable cannot return an empty result
+        return table
+    return table.take(pc.select_k_unstable(table, k, sort_keys))
+
+def dashboard_from_snapshot(snapshot):
+    """fetch_dashboard_snapshot, computed from a saved snapshot."""
+    summary = summarize_routes(snapshot["routes"])
+    return DashboardSnapshot(
+        route_summary=summary["route_summary"],
+        machines=[(machine,) for machine in sorted(summary["parts_per_machine"])],
+        overrides=table_rows(snapshot["overrides"]),
+        overdue_count=summary["overdue_count"],
+    )
+
+def routes_page_from_snapshot(snapshot, sort_by="part_id", descending=False, after=None, page_size=ROUTES_PAGE_SIZE):
+    """fetch_routes_page, computed from a saved snapshot."""
+    import pyarrow.compute as pc
+
+    key_columns = routes_page_key_columns(sort_by)
+    routes = snapshot["routes"]
+    if after is not None:
+        # The same seek as build_routes_page_query, NULL keys included
+        compare = pc.less if descending else pc.greater
+        part_ids = routes.column("part_id")
+        if len(key_columns) == 1:
+            mask = compare(part_ids, after[0])
+        else:
+            values = routes.column(sort_by)
+            if after[0] is None:
+                mask = pc.and_(pc.is_null(values), compare(part_ids, after[1]))
+                if descending:
+                    mask = pc.or_(mask, pc.is_valid(values))
+            else:
+                mask = pc.or_(
+                    compare(values, after[0]),
+                    pc.and_(pc.equal(values, after[0]), compare(part_ids, after[1])),
+                ).fill_null(False)
+                if not descending:
+                    mask = pc.or_(mask, pc.is_null(values))
+        routes = routes.filter(mask)
+    order = "descending" if descending else "ascending"
+    # Sort on whether the key is NULL first, so NULLs go last ascending and first descending
+    keyed = routes.append_column("key_is_null", pc.is_null(routes.column(key_columns[0])))
+    indices = pc.sort_indices(keyed, [("key_is_null", order)] + [(column, order) for column in key_columns])
+    top = routes.take(indices[:page_size + 1])
+    return make_routes_page(table_rows(top, ROUTE_COLUMNS), key_columns, page_size)
+
+def effective_routes_from_snapshot(snapshot, part_ids=None):
+    """fetch_effective_routes, computed from a saved snapshot."""
+    import pyarrow.compute as pc
+
+    routes, overrides = snapshot["routes"], snapshot["overrides"]
+    if part_ids is not None:
+        routes = _is_in(routes, "part_id", part_ids)
+        overrides = _is_in(overrides, "part_id", part_ids)
+    # Overrides are saved newest first, so a part's first one is its latest
+    latest = {}
+    for part_id, *override in table_rows(overrides):
+        latest.setdefault(part_id, override)
+    routes = routes.take(pc.sort_indices(routes, [("priority", "descending"), ("due_date", "ascending")]))
+    rows = []
+    for route in table_rows(routes, ROUTE_COLUMNS):
+        machine, assigned_by, assigned_at, notes = latest.get(route[0], (None, None, None, None))
+        rows.append(route + (machine if machine is not None else route[4], assigned_by, assigned_at, notes))
+    return rows
+
+def part_lookup_many_from_snapshot(snapshot, part_ids):
+    """part_lookup_many, computed from a saved snapshot."""
+    part_ids = list(dict.fromkeys(part_ids))
+    found = {row[0]: row for row in table_rows(_is_in(snapshot["parts"], "part_id", part_ids))}
+    return {part_id: found[part_id] for part_id in part_ids if part_id in found}
+
+def search_parts_from_snapshot(snapshot, query, limit=PART_SEARCH_LIMIT):
+    """search_parts, computed from a saved snapshot: prefix matches only."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if not query or not query.strip():
+        return []
+    prefix = query.strip().lower()
+    parts = snapshot["parts"]
+    matches = {}
+    for rank, column in enumerate(PART_SEARCH_COLUMNS):
+        key = pc.utf8_lower(parts.column(column))
+        candidates = pa.table({
+            "key": key,
+            "part_id": parts.column("part_id"),
+            "drawing_number": parts.column("drawing_number"),
+            "material": parts.column("material"),
+        }).filter(pc.starts_with(key, prefix))
+        top = _top_k(candidates, limit, [("key", "ascending"), ("part_id", "ascending")])
+        for part_id, drawing_number, material in table_rows(top, ["part_id", "drawing_number", "material"]):
+            matches.setdefault(part_id, (rank, (part_id, drawing_number, material, column)))
+    return [row for _, row in sorted(matches.values(), key=lambda match: (match[0], match[1][0]))][:limit]
+
+@traced
+@cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
 def fetch_machines():
     """Fetch the machines from Lakebase for machine selection in the app."""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(f"""
-                SELECT distinct recommended_machine_id
-                FROM {SCHEMA}.{ROUTES_TABLE_NAME}
-                ORDER BY 1 asc
-            """)
+            cur.execute(MACHINES_QUERY)
             return cur.fetchall()
 
+@traced
+@cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
 def fetch_parts():
     """Fetch the parts from Lakebase for part selection in the app."""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(f"""
-                SELECT distinct part_id,  
-                    CAST(SUBSTRING(part_id FROM 'part_(.*)') AS INTEGER) as part_num
-                FROM {SCHEMA}.{ROUTES_TABLE_NAME}
-                ORDER BY part_num ASC
-            """)
+            cur.execute(PARTS_QUERY)
             return cur.fetchall()
 
+@traced
+@cached_query(ttl=OVERRIDES_TTL_SECONDS, tables=[OVERRIDES_TABLE_NAME])
+@read_from_replica
 def fetch_overrides():
     """Fetch assignment overrides from Lakebase for override history in the app."""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(f"""
-                SELECT part_id, assigned_machine_id, assigned_by, assigned_at, notes
-                FROM {SCHEMA}.{OVERRIDES_TABLE_NAME}
-                ORDER BY assigned_at DESC
-            """)
+            cur.execute(OVERRIDES_QUERY)
             return cur.fetchall()
 
+@traced
+@served_from_snapshot(effective_routes_from_snapshot)
+@cached_query(ttl=OVERRIDES_TTL_SECONDS, tables=[ROUTES_TABLE_NAME, OVERRIDES_TABLE_NAME])
+@read_from_replica
+def fetch_effective_routes(part_ids=None):
+    """Fetch routes with the machine each part is routed to after overrides.
+
+    Rows are the route columns followed by effective_machine_id and the
+    assigned_by, assigned_at and notes of the latest override (None if the part
+    has no override). Pass a tuple of part_ids to limit the result to them.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(EFFECTIVE_ROUTES_QUERY, {"part_ids": list(part_ids) if part_ids is not None else None})
+            return cur.fetchall()
+
+# Order parts are moved in, most urgent first; other priorities come last
+PRIORITY_RANKS = {"high": 0, "medium": 1, "low": 2}
+
+def build_machine_loads(rows, hours_per_day=MACHINE_HOURS_PER_DAY, horizon_days=CAPACITY_HORIZON_DAYS):
+    """Turn MACHINE_LOAD_QUERY rows into a dict of read-only NumPy columns.
+
+    Adds backlog_days, the days each machine needs to clear its backlog, and
+    utilization, its backlog over horizon_days of capacity (above 1 means it
+    cannot finish its backlog within the horizon).
+    """
+    import numpy as np
+
+    columns = list(zip(*rows)) or [()] * len(MACHINE_LOAD_COLUMNS)
+    loads = {"machine_id": np.array(columns[0], dtype=object)}
+    for name, values in zip(MACHINE_LOAD_COLUMNS[1:], columns[1:]):
+        loads[name] = np.array(values, dtype=np.float64 if name.endswith("_hours") else np.int64)
+    loads["backlog_days"] = loads["backlog_hours"] / hours_per_day
+    loads["utilization"] = loads["backlog_hours"] / (hours_per_day * horizon_days)
+    # Cached loads are shared between sessions
+    for column in loads.values():
+        column.flags.writeable = False
+    return loads
+
+@traced
+@cached_query(ttl=OVERRIDES_TTL_SECONDS, tables=[ROUTES_TABLE_NAME, PART_LOOKUP_TABLE_NAME, OVERRIDES_TABLE_NAME])
+@read_from_replica
+def fetch_machine_loads():
+    """Fetch each machine's backlog after overrides, with one aggregation query.
+
+    Returns a dict of NumPy columns, one entry per machine in machine_id
+    order: MACHINE_LOAD_COLUMNS plus backlog_days and utilization.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(MACHINE_LOAD_QUERY)
+            return build_machine_loads(cur.fetchall())
+
+@traced
+@cached_query(ttl=OVERRIDES_TTL_SECONDS, tables=[ROUTES_TABLE_NAME, PART_LOOKUP_TABLE_NAME, OVERRIDES_TABLE_NAME])
+@read_from_replica
+def fetch_machine_parts(machine_id):
+    """Fetch the parts routed to a machine after overrides, as a pyarrow Table
+    of MACHINE_PARTS_ARROW_COLUMNS."""
+    return fetch_arrow(MACHINE_PARTS_QUERY, MACHINE_PARTS_ARROW_COLUMNS, (machine_id,))
+
+@dataclass(frozen=True)
+class RebalancePlan:
+    """Proposed moves for a downed machine's parts, and the loads after them.
+
+    `moves` holds NumPy columns, one entry per part, most urgent first:
+    part_id, priority, due_date, estimated_hours, assigned_machine_id,
+    projected_finish and late. `loads` is the machine loads with
+    projected_backlog_hours and projected_utilization added.
+    """
+    machine_id: str
+    moves: dict
+    loads: dict
+
+    @property
+    def late_parts(self):
+        return int(self.moves["late"].sum())
+
+    def override_rows(self, notes, assigned_at=None):
+        """The moves as (part_id, assigned_machine_id, notes, assigned_at) rows
+        for add_overrides_bulk. Applying them twice with the same assigned_at
+        updates the first set instead of adding a second."""
+        return [(part_id, machine_id, notes, assigned_at)
+                for part_id, machine_id in zip(self.moves["part_id"], self.moves["assigned_machine_id"])]
+
+def _fill_level(loads, hours):
+    """The load the least loaded machines reach if hours are poured into them."""
+    import numpy as np
+
+    ordered = np.sort(loads)
+    filled = np.cumsum(ordered)
+    # Raising the k least loaded machines to the k-th lowest load takes needed[k - 1]
+    needed = np.arange(1, len(ordered) + 1) * ordered - filled
+    k = np.searchsorted(needed, hours, side="right")
+    return (hours + filled[k - 1]) / k
+
+def plan_rebalance(loads, parts, machine_id, exclude=(), today=None,
+                   hours_per_day=MACHINE_HOURS_PER_DAY, horizon_days=CAPACITY_HORIZON_DAYS):
+    """Spread machine_id's parts over the other machines, e.g. when it goes down.
+
+    loads comes from fetch_machine_loads and parts, a pyarrow Table of
+    MACHINE_PARTS_ARROW_COLUMNS, from fetch_machine_parts.
+    Parts are placed most urgent first (priority, then due date) on the
+    machine that frees up earliest, queued behind its current backlog. Each
+    round places the next parts on the machines still below the level that
+    spreading all the hours evenly would reach, least loaded first, so
+    overloaded machines take nothing. A round is a few array operations: it
+    places one part on every open machine or, when only one machine is open,
+    the whole run of parts it takes before it passes the next least loaded
+    machine. A move is late if its machine would finish it,
+    at hours_per_day, after the part's due date. Machines in exclude get no
+    parts.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    today = np.datetime64(today or datetime.now().date(), 'D')
+    part_ids = parts.column("part_id").to_numpy(zero_copy_only=False)
+    priorities = parts.column("priority").to_numpy(zero_copy_only=False)
+    due_dates = parts.column("due_date").to_numpy(zero_copy_only=False).astype("datetime64[D]")
+    hours = np.nan_to_num(parts.column("estimated_hours").to_numpy(zero_copy_only=False))
+
+    # NULL due dates go after every due date
+    due_keys = np.where(np.isnat(due_dates), np.iinfo(np.int64).max, due_dates.astype(np.int64))
+    ranks = pc.index_in(parts.column("priority"), value_set=pa.array(list(PRIORITY_RANKS)))
+    ranks = ranks.fill_null(len(PRIORITY_RANKS)).to_numpy(zero_copy_only=False)
+    order = np.lexsort((due_keys, ranks))
+
+    machine_ids = loads["machine_id"]
+    targets = np.flatnonzero([machine != machine_id and machine not in exclude for machine in machine_ids])
+    target_loads = loads["backlog_hours"][targets].copy()
+    assigned = np.zeros(len(order), dtype=np.intp)
+    starts = np.zeros(len(order))
+    if len(targets):
+        level = _fill_level(target_loads, hours.sum())
+        # Hours of the first i parts in order, for placing runs of parts at once
+        cumulative_hours = np.concatenate(([0.0], np.cumsum(hours[order])))
+        placed = 0
+        while placed < len(order):
+            open_machines = np.flatnonzero(target_loads < level)
+            if not len(open_machines):
+                open_machines = np.array([np.argmin(target_loads)])
+            if len(open_machines) == 1:
+                # The lone open machine keeps taking parts while it starts them
+                # below every other machine's load
+                machine = open_machines[0]
+                others = np.delete(target_loads, machine)
+                bound = others.min() - target_loads[machine] if len(others) else np.inf
+                end = np.searchsorted(cumulative_hours, cumulative_hours[placed] + bound, side="left")
+                end = max(min(end, len(order)), placed + 1)
+                batch = order[placed:end]
+                starts[batch] = target_loads[machine] + cumulative_hours[placed:end] - cumulative_hours[placed]
+                assigned[batch] = machine
+                target_loads[machine] += cumulative_hours[end] - cumulative_hours[placed]
+                placed = end
+                continue
+            open_machines = open_machines[np.argsort(target_loads[open_machines], kind="stable")][:len(order) - placed]
+            batch = order[placed:placed + len(open_machines)]
+            assigned[batch] = open_machines
+            starts[batch] = target_loads[open_machines]
+            target_loads[open_machines] += hours[batch]
+            placed += len(batch)
+    elif len(order):
+        raise ValueError(f"No machine can take the parts on {machine_id}")
+
+    finish_days = np.ceil((starts + hours) / hours_per_day).astype(np.int64)
+    projected_finish = today + finish_days.astype("timedelta64[D]")
+    moves = {
+        "part_id": part_ids[order],
+        "priority": priorities[order],
+        "due_date": due_dates[order],
+        "estimated_hours": hours[order],
+        "assigned_machine_id": machine_ids[targets][assigned[order]],
+        "projected_finish": projected_finish[order],
+        # A NaT due date compares false, so it is never late
+        "late": (due_dates < projected_finish)[order],
+    }
+
+    projected = loads["backlog_hours"].copy()
+    projected[targets] = target_loads
+    projected[machine_ids == machine_id] = 0
+    loads = dict(loads)
+    loads["projected_backlog_hours"] = projected
+    loads["projected_utilization"] = projected / (hours_per_day * horizon_days)
+    return RebalancePlan(machine_id, moves, loads)
+
+@traced
+def propose_rebalance(machine_id, exclude=()):
+    """Propose moving every part routed to machine_id onto other machines.
+
+    Returns a RebalancePlan; see plan_rebalance. Apply it with
+    add_overrides_bulk(plan.override_rows(notes), assigned_by).
+    """
+    return plan_rebalance(fetch_machine_loads(), fetch_machine_parts(machine_id), machine_id, exclude)
+
+def split_cached_parts(part_ids):
+    """Split part_ids into (cached rows by part_id, part_ids still to fetch)."""
+    found = {}
+    missing = []
+    for part_id in dict.fromkeys(part_ids):
+        hit, row = part_cache.get(part_id)
+        if hit:
+            found[part_id] = row
+        else:
+            missing.append(part_id)
+    return found, missing
+
+def cache_parts(rows, generation):
+    """Store fetched part rows in the part cache."""
+    for row in rows:
+        part_cache.set(row[0], row, PART_CACHE_TTL_SECONDS, (PART_LOOKUP_TABLE_NAME,), generation)
+
+@traced
+@served_from_snapshot(part_lookup_many_from_snapshot)
+@read_from_replica
+def part_lookup_many(part_ids):
+    """Look up many parts at once, serving cached parts from memory.
+
+    Uncached parts are fetched in a single `= ANY(...)` query. Returns a dict of
+    part_id -> row, in request order, for the parts that exist.
+    """
+    found, missing = split_cached_parts(part_ids)
+    if missing:
+        generation = part_cache.generation((PART_LOOKUP_TABLE_NAME,))
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(PART_LOOKUP_QUERY, (missing,))
+                rows = cur.fetchall()
+        cache_parts(rows, generation)
+        found.update((row[0], row) for row in rows)
+    return {part_id: found[part_id] for part_id in dict.fromkeys(part_ids) if part_id in found}
+
+def prefetch_parts(part_ids, background=True):
+    """Warm the part cache, e.g. with the parts at the top of the routes list."""
+    _, missing = split_cached_parts(part_ids)
+    if not missing:
+        return
+    if background:
+        threading.Thread(target=part_lookup_many, args=(missing,), daemon=True).start()
+    else:
+        part_lookup_many(missing)
+
+@traced
 def part_lookup(part_id):
-    """Look up a single part by ID from the part backlog table with timing."""
-    import time
+    """Look up a single part by ID from the part backlog table with timing.
+
+    The row is followed by the lookup time in ms and where it was served from,
+    "cache", "database" or "snapshot".
+    """
     start_time = time.time()
     
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(f"""
-                SELECT 
-                    part_id, 
-                    priority, 
-                    quantity_pending, 
-                    due_date, 
-                    material, 
-                    part_type, 
-                    quality_level, 
-                    surface_finish, 
-                    tolerance, 
-                    weight_kg, 
-                    dimensions, 
-                    drawing_number, 
-                    revision, 
-                    estimated_hours
-                FROM {SCHEMA}.{PART_LOOKUP_TABLE_NAME}
-                WHERE part_id = %s
-            """, (part_id,))
-            result = cur.fetchone()
+    hit, result = part_cache.get(part_id)
+    if not hit:
+        result = part_lookup_many([part_id]).get(part_id)
     
     query_time = round((time.time() - start_time) * 1000, 2)
     
     if result:
         # Return the result with timing information
-        return result + (query_time,)
+        source = "cache" if hit else "database" if snapshot_fallback.mode() == "live" else "snapshot"
+        return result + (query_time, source)
     else:
         return None
 
+_trigram_search = None
+
+def has_trigram_search(conn):
+    """Return True if pg_trgm is installed, checked once per process."""
+    global _trigram_search
+    if _trigram_search is None:
+        _trigram_search = conn.execute(TRIGRAM_AVAILABLE_QUERY).fetchone()[0]
+    return _trigram_search
+
+@traced
+@served_from_snapshot(search_parts_from_snapshot)
+@cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[PART_LOOKUP_TABLE_NAME])
+@read_from_replica
+def search_parts(query, limit=PART_SEARCH_LIMIT):
+    """Search parts by part_id, drawing number or material, for typeahead.
+
+    Returns up to `limit` (part_id, drawing_number, material, matched_on) rows,
+    prefix matches first, then fuzzy matches by trigram distance when pg_trgm
+    is installed (lakebase_setup installs it) and the query has at least
+    PART_SEARCH_MIN_FUZZY_LENGTH characters.
+    """
+    if not query or not query.strip():
+        return []
+    with get_connection() as conn:
+        query_sql = build_part_search_query(has_trigram_search(conn))
+        with conn.cursor() as cur:
+            cur.execute(query_sql, part_search_params(query, limit))
+            return cur.fetchall()
+
+@traced
+@cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
 def count_overdue_parts():
     """Count the number of parts that are overdue (due_date <= current date)."""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(f"""
-                SELECT COUNT(part_id)
-                FROM {SCHEMA}.{ROUTES_TABLE_NAME}
-                WHERE due_date::date < CURRENT_DATE
-            """)
-            result = cur.fetchone()
-            return result[0] if result else 0
+            cur.execute(OVERDUE_COUNT_QUERY)
+            return _fetch_scalar(cur)
+
+@traced
+@cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
+def fetch_route_summary():
+    """Count total and high priority parts in the routes table."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(ROUTE_SUMMARY_QUERY)
+            return cur.fetchone()
+
+@dataclass(frozen=True)
+class RoutesPage:
+    """One page of recommended routes plus the key to seek past it."""
+    rows: list
+    next_key: tuple = None
+
+    @property
+    def has_next(self):
+        return self.next_key is not None
+
+def routes_page_key_columns(sort_by):
+    """The columns a routes page is ordered and seeks by: sort_by, then part_id."""
+    if sort_by not in ROUTE_SORT_COLUMNS:
+        raise ValueError(f"Cannot sort routes by {sort_by!r}")
+    return ["part_id"] if sort_by == "part_id" else [sort_by, "part_id"]
+
+def build_routes_page_query(sort_by, descending, after, page_size):
+    """Build the keyset pagination query for fetch_routes_page.
+
+    Returns (query, params, key_columns). One extra row is requested so the
+    caller can tell whether another page follows.
+
+    Synced columns can be NULL, which a row comparison never matches. NULL
+    keys sort last ascending and first descending, so a page that crosses
+    between NULL and non-NULL keys reads each side in its own index-ordered
+    branch.
+    """
+    key_columns = routes_page_key_columns(sort_by)
+    direction = "DESC" if descending else "ASC"
+    nulls = "NULLS FIRST" if descending else "NULLS LAST"
+    order_by = ', '.join(f'{column} {direction} {nulls}' for column in key_columns)
+    compare = '<' if descending else '>'
+    # (condition, params) of each branch, in page order
+    if after is None:
+        branches = [("", [])]
+    elif len(key_columns) == 1:
+        branches = [(f"WHERE part_id {compare} %s", list(after))]
+    elif after[0] is None:
+        branches = [(f"WHERE {sort_by} IS NULL AND part_id {compare} %s", [after[1]])]
+        if descending:
+            branches.append((f"WHERE {sort_by} IS NOT NULL", []))
+    else:
+        branches = [(f"WHERE ({sort_by}, part_id) {compare} (%s, %s)", list(after))]
+        if not descending:
+            branches.append((f"WHERE {sort_by} IS NULL", []))
+
+    select = f"SELECT {', '.join(ROUTE_COLUMNS)} FROM {SCHEMA}.{ROUTES_TABLE_NAME}"
+    params = []
+    for _, branch_params in branches:
+        params.extend(branch_params + [page_size + 1])
+    query = " UNION ALL ".join(f"({select} {where} ORDER BY {order_by} LIMIT %s)" for where, _ in branches)
+    if len(branches) > 1:
+        query = f"SELECT * FROM ({query}) page ORDER BY {order_by} LIMIT %s"
+        params.append(page_size + 1)
+    return query, params, key_columns
+
+def make_routes_page(rows, key_columns, page_size):
+    """Trim the look-ahead row and compute the key of the next page."""
+    if len(rows) <= page_size:
+        return RoutesPage(rows)
+    rows = rows[:page_size]
+    return RoutesPage(rows, tuple(rows[-1][ROUTE_COLUMNS.index(column)] for column in key_columns))
+
+@traced
+@served_from_snapshot(routes_page_from_snapshot)
+@cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
+def fetch_routes_page(sort_by="part_id", descending=False, after=None, page_size=ROUTES_PAGE_SIZE):
+    """Fetch one page of recommended routes sorted in SQL.
+
+    Uses keyset pagination: `after` is the `next_key` of the previous page, and
+    the query seeks past it instead of using OFFSET, so every page costs the
+    same no matter how deep it is. part_id breaks ties in the sort column.
+    """
+    query, params, key_columns = build_routes_page_query(sort_by, descending, after, page_size)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return make_routes_page(cur.fetchall(), key_columns, page_size)
+
+def plan_uses_index(plan):
+    """True if an EXPLAIN (FORMAT JSON) plan node, or any node below it, scans an index."""
+    if plan["Node Type"] in ("Index Scan", "Index Only Scan", "Bitmap Index Scan"):
+        return True
+    return any(plan_uses_index(child) for child in plan.get("Plans", []))
+
+def index_usage(cur):
+    """EXPLAIN the indexed dashboard queries on cur and report which can use an index.
+
+    Sequential scans are disabled for the rest of cur's transaction, so the
+    planner picks an index whenever the query can use one, even on tables
+    small enough to scan. Any DB-API cursor works, so the setup notebook can
+    run it over psycopg2. Returns a dict of query name -> True/False.
+    """
+    cur.execute("SET LOCAL enable_seqscan = off")
+    results = {}
+    for name, query in INDEXED_QUERIES.items():
+        cur.execute("EXPLAIN (FORMAT JSON) " + query)
+        plan = cur.fetchone()[0]
+        results[name] = plan_uses_index(plan[0]["Plan"])
+    return results
+
+@traced
+def check_index_usage():
+    """Run index_usage() on a pooled connection."""
+    with get_connection() as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                return index_usage(cur)
+
+@dataclass(frozen=True)
+class DashboardSnapshot:
+    """Everything the dashboard needs to render a page."""
+    route_summary: tuple
+    machines: list
+    overrides: list
+    overdue_count: int
+
+    @property
+    def total_parts(self):
+        return self.route_summary[0]
+
+    @property
+    def high_priority_parts(self):
+        return self.route_summary[1]
+
+
+# (snapshot field, cache key, query, result reader, ttl, tables). The cache keys
+# match the fetch_* functions so the snapshot and single fetches share entries.
+DASHBOARD_QUERIES = [
+    ("route_summary", ("fetch_route_summary",), ROUTE_SUMMARY_QUERY, lambda cur: cur.fetchone(),
+     SYNCED_TABLE_TTL_SECONDS, (ROUTES_TABLE_NAME,)),
+    ("machines", ("fetch_machines",), MACHINES_QUERY, lambda cur: cur.fetchall(),
+     SYNCED_TABLE_TTL_SECONDS, (ROUTES_TABLE_NAME,)),
+    ("overrides", ("fetch_overrides",), OVERRIDES_QUERY, lambda cur: cur.fetchall(),
+     OVERRIDES_TTL_SECONDS, (OVERRIDES_TABLE_NAME,)),
+    ("overdue_count", ("count_overdue_parts",), OVERDUE_COUNT_QUERY, _fetch_scalar,
+     SYNCED_TABLE_TTL_SECONDS, (ROUTES_TABLE_NAME,)),
+]
 
+@traced
+@served_from_snapshot(dashboard_from_snapshot)
+@read_from_replica
+def fetch_dashboard_snapshot():
+    """Fetch all dashboard data, sending every uncached query in one round trip.
+
+    Cache misses are queued on a single connection in pipeline mode, so the
+    page costs one network round trip instead of one per query.
+    """
+    values = {}
+    pending = []
+    for field, key, query, read, ttl, tables in DASHBOARD_QUERIES:
+        hit, value = query_cache.get(key)
+        if hit:
+            values[field] = value
+        else:
+            pending.append((field, key, query, read, ttl, tables, query_cache.generation(tables)))
+
+    if pending:
+        with get_connection() as conn:
+            with conn.pipeline():
+                cursors = [conn.execute(query) for _, _, query, _, _, _, _ in pending]
+            for (field, key, _, read, ttl, tables, generation), cur in zip(pending, cursors):
+                values[field] = read(cur)
+                query_cache.set(key, values[field], ttl, tables, generation)
+                cur.close()
+
+    return DashboardSnapshot(**values)
+
+@traced
 def add_override(part_id, assigned_machine_id, assigned_by, notes):
     """Add or update an assignment override."""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(f"""
-                INSERT INTO {SCHEMA}.{OVERRIDES_TABLE_NAME} (part_id, assigned_machine_id, assigned_by, assigned_at, notes)
-                VALUES (%s, %s, %s, CURRENT_TIMESTAMP, %s)
-            """, (part_id, assigned_machine_id, assigned_by, notes))
+            cur.execute(ADD_OVERRIDE_QUERY, (part_id, assigned_machine_id, assigned_by, notes))
             conn.commit()
+        record_write(conn)
+    query_cache.invalidate(OVERRIDES_TABLE_NAME)
+
+def staged_override_rows(overrides, assigned_by):
+    """Turn (part_id, assigned_machine_id, notes[, assigned_at]) rows into staging rows."""
+    for seq, override in enumerate(overrides):
+        part_id, assigned_machine_id, notes = override[:3]
+        assigned_at = override[3] if len(override) > 3 else None
+        if not part_id or not assigned_machine_id:
+            raise ValueError(f"Override {seq + 1} needs a part_id and an assigned_machine_id")
+        yield (seq, part_id, assigned_machine_id, assigned_by, assigned_at, notes)
+
+@traced
+def add_overrides_bulk(overrides, assigned_by):
+    """Add or update many assignment overrides in a single transaction.
+
+    `overrides` is an iterable of (part_id, assigned_machine_id, notes) or
+    (part_id, assigned_machine_id, notes, assigned_at) rows. They are streamed
+    with COPY and merged on (part_id, assigned_at), so re-submitting rows with
+    the same assigned_at updates them instead of adding duplicates. Rows
+    without an assigned_at are stamped with the current time and always
+    inserted. Returns (inserted, updated).
+    """
+    return merge_override_rows(staged_override_rows(overrides, assigned_by))
+
+def merge_override_rows(rows):
+    """Merge (seq, part_id, assigned_machine_id, assigned_by, assigned_at, notes)
+    staging rows into the overrides table in one transaction.
+
+    Returns (inserted, updated).
+    """
+    with get_connection() as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.execute(CREATE_OVERRIDE_STAGING_QUERY)
+                with cur.copy(COPY_OVERRIDE_STAGING_QUERY) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                cur.execute(DEDUPE_OVERRIDE_STAGING_QUERY)
+                cur.execute(MERGE_OVERRIDES_QUERY)
+                inserted, updated = cur.fetchone()
+        record_write(conn)
+    query_cache.invalidate(OVERRIDES_TABLE_NAME)
+    return inserted, updated
+
+@traced
+def write_queued_overrides(overrides):
+    """Write a batch from the override queue: (part_id, assigned_machine_id,
+    assigned_by, assigned_at, notes) rows, merged on (part_id, assigned_at)."""
+    return merge_override_rows((seq, *override) for seq, override in enumerate(overrides))
+
+override_queue = OverrideQueue(
+    OVERRIDE_QUEUE_PATH,
+    write_queued_overrides,
+    transient_errors=(psycopg.OperationalError, PoolTimeout),
+    batch_size=OVERRIDE_QUEUE_BATCH_SIZE,
+    linger_seconds=OVERRIDE_QUEUE_LINGER_MS / 1000,
+    max_attempts=OVERRIDE_QUEUE_MAX_ATTEMPTS,
+)
+
+@traced
+def queue_override(part_id, assigned_machine_id, assigned_by, notes, idempotency_key=None):
+    """Queue an override for the write-behind worker and return its idempotency key.
+
+    Returns once the override is on local disk. Queuing the same
+    idempotency_key twice only queues it once.
+    """
+    override_queue.start()
+    return override_queue.enqueue(part_id, assigned_machine_id, assigned_by, notes, idempotency_key)
+
+def start_override_queue():
+    """Start writing queued overrides, including any left from a previous run."""
+    override_queue.start()
+
+def fetch_queued_overrides(limit=20):
+    """Return the newest queued overrides with their status, newest first."""
+    return override_queue.recent(limit)
+
+def retry_failed_overrides():
+    """Queue failed overrides again; returns how many were requeued."""
+    return override_queue.retry_failed()
+
+def get_override_queue_stats():
+    """Return the override queue's counts by status and worker counters."""
+    return override_queue.stats()
@@ -0,0 +1,455 @@
+import asyncio
+import functools
+import io
+import time
+import psycopg
+from psycopg_pool import AsyncConnectionPool
+from query_metrics import traced, record_phase, AsyncInstrumentedCursor
+from data_access import (
+    credential_provider,
+    get_conninfo,
+    get_replica_host,
+    replica_router,
+    ReplicaUnavailable,
+    read_from_replica,
+    reading_from_replica,
+    served_from_snapshot,
+    snapshot_fallback,
+    dashboard_from_snapshot,
+    routes_page_from_snapshot,
+    effective_routes_from_snapshot,
+    part_lookup_many_from_snapshot,
+    search_parts_from_snapshot,
+    override_queue,
+    query_cache,
+    part_cache,
+    split_cached_parts,
+    cache_parts,
+    staged_override_rows,
+    build_routes_page_query,
+    make_routes_page,
+    parse_arrow_csv,
+    build_machine_loads,
+    plan_rebalance,
+    plan_uses_index,
+    build_part_search_query,
+    part_search_params,
+    DashboardSnapshot,
+    ROUTES_PAGE_SIZE,
+    PART_SEARCH_LIMIT,
+    POOL_MAX_LIFETIME_SECONDS,
+    POOL_MIN_SIZE,
+    POOL_MAX_SIZE,
+    READ_REPLICA_PORT,
+    REPLICA_CHECKOUT_TIMEOUT_SECONDS,
+    CURRENT_WAL_LSN_QUERY,
+    REPLICA_CAUGHT_UP_QUERY,
+    SYNCED_TABLE_TTL_SECONDS,
+    OVERRIDES_TTL_SECONDS,
+    ROUTES_TABLE_NAME,
+    OVERRIDES_TABLE_NAME,
+    PART_LOOKUP_TABLE_NAME,
+    ROUTES_QUERY,
+    ROUTES_ARROW_COLUMNS,
+    MACHINES_QUERY,
+    PARTS_QUERY,
+    OVERRIDES_QUERY,
+    OVERDUE_COUNT_QUERY,
+    ROUTE_SUMMARY_QUERY,
+    EFFECTIVE_ROUTES_QUERY,
+    PART_LOOKUP_QUERY,
+    MACHINE_LOAD_QUERY,
+    MACHINE_PARTS_QUERY,
+    MACHINE_PARTS_ARROW_COLUMNS,
+    INDEXED_QUERIES,
+    TRIGRAM_AVAILABLE_QUERY,
+    ADD_OVERRIDE_QUERY,
+    CREATE_OVERRIDE_STAGING_QUERY,
+    COPY_OVERRIDE_STAGING_QUERY,
+    DEDUPE_OVERRIDE_STAGING_QUERY,
+    MERGE_OVERRIDES_QUERY,
+)
+
+# Async counterparts of the data_access functions, for callers that run on an
+# event loop (e.g. an API service). They share the SQL, the OAuth credential
+# provider and the query cache with the sync API, so a write through either
+# API invalidates cached reads for both. They also share the replica routing
+# and the snapshot fallback, so every read here takes the same decorators as
+# its sync counterpart; benchmarks/async_parity.py checks that the two APIs
+# match.
+#
+# The pool is bound to the event loop that first opens it; use one loop per
+# process.
+async_connection_pool = None
+async_replica_pool = None
+_pool_lock = asyncio.Lock()
+
+
+class AsyncLakebaseConnection(psycopg.AsyncConnection):
+    """Async connection that logs in with the credential provider's current token."""
+
+    @classmethod
+    async def connect(cls, conninfo="", **kwargs):
+        # A stale token means a blocking SDK call; keep it off the event loop.
+        kwargs["password"] = await asyncio.to_thread(credential_provider.get_password)
+        kwargs.setdefault("cursor_factory", AsyncInstrumentedCursor)
+        return await super().connect(conninfo, **kwargs)
+
+
+async def get_async_connection_pool():
+    """Get or create (and open) the async connection pool."""
+    global async_connection_pool
+    async with _pool_lock:
+        if async_connection_pool is None:
+            await asyncio.to_thread(credential_provider.get_password)
+            credential_provider.start()
+            pool = AsyncConnectionPool(
+                get_conninfo(),
+                connection_class=AsyncLakebaseConnection,
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                max_lifetime=POOL_MAX_LIFETIME_SECONDS,
+                open=False
+            )
+            await pool.open()
+            async_connection_pool = pool
+    return async_connection_pool
+
+async def get_async_replica_pool():
+    """Get or create (and open) the async read replica pool."""
+    global async_replica_pool
+    async with _pool_lock:
+        if async_replica_pool is None:
+            host = await asyncio.to_thread(get_replica_host)
+            await asyncio.to_thread(credential_provider.get_password)
+            credential_provider.start()
+            pool = AsyncConnectionPool(
+                get_conninfo(host, READ_REPLICA_PORT),
+                connection_class=AsyncLakebaseConnection,
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                max_lifetime=POOL_MAX_LIFETIME_SECONDS,
+                timeout=REPLICA_CHECKOUT_TIMEOUT_SECONDS,
+                check=AsyncConnectionPool.check_connection,
+                open=False
+            )
+            await pool.open()
+            async_replica_pool = pool
+    return async_replica_pool
+
+async def close_async_connection_pool():
+    """Close the async connection pools."""
+    global async_connection_pool, async_replica_pool
+    if async_connection_pool is not None:
+        await async_connection_pool.close()
+        async_connection_pool = None
+    if async_replica_pool is not None:
+        await async_replica_pool.close()
+        async_replica_pool = None
+
+def get_async_connection():
+    """Get a connection from the async pool, for use with `async with`."""
+    return _PooledConnection()
+
+
+class _PooledConnection:
+    async def __aenter__(self):
+        # Same routing as data_access.get_connection, including raising
+        # replica errors as ReplicaUnavailable
+        self._on_replica = False
+        if reading_from_replica():
+            lsn = replica_router.pending_write_lsn()
+            try:
+                conn = await self._checkout(await get_async_replica_pool())
+            except psycopg.OperationalError as e:
+                raise ReplicaUnavailable(str(e)) from e
+            try:
+                caught_up = lsn is None or await _replica_caught_up(conn, lsn)
+            except psycopg.OperationalError as e:
+                await self._context.__aexit__(type(e), e, e.__traceback__)
+                raise ReplicaUnavailable(str(e)) from e
+            if caught_up:
+                if lsn is not None:
+                    replica_router.write_replayed(lsn)
+                replica_router.count_read(True)
+                self._on_replica = True
+                return conn
+            await self._context.__aexit__(None, None, None)
+            replica_router.count_read(False)
+        conn = await self._checkout(await get_async_connection_pool())
+        # Lakebase answered, as in data_access.get_connection
+        snapshot_fallback.mark_live()
+        return conn
+
+    async def _checkout(self, pool):
+        self._context = pool.connection()
+        start = time.perf_counter()
+        conn = await self._context.__aenter__()
+        record_phase("pool_wait", time.perf_counter() - start)
+        return conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        result = await self._context.__aexit__(exc_type, exc, tb)
+        if self._on_replica and isinstance(exc, psycopg.OperationalError) and not isinstance(exc, ReplicaUnavailable):
+            raise ReplicaUnavailable(str(exc)) from exc
+        return result
+
+
+async def _replica_caught_up(conn, lsn):
+    cur = await conn.execute(REPLICA_CAUGHT_UP_QUERY, (lsn,))
+    return (await cur.fetchone())[0]
+
+
+async def record_write(conn):
+    """After a commit on conn, make reads wait for the replica to replay it."""
+    if replica_router.enabled:
+        cur = await conn.execute(CURRENT_WAL_LSN_QUERY)
+        replica_router.record_write((await cur.fetchone())[0])
+
+
+def async_cached_query(ttl, tables):
+    """Async version of data_access.cached_query, sharing the same cache keys."""
+    tables = tuple(tables)
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (func.__name__,) + args + tuple(sorted(kwargs.items()))
+            hit, value = query_cache.get(key)
+            if hit:
+                return value
+            generation = query_cache.generation(tables)
+            value = await func(*args, **kwargs)
+            query_cache.set(key, value, ttl, tables, generation)
+            return value
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+async def _fetch_all(query, params=None):
+    async with get_async_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, params)
+            return await cur.fetchall()
+
+@traced
+@async_cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
+async def fetch_recommended_routes():
+    """Fetch the recommended routes from Lakebase."""
+    return await _fetch_all(ROUTES_QUERY)
+
+async def fetch_arrow(query, columns, params=None):
+    """Run query and return its rows as a pyarrow Table of (name, type) columns."""
+    buffer = io.BytesIO()
+    async with get_async_connection() as conn:
+        async with conn.cursor() as cur:
+            async with cur.copy(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", params) as copy:
+                async for data in copy:
+                    buffer.write(data)
+    return parse_arrow_csv(buffer, columns)
+
+@traced
+@async_cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
+async def fetch_routes_table():
+    """Fetch the recommended routes as a pyarrow Table, in ROUTES_QUERY order."""
+    return await fetch_arrow(ROUTES_QUERY, ROUTES_ARROW_COLUMNS)
+
+@traced
+@async_cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
+async def fetch_machines():
+    """Fetch the machines from Lakebase for machine selection in the app."""
+    return await _fetch_all(MACHINES_QUERY)
+
+@traced
+@async_cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
+async def fetch_parts():
+    """Fetch the parts from Lakebase for part selection in the app."""
+    return await _fetch_all(PARTS_QUERY)
+
+@traced
+@async_cached_query(ttl=OVERRIDES_TTL_SECONDS, tables=[OVERRIDES_TABLE_NAME])
+@read_from_replica
+async def fetch_overrides():
+    """Fetch assignment overrides from Lakebase for override history in the app."""
+    return await _fetch_all(OVERRIDES_QUERY)
+
+_trigram_search = None
+
+async def has_trigram_search(conn):
+    """Return True if pg_trgm is installed, checked once per process."""
+    global _trigram_search
+    if _trigram_search is None:
+        _trigram_search = (await (await conn.execute(TRIGRAM_AVAILABLE_QUERY)).fetchone())[0]
+    return _trigram_search
+
+@traced
+@served_from_snapshot(search_parts_from_snapshot)
+@async_cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[PART_LOOKUP_TABLE_NAME])
+@read_from_replica
+async def search_parts(query, limit=PART_SEARCH_LIMIT):
+    """Search parts by part_id, drawing number or material, for typeahead."""
+    if not query or not query.strip():
+        return []
+    async with get_async_connection() as conn:
+        query_sql = build_part_search_query(await has_trigram_search(conn))
+        async with conn.cursor() as cur:
+            await cur.execute(query_sql, part_search_params(query, limit))
+            return await cur.fetchall()
+
+@traced
+@async_cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
+async def count_overdue_parts():
+    """Count the number of parts that are overdue (due_date <= current date)."""
+    rows = await _fetch_all(OVERDUE_COUNT_QUERY)
+    return rows[0][0] if rows else 0
+
+@traced
+@async_cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
+async def fetch_route_summary():
+    """Count total and high priority parts in the routes table."""
+    rows = await _fetch_all(ROUTE_SUMMARY_QUERY)
+    return rows[0]
+
+@traced
+@served_from_snapshot(routes_page_from_snapshot)
+@async_cached_query(ttl=SYNCED_TABLE_TTL_SECONDS, tables=[ROUTES_TABLE_NAME])
+@read_from_replica
+async def fetch_routes_page(sort_by="part_id", descending=False, after=None, page_size=ROUTES_PAGE_SIZE):
+    """Fetch one page of recommended routes sorted in SQL, seeking past `after`."""
+    query, params, key_columns = build_routes_page_query(sort_by, descending, after, page_size)
+    return make_routes_page(await _fetch_all(query, params), key_columns, page_size)
+
+@traced
+@served_from_snapshot(effective_routes_from_snapshot)
+@async_cached_query(ttl=OVERRIDES_TTL_SECONDS, tables=[ROUTES_TABLE_NAME, OVERRIDES_TABLE_NAME])
+@read_from_replica
+async def fetch_effective_routes(part_ids=None):
+    """Fetch routes with the machine each part is routed to after overrides."""
+    return await _fetch_all(EFFECTIVE_ROUTES_QUERY, {"part_ids": list(part_ids) if part_ids is not None else None})
+
+@traced
+@async_cached_query(ttl=OVERRIDES_TTL_SECONDS, tables=[ROUTES_TABLE_NAME, PART_LOOKUP_TABLE_NAME, OVERRIDES_TABLE_NAME])
+@read_from_replica
+async def fetch_machine_loads():
+    """Fetch each machine's backlog after overrides; see data_access.fetch_machine_loads."""
+    return build_machine_loads(await _fetch_all(MACHINE_LOAD_QUERY))
+
+@traced
+@async_cached_query(ttl=OVERRIDES_TTL_SECONDS, tables=[ROUTES_TABLE_NAME, PART_LOOKUP_TABLE_NAME, OVERRIDES_TABLE_NAME])
+@read_from_replica
+async def fetch_machine_parts(machine_id):
+    """Fetch the parts routed to a machine after overrides, as a pyarrow Table."""
+    return await fetch_arrow(MACHINE_PARTS_QUERY, MACHINE_PARTS_ARROW_COLUMNS, (machine_id,))
+
+@traced
+async def propose_rebalance(machine_id, exclude=()):
+    """Propose moving every part routed to machine_id onto other machines."""
+    loads, parts = await asyncio.gather(fetch_machine_loads(), fetch_machine_parts(machine_id))
+    return plan_rebalance(loads, parts, machine_id, exclude)
+
+@traced
+@served_from_snapshot(part_lookup_many_from_snapshot)
+@read_from_replica
+async def part_lookup_many(part_ids):
+    """Look up many parts at once, serving cached parts from memory."""
+    found, missing = split_cached_parts(part_ids)
+    if missing:
+        generation = part_cache.generation((PART_LOOKUP_TABLE_NAME,))
+        rows = await _fetch_all(PART_LOOKUP_QUERY, (missing,))
+        cache_parts(rows, generation)
+        found.update((row[0], row) for row in rows)
+    return {part_id: found[part_id] for part_id in dict.fromkeys(part_ids) if part_id in found}
+
+@traced
+async def part_lookup(part_id):
+    """Look up a single part by ID with timing and its source ("cache", "database" or "snapshot")."""
+    start_time = time.time()
+
+    hit, result = part_cache.get(part_id)
+    if not hit:
+        result = (await part_lookup_many([part_id])).get(part_id)
+
+    query_time = round((time.time() - start_time) * 1000, 2)
+
+    if result:
+        # Return the result with timing information
+        source = "cache" if hit else "database" if snapshot_fallback.mode() == "live" else "snapshot"
+        return result + (query_time, source)
+    else:
+        return None
+
+@traced
+async def add_override(part_id, assigned_machine_id, assigned_by, notes):
+    """Add or update an assignment override."""
+    async with get_async_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(ADD_OVERRIDE_QUERY, (part_id, assigned_machine_id, assigned_by, notes))
+            await conn.commit()
+        await record_write(conn)
+    query_cache.invalidate(OVERRIDES_TABLE_NAME)
+
+@traced
+async def add_overrides_bulk(overrides, assigned_by):
+    """Add or update many assignment overrides with COPY in a single transaction."""
+    async with get_async_connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute(CREATE_OVERRIDE_STAGING_QUERY)
+                async with cur.copy(COPY_OVERRIDE_STAGING_QUERY) as copy:
+                    for row in staged_override_rows(overrides, assigned_by):
+                        await copy.write_row(row)
+                await cur.execute(DEDUPE_OVERRIDE_STAGING_QUERY)
+                await cur.execute(MERGE_OVERRIDES_QUERY)
+                inserted, updated = await cur.fetchone()
+        await record_write(conn)
+    query_cache.invalidate(OVERRIDES_TABLE_NAME)
+    return inserted, updated
+
+@traced
+async def queue_override(part_id, assigned_machine_id, assigned_by, notes, idempotency_key=None):
+    """Queue an override for the write-behind worker and return its idempotency key."""
+    override_queue.start()
+    # The queue commits to a local SQLite file; keep that off the event loop
+    return await asyncio.to_thread(override_queue.enqueue, part_id, assigned_machine_id, assigned_by, notes,
+                                   idempotency_key)
+
+@traced
+async def check_index_usage():
+    """Async data_access.check_index_usage: which indexed dashboard queries can use an index."""
+    async with get_async_connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute("SET LOCAL enable_seqscan = off")
+                results = {}
+                for name, query in INDEXED_QUERIES.items():
+                    await cur.execute("EXPLAIN (FORMAT JSON) " + query)
+                    plan = (await cur.fetchone())[0]
+                    results[name] = plan_uses_index(plan[0]["Plan"])
+                return results
+
+async def gather_reads(**reads):
+    """Await independent reads concurrently and return their results by name.
+
+    Each read checks out its own pooled connection, so the total latency is
+    that of the slowest read rather than the sum of all of them.
+    """
+    results = await asyncio.gather(*reads.values())
+    return dict(zip(reads.keys(), results))
+
+@traced
+@served_from_snapshot(dashboard_from_snapshot)
+async def fetch_dashboard_snapshot():
+    """Fetch all dashboard data with the independent reads running concurrently."""
+    return DashboardSnapshot(**await gather_reads(
+        route_summary=fetch_route_summary(),
+        machines=fetch_machines(),
+        overrides=fetch_overrides(),
+        overdue_count=count_overdue_parts()
+    ))
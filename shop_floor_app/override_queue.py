@@ -0,0 +1,292 @@
+"""Write-behind queue for assignment overrides.
+
+Overrides are appended to a local SQLite database, in WAL mode with
+synchronous=FULL so a queued override survives a crash, and a background
+worker drains them into Lakebase:
+
+    group commit  the worker waits linger_seconds for more overrides, then
+                  writes up to batch_size of them in one transaction
+    retry         transient errors (lost connection, pool timeout) retry the
+                  batch with exponential backoff; other errors retry its rows
+                  one at a time, so a bad row fails on its own
+    idempotency   each override has an idempotency key, so submitting the same
+                  key twice queues it once, and its assigned_at is fixed when
+                  it is queued, so re-sending a batch whose commit was never
+                  acknowledged updates the rows it wrote instead of
+                  duplicating them
+
+Every queued override is pending, committed or failed. Committed overrides
+are kept for retention_seconds so the app can show their status.
+"""
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+PENDING = "pending"
+COMMITTED = "committed"
+FAILED = "failed"
+
+QUEUE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS override_queue (
+      seq INTEGER PRIMARY KEY AUTOINCREMENT,
+      idempotency_key TEXT NOT NULL UNIQUE,
+      part_id TEXT NOT NULL,
+      assigned_machine_id TEXT NOT NULL,
+      assigned_by TEXT,
+      assigned_at TEXT NOT NULL,
+      notes TEXT,
+      status TEXT NOT NULL DEFAULT 'pending',
+      attempts INTEGER NOT NULL DEFAULT 0,
+      next_attempt_at REAL NOT NULL DEFAULT 0,
+      last_error TEXT,
+      queued_at REAL NOT NULL,
+      committed_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS override_queue_status_idx ON override_queue (status, next_attempt_at, seq);
+"""
+
+ENQUEUE_QUERY = """
+    INSERT INTO override_queue (idempotency_key, part_id, assigned_machine_id, assigned_by, assigned_at, notes, queued_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (idempotency_key) DO NOTHING
+"""
+
+DUE_BATCH_QUERY = """
+    SELECT seq, attempts, part_id, assigned_machine_id, assigned_by, assigned_at, notes
+    FROM override_queue
+    WHERE status = 'pending' AND next_attempt_at <= ?
+    ORDER BY seq
+    LIMIT ?
+"""
+
+RECENT_QUERY = """
+    SELECT part_id, assigned_machine_id, assigned_by, assigned_at, notes, status, attempts, last_error
+    FROM override_queue
+    ORDER BY seq DESC
+    LIMIT ?
+"""
+
+
+class OverrideQueue:
+    """A durable local queue of overrides, drained by a background worker.
+
+    `write_batch` writes a list of (part_id, assigned_machine_id, assigned_by,
+    assigned_at, notes) rows in one transaction and must be idempotent on
+    (part_id, assigned_at). Exceptions in `transient_errors` are retried
+    with backoff until max_attempts; any other exception fails the row.
+    """
+
+    def __init__(self, path, write_batch, transient_errors=(), batch_size=500, linger_seconds=0.05,
+                 max_attempts=10, backoff_seconds=1, max_backoff_seconds=60, retention_seconds=86400):
+        self.path = path
+        self.write_batch = write_batch
+        self.transient_errors = tuple(transient_errors)
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._db = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.batches = 0
+        self.committed = 0
+        self.retries = 0
+        self.failures = 0
+        self.last_batch_size = 0
+        self.last_error = None
+
+    def _connection(self):
+        """Open the queue database on first use; call with the lock held."""
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=FULL")
+            db.executescript(QUEUE_SCHEMA)
+            self._db = db
+        return self._db
+
+    def _execute(self, query, params=()):
+        """Run one statement on the queue database and return its rows."""
+        with self._lock:
+            return self._connection().execute(query, params).fetchall()
+
+    def _executemany(self, query, rows):
+        """Run a statement for each of rows in one queue transaction."""
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN")
+            try:
+                db.executemany(query, rows)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, part_id, assigned_machine_id, assigned_by, notes, idempotency_key=None):
+        """Durably queue an override and return its idempotency key."""
+        if not part_id or not assigned_machine_id:
+            raise ValueError("An override needs a part_id and an assigned_machine_id")
+        key = idempotency_key or str(uuid.uuid4())
+        # Naive UTC, like CURRENT_TIMESTAMP in a Lakebase session
+        assigned_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        self._execute(ENQUEUE_QUERY, (key, part_id, assigned_machine_id, assigned_by,
+                                      assigned_at.isoformat(), notes, time.time()))
+        self._wake.set()
+        return key
+
+    def start(self):
+        """Start draining the queue in a background thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._drain_loop, name="lakebase-override-queue", daemon=True
+            )
+            self._thread.start()
+        # Anything left from a previous run is due now
+        self._wake.set()
+
+    def stop(self):
+        """Stop the worker; pending overrides stay queued."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _drain_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._wake.wait(self._seconds_until_due())
+                self._wake.clear()
+                # Group commit: let overrides submitted together share a transaction
+                if self._stop.wait(self.linger_seconds):
+                    break
+                while self.drain_once() and not self._stop.is_set():
+                    pass
+                self._execute("DELETE FROM override_queue WHERE status = 'committed' AND committed_at < ?",
+                              (time.time() - self.retention_seconds,))
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Override queue error: {str(e)}")
+                self._stop.wait(self.backoff_seconds)
+
+    def _seconds_until_due(self):
+        """Seconds until the next pending override is due, at most max_backoff_seconds."""
+        (next_attempt_at,), = self._execute(
+            "SELECT min(next_attempt_at) FROM override_queue WHERE status = 'pending'"
+        )
+        if next_attempt_at is None:
+            return self.max_backoff_seconds
+        return min(max(next_attempt_at - time.time(), 0), self.max_backoff_seconds)
+
+    def drain_once(self):
+        """Write one batch of due overrides; returns how many were committed."""
+        batch = self._execute(DUE_BATCH_QUERY, (time.time(), self.batch_size))
+        if not batch:
+            return 0
+        self.last_batch_size = len(batch)
+        try:
+            self.write_batch([self._override(row) for row in batch])
+        except self.transient_errors as e:
+            self._retry_later(batch, e)
+            return 0
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch, e)
+                return 0
+            # Find the bad rows by writing the batch's rows one at a time
+            return sum(self._write_one(row) for row in batch)
+        self._commit(batch)
+        return len(batch)
+
+    def _write_one(self, row):
+        try:
+            self.write_batch([self._override(row)])
+        except self.transient_errors as e:
+            self._retry_later([row], e)
+            return 0
+        except Exception as e:
+            self._fail([row], e)
+            return 0
+        self._commit([row])
+        return 1
+
+    @staticmethod
+    def _override(row):
+        part_id, assigned_machine_id, assigned_by, assigned_at, notes = row[2:]
+        return (part_id, assigned_machine_id, assigned_by, datetime.fromisoformat(assigned_at), notes)
+
+    def _commit(self, rows):
+        now = time.time()
+        self._executemany(
+            "UPDATE override_queue SET status = 'committed', committed_at = ?, last_error = NULL WHERE seq = ?",
+            [(now, row[0]) for row in rows]
+        )
+        self.batches += 1
+        self.committed += len(rows)
+
+    def _retry_later(self, rows, error):
+        """Back off exponentially, with jitter, or fail rows out of attempts."""
+        self.last_error = str(error)
+        now = time.time()
+        jitter = random.uniform(0.5, 1)
+        updates = []
+        for seq, attempts, *_ in rows:
+            attempts += 1
+            if attempts >= self.max_attempts:
+                status, next_attempt_at = FAILED, now
+                self.failures += 1
+            else:
+                delay = min(self.backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+                status, next_attempt_at = PENDING, now + delay * jitter
+                self.retries += 1
+            updates.append((status, attempts, next_attempt_at, str(error), seq))
+        self._executemany(
+            "UPDATE override_queue SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE seq = ?",
+            updates
+        )
+
+    def _fail(self, rows, error):
+        self.last_error = str(error)
+        self.failures += len(rows)
+        self._executemany(
+            "UPDATE override_queue SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE seq = ?",
+            [(str(error), row[0]) for row in rows]
+        )
+
+    def retry_failed(self):
+        """Queue failed overrides again; returns how many were requeued."""
+        rows = self._execute(
+            "UPDATE override_queue SET status = 'pending', attempts = 0, next_attempt_at = 0 "
+            "WHERE status = 'failed' RETURNING seq"
+        )
+        self._wake.set()
+        return len(rows)
+
+    def recent(self, limit=20):
+        """Return the newest queued overrides with their status, newest first."""
+        return self._execute(RECENT_QUERY, (limit,))
+
+    def stats(self):
+        """Return queue counts by status and the worker's counters."""
+        counts = dict(self._execute("SELECT status, count(*) FROM override_queue GROUP BY status"))
+        (oldest_pending,), = self._execute("SELECT min(queued_at) FROM override_queue WHERE status = 'pending'")
+        return {
+            "pending": counts.get(PENDING, 0),
+            "committed": counts.get(COMMITTED, 0),
+            "failed": counts.get(FAILED, 0),
+            "oldest_pending_s": round(time.time() - oldest_pending, 3) if oldest_pending else 0,
+            "batches": self.batches,
+            "committed_total": self.committed,
+            "retries": self.retries,
+            "failures": self.failures,
+            "last_batch_size": self.last_batch_size,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,420 @@
+"""Per-call timing for data_access, broken down by phase.
+
+Every traced data_access call records its total time plus the phases that
+happened inside it:
+
+    pool_wait      waiting for a pooled connection
+    execute        server execution and transfer of the result
+    fetch          decoding rows into Python
+
+along with the rows it returned and any error. Samples go into rolling
+histograms that can be rendered in the Prometheus text format, forwarded to
+OpenTelemetry, or summarized for the app's diagnostics tab.
+
+Work done off the calling thread, such as generating a Lakebase OAuth token
+on the pool's connection workers, is recorded with observe() as a background
+metric and summarized separately. A call that waits on it sees that time as
+pool_wait.
+"""
+import bisect
+import contextlib
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import psycopg
+
+# Number of recent samples per histogram used for percentiles. Prometheus
+# buckets are cumulative, as Prometheus expects.
+METRICS_WINDOW = int(os.getenv('QUERY_METRICS_WINDOW', '1000'))
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("pool_wait", "execute", "fetch")
+METRIC_PREFIX = "shop_floor_query"
+
+_current_trace = contextvars.ContextVar("query_trace", default=None)
+_last_trace = contextvars.ContextVar("last_query_trace", default=None)
+
+
+@dataclass
+class CallTrace:
+    """Timing of one data_access call."""
+    function: str
+    parent: "CallTrace" = None
+    phases: dict = field(default_factory=dict)
+    rows: int = 0
+    connections: int = 0
+    total: float = 0.0
+    error: str = None
+
+    @property
+    def from_cache(self):
+        """True if the call was answered without checking out a connection."""
+        return self.error is None and self.connections == 0
+
+    def phase_ms(self, phase):
+        return round(self.phases.get(phase, 0.0) * 1000, 2)
+
+
+class RollingHistogram:
+    """Cumulative bucket counts plus a window of recent samples for percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=METRICS_WINDOW):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) of the recent samples, or None."""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class QueryMetrics:
+    """Thread-safe registry of per-function, per-phase histograms and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(RollingHistogram)
+        self._calls = defaultdict(int)
+        self._cache_hits = defaultdict(int)
+        self._rows = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._background = set()
+        self._sinks = []
+
+    def observe(self, function, phase, seconds):
+        """Record a single phase outside of any call, e.g. a background token refresh."""
+        with self._lock:
+            self._histograms[(function, phase)].observe(seconds)
+            self._background.add((function, phase))
+
+    def record(self, trace):
+        """Record a finished call."""
+        with self._lock:
+            self._calls[trace.function] += 1
+            self._rows[trace.function] += trace.rows
+            if trace.from_cache:
+                self._cache_hits[trace.function] += 1
+            if trace.error:
+                self._errors[(trace.function, trace.error)] += 1
+            self._histograms[(trace.function, "total")].observe(trace.total)
+            for phase, seconds in trace.phases.items():
+                self._histograms[(trace.function, phase)].observe(seconds)
+            sinks = list(self._sinks)
+        for sink in sinks:
+            sink(trace)
+
+    def add_sink(self, sink):
+        """Call sink(trace) for every recorded call."""
+        with self._lock:
+            self._sinks.append(sink)
+
+    def reset(self):
+        """Drop every sample and counter."""
+        with self._lock:
+            self._histograms.clear()
+            self._calls.clear()
+            self._cache_hits.clear()
+            self._rows.clear()
+            self._errors.clear()
+            self._background.clear()
+
+    def summary(self):
+        """Return one dict per function with call counts and p50/p95 per phase in ms."""
+        with self._lock:
+            result = []
+            for function in sorted(self._calls):
+                row = {
+                    "function": function,
+                    "calls": self._calls[function],
+                    "cache_hits": self._cache_hits[function],
+                    "errors": sum(n for (f, _), n in self._errors.items() if f == function),
+                    "rows": self._rows[function],
+                }
+                for phase in ("total",) + PHASES:
+                    histogram = self._histograms.get((function, phase))
+                    for q in (50, 95):
+                        value = histogram.percentile(q) if histogram else None
+                        row[f"{phase}_p{q}_ms"] = round(value * 1000, 2) if value is not None else None
+                result.append(row)
+            return result
+
+    def background_summary(self):
+        """Return one dict per observe()d phase with its count and p50/p95 in ms."""
+        with self._lock:
+            result = []
+            for function, phase in sorted(self._background):
+                histogram = self._histograms[(function, phase)]
+                row = {"function": function, "phase": phase, "count": histogram.count}
+                for q in (50, 95):
+                    row[f"p{q}_ms"] = round(histogram.percentile(q) * 1000, 2)
+                result.append(row)
+            return result
+
+    def render_prometheus(self, gauges=None):
+        """Render the metrics, plus optional {name: value} gauges, as Prometheus text."""
+        lines = [
+            f"# HELP {METRIC_PREFIX}_phase_seconds Time spent in each phase of a data_access call or of background work.",
+            f"# TYPE {METRIC_PREFIX}_phase_seconds histogram",
+        ]
+        with self._lock:
+            for (function, phase), histogram in sorted(self._histograms.items()):
+                labels = f'function="{function}",phase="{phase}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.bucket_counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{METRIC_PREFIX}_phase_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{METRIC_PREFIX}_phase_seconds_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{METRIC_PREFIX}_phase_seconds_count{{{labels}}} {histogram.count}")
+            for name, counts, help_text in (
+                ("calls_total", self._calls, "data_access calls."),
+                ("cache_hits_total", self._cache_hits, "data_access calls answered without a connection."),
+                ("rows_total", self._rows, "Rows returned by data_access calls."),
+            ):
+                lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+                for function, count in sorted(counts.items()):
+                    lines.append(f'{METRIC_PREFIX}_{name}{{function="{function}"}} {count}')
+            lines.append(f"# HELP {METRIC_PREFIX}_errors_total Failed data_access calls by error type.")
+            lines.append(f"# TYPE {METRIC_PREFIX}_errors_total counter")
+            for (function, error), count in sorted(self._errors.items()):
+                lines.append(f'{METRIC_PREFIX}_errors_total{{function="{function}",error="{error}"}} {count}')
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+query_metrics = QueryMetrics()
+
+
+def record_phase(phase, seconds):
+    """Add time spent in phase to the current call and the calls enclosing it.
+
+    An enclosing call that awaits several calls concurrently (the async
+    dashboard snapshot) gets the sum of their phases, which can exceed its total.
+    """
+    trace = _current_trace.get()
+    while trace is not None:
+        trace.phases[phase] = trace.phases.get(phase, 0.0) + seconds
+        if phase == "pool_wait":
+            trace.connections += 1
+        trace = trace.parent
+
+
+def record_rows(count):
+    """Add returned rows to the current call and the calls enclosing it."""
+    trace = _current_trace.get()
+    while trace is not None:
+        trace.rows += count
+        trace = trace.parent
+
+
+@contextlib.contextmanager
+def timed_phase(phase):
+    """Time the enclosed block as phase of the current call."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+
+def last_trace():
+    """Return the trace of the last call this thread (or task) finished."""
+    return _last_trace.get()
+
+
+def _start_trace(name):
+    trace = CallTrace(name, parent=_current_trace.get())
+    return trace, _current_trace.set(trace), time.perf_counter()
+
+
+def _finish_trace(trace, token, start, error):
+    trace.total = time.perf_counter() - start
+    if error is not None:
+        trace.error = type(error).__name__
+    _current_trace.reset(token)
+    _last_trace.set(trace)
+    query_metrics.record(trace)
+
+
+def traced(func):
+    """Record the timing, rows and errors of every call to func."""
+    name = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            trace, token, start = _start_trace(name)
+            error = None
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                _finish_trace(trace, token, start, error)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace, token, start = _start_trace(name)
+        error = None
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _finish_trace(trace, token, start, error)
+    return wrapper
+
+
+def _count_statement_rows(cur):
+    # Statements without a result set (INSERT, UPDATE) report affected rows
+    if cur.description is None and cur.rowcount > 0:
+        record_rows(cur.rowcount)
+
+
+class InstrumentedCursor(psycopg.Cursor):
+    """Cursor that records execute and fetch time and returned rows."""
+
+    def execute(self, *args, **kwargs):
+        with timed_phase("execute"):
+            result = super().execute(*args, **kwargs)
+        _count_statement_rows(self)
+        return result
+
+    def executemany(self, *args, **kwargs):
+        with timed_phase("execute"):
+            return super().executemany(*args, **kwargs)
+
+    @contextlib.contextmanager
+    def copy(self, *args, **kwargs):
+        with timed_phase("execute"):
+            with super().copy(*args, **kwargs) as copy:
+                yield copy
+
+    def fetchone(self):
+        with timed_phase("fetch"):
+            row = super().fetchone()
+        record_rows(row is not None)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        with timed_phase("fetch"):
+            rows = super().fetchmany(*args, **kwargs)
+        record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        with timed_phase("fetch"):
+            rows = super().fetchall()
+        record_rows(len(rows))
+        return rows
+
+
+class AsyncInstrumentedCursor(psycopg.AsyncCursor):
+    """Async counterpart of InstrumentedCursor."""
+
+    async def execute(self, *args, **kwargs):
+        with timed_phase("execute"):
+            result = await super().execute(*args, **kwargs)
+        _count_statement_rows(self)
+        return result
+
+    async def executemany(self, *args, **kwargs):
+        with timed_phase("execute"):
+            return await super().executemany(*args, **kwargs)
+
+    @contextlib.asynccontextmanager
+    async def copy(self, *args, **kwargs):
+        with timed_phase("execute"):
+            async with super().copy(*args, **kwargs) as copy:
+                yield copy
+
+    async def fetchone(self):
+        with timed_phase("fetch"):
+            row = await super().fetchone()
+        record_rows(row is not None)
+        return row
+
+    async def fetchmany(self, *args, **kwargs):
+        with timed_phase("fetch"):
+            rows = await super().fetchmany(*args, **kwargs)
+        record_rows(len(rows))
+        return rows
+
+    async def fetchall(self):
+        with timed_phase("fetch"):
+            rows = await super().fetchall()
+        record_rows(len(rows))
+        return rows
+
+
+def enable_opentelemetry(meter_provider=None):
+    """Forward every recorded call to OpenTelemetry histograms and counters.
+
+    Uses the global MeterProvider unless one is given; configuring an exporter
+    is left to the deployment. Requires the opentelemetry-api package.
+    """
+    from opentelemetry import metrics
+
+    meter = (meter_provider or metrics.get_meter_provider()).get_meter("shop_floor_app.data_access")
+    durations = meter.create_histogram(
+        f"{METRIC_PREFIX}.phase.duration", unit="s",
+        description="Time spent in each phase of a data_access call."
+    )
+    rows = meter.create_counter(f"{METRIC_PREFIX}.rows", description="Rows returned by data_access calls.")
+    errors = meter.create_counter(f"{METRIC_PREFIX}.errors", description="Failed data_access calls.")
+
+    def sink(trace):
+        attributes = {"function": trace.function}
+        durations.record(trace.total, {**attributes, "phase": "total"})
+        for phase, seconds in trace.phases.items():
+            durations.record(seconds, {**attributes, "phase": phase})
+        rows.add(trace.rows, attributes)
+        if trace.error:
+            errors.add(1, {**attributes, "error": trace.error})
+
+    query_metrics.add_sink(sink)
+
+
+def serve_metrics(port, render):
+    """Serve render() as Prometheus text on /metrics from a background thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="query-metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,114 @@
+"""Versioned on-disk snapshots of the app's tables, as Arrow IPC files.
+
+Each save writes its tables into a new version directory and then points
+CURRENT at it with an atomic rename, so a reader never sees a half-written
+snapshot and a crash mid-save leaves the previous one in place. Files are
+uncompressed, so loading memory-maps them: opening a snapshot reads nothing
+until a column is used, and its pages are shared with the OS page cache.
+"""
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+# Bump when the tables or their columns change; older snapshots are ignored
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A set of named pyarrow Tables saved together."""
+    version: str
+    saved_at: datetime
+    tables: dict = field(default_factory=dict)
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+
+class SnapshotStore:
+    """Save and memory-map snapshots in directory, keeping the newest `keep`.
+
+    Several processes may share directory. Unfinished saves are only removed
+    once they are abandoned_seconds old, so another process's save in
+    progress is left alone.
+    """
+
+    def __init__(self, directory, keep=2, abandoned_seconds=3600):
+        self.directory = directory
+        self.keep = keep
+        self.abandoned_seconds = abandoned_seconds
+
+    def save(self, tables):
+        """Write tables (name -> pyarrow Table) as the current snapshot and return it."""
+        import pyarrow as pa
+
+        os.makedirs(self.directory, exist_ok=True)
+        version = str(time.time_ns())
+        saved_at = datetime.now(timezone.utc)
+        staging = os.path.join(self.directory, f".{version}.tmp")
+        os.makedirs(staging)
+        for name, table in tables.items():
+            with pa.OSFile(os.path.join(staging, f"{name}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        with open(os.path.join(staging, "metadata.json"), "w") as f:
+            json.dump({
+                "format": SNAPSHOT_FORMAT_VERSION,
+                "saved_at": saved_at.isoformat(),
+                "tables": sorted(tables),
+            }, f)
+        os.rename(staging, os.path.join(self.directory, version))
+
+        pointer = os.path.join(self.directory, "CURRENT.tmp")
+        with open(pointer, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer, os.path.join(self.directory, "CURRENT"))
+        self._prune(version)
+        return Snapshot(version, saved_at, dict(tables))
+
+    def _prune(self, current):
+        """Remove all but the newest `keep` versions, and saves that were abandoned."""
+        # Open memory maps of a removed version stay valid until they are closed
+        names = os.listdir(self.directory)
+        versions = sorted((name for name in names if name.isdigit()), key=int)
+        stale = versions[:-self.keep] + [name for name in names
+                                         if name.startswith(".") and name.endswith(".tmp") and self._abandoned(name)]
+        for name in stale:
+            if name != current:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def _abandoned(self, name):
+        try:
+            modified = os.path.getmtime(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            # Renamed into place or removed meanwhile
+            return False
+        return time.time() - modified > self.abandoned_seconds
+
+    def load(self):
+        """Memory-map the current snapshot; returns None if there is no usable one."""
+        import pyarrow as pa
+
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as f:
+                version = f.read().strip()
+            path = os.path.join(self.directory, version)
+            with open(os.path.join(path, "metadata.json")) as f:
+                metadata = json.load(f)
+            if metadata.get("format") != SNAPSHOT_FORMAT_VERSION:
+                return None
+            tables = {
+                name: pa.ipc.open_file(pa.memory_map(os.path.join(path, f"{name}.arrow"))).read_all()
+                for name in metadata["tables"]
+            }
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, pa.ArrowInvalid) as e:
+            print(f"Ignoring unreadable snapshot in {self.directory}: {str(e)}")
+            return None
+        return Snapshot(version, datetime.fromisoformat(metadata["saved_at"]), tables)
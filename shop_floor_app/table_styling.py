@@ -1,26 +1,48 @@
+import html
+import threading
+from collections import OrderedDict
+
+# Class of the tables rendered by render_table_html; get_table_css() scopes
+# the table styles to it so they can be emitted once in the page stylesheet.
+TABLE_CLASS = "routes-table"
+
+# Rows rendered into the HTML at most. The container shows about ten rows, so
+# anything past this only adds payload.
+TABLE_MAX_ROWS = 100
+TABLE_CACHE_MAX_ENTRIES = 128
+
+
 def get_table_styles():
     """Return the table styling configuration for pandas styler."""
     return [
         {
             'selector': 'th:nth-child(1)',
-            'props': [('width', '10%')]
+            'props': [('width', '6%')]
         },
         {
             'selector': 'th:nth-child(2)',
-            'props': [('width', '15%')]
+            'props': [('width', '12%')]
         },
         {
             'selector': 'th:nth-child(3)',
-            'props': [('width', '25%')]
+            'props': [('width', '12%')]
         },
         {
             'selector': 'th:nth-child(4)',
-            'props': [('width', '30%')]
+            'props': [('width', '15%')]
         },
         {
             'selector': 'th:nth-child(5)',
             'props': [('width', '20%')]
         },
+        {
+            'selector': 'th:nth-child(6)',
+            'props': [('width', '20%')]
+        },
+        {
+            'selector': 'th:nth-child(7)',
+            'props': [('width', '15%')]
+        },
         {
             'selector': 'thead th',
             'props': [
@@ -93,17 +115,80 @@ def get_table_styles():
     ]
 
 
-def create_scrollable_table(styled_df):
-    """Create a scrollable table container with the styled dataframe."""
-    # Use render() method for Styler objects
-    if hasattr(styled_df, 'render'):
-        table_html = styled_df.render()
-    else:
-        table_html = styled_df.to_html()
-    
-    scrollable_table = f"""
+def get_table_css(table_class=TABLE_CLASS):
+    """Return the table styles as a stylesheet scoped to table_class."""
+    rules = []
+    for style in get_table_styles():
+        selector = style['selector']
+        scoped = f".{table_class}" if selector == 'table' else f".{table_class} {selector}"
+        props = "; ".join(f"{name}: {value}" for name, value in style['props'])
+        rules.append(f"{scoped} {{ {props} }}")
+    return "\n".join(rules)
+
+
+def _format_cell(value, precision):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.{precision}f}"
+    return html.escape(str(value))
+
+
+def render_table_html(columns, rows, table_class=TABLE_CLASS, max_rows=TABLE_MAX_ROWS, precision=6):
+    """Render rows as a scrollable HTML table styled by get_table_css().
+
+    Like the Styler output, the first column is the row number. Only the first
+    max_rows rows are rendered; a note says how many were left out.
+    """
+    shown = rows[:max_rows]
+    header = "".join(f"<th>{html.escape(column)}</th>" for column in columns)
+    body = "".join(
+        f"<tr><th>{i}</th>{''.join(f'<td>{_format_cell(value, precision)}</td>' for value in row)}</tr>"
+        for i, row in enumerate(shown)
+    )
+    hidden = len(rows) - len(shown)
+    note = f'<p style="text-align: center; color: #6c757d;">{hidden} more rows not shown</p>' if hidden > 0 else ""
+    return f"""
     <div style="max-height: 400px; overflow-y: auto; border-radius: 8px; box-shadow: 0 4px 16px rgba(0,0,0,0.1); width: 100%;">
-        {table_html}
+        <table class="{table_class}"><thead><tr><th></th>{header}</tr></thead><tbody>{body}</tbody></table>
+        {note}
     </div>
     """
-    return scrollable_table
+
+
+class TableHtmlCache:
+    """Thread-safe LRU of rendered table HTML.
+
+    Entries are keyed by what the caller displays (e.g. the sort and page) and
+    remember the row objects they were rendered from. A cached query returns
+    the same objects until it is refreshed, so an identity check tells whether
+    the data changed without comparing any rows.
+    """
+
+    def __init__(self, max_entries=TABLE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, sources, render):
+        """Return the HTML cached for key if sources are unchanged, else render() it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and len(entry[0]) == len(sources) and all(
+                    a is b for a, b in zip(entry[0], sources)):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        table_html = render()
+        with self._lock:
+            self._entries[key] = (tuple(sources), table_html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return table_html
+
+
+table_html_cache = TableHtmlCache()